@@ -0,0 +1,370 @@
+"""Offline benchmarks for the bot's commands and view callbacks.
+
+Builds stand-in Context/Interaction/Member objects and calls the command and
+view callbacks from main.py directly against generated data files, so no
+Discord connection is needed. Each dataset lives in its own temp directory.
+
+    python bench.py --users 1000 10000 100000 --json before.json
+    python bench.py --users 1000 10000 --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+import main
+
+DATASETS = [1_000, 10_000, 100_000]
+FIRST_USER_ID = 10 ** 17  # Snowflake-sized ids keep the JSON realistic
+
+
+# ------------------ FAKE DISCORD OBJECTS ------------------
+
+
+class FakeAsset:
+    url = "https://cdn.discordapp.com/embed/avatars/0.png"
+
+
+class FakeMember:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.bot = False
+        self.name = f"user{user_id}"
+        self.display_name = f"User {user_id}"
+        self.mention = f"<@{user_id}>"
+        self.avatar = None
+        self.default_avatar = FakeAsset()
+
+    def __eq__(self, other):
+        return getattr(other, "id", None) == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class FakeMessage:
+    _next_id = 1
+
+    def __init__(self):
+        self.id = FakeMessage._next_id
+        FakeMessage._next_id += 1
+
+    async def edit(self, **kwargs):
+        return self
+
+
+class FakeChannel:
+    id = 1
+
+    async def send(self, *args, **kwargs):
+        return FakeMessage()
+
+
+class FakeGuild:
+    id = 1
+
+    def get_member(self, user_id: int):
+        return FakeMember(user_id)
+
+    async def fetch_member(self, user_id: int):
+        return FakeMember(user_id)
+
+
+class FakeContext:
+    def __init__(self, author: FakeMember):
+        self.author = author
+        self.guild = FakeGuild()
+        self.channel = FakeChannel()
+
+    async def send(self, *args, **kwargs):
+        return FakeMessage()
+
+
+class FakeResponse:
+    def __init__(self):
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def send_message(self, *args, **kwargs):
+        self.done = True
+
+    async def edit_message(self, **kwargs):
+        self.done = True
+
+    async def defer(self, **kwargs):
+        self.done = True
+
+    async def send_modal(self, modal):
+        self.done = True
+
+
+class FakeFollowup:
+    async def send(self, *args, **kwargs):
+        return FakeMessage()
+
+    async def edit_message(self, message_id, **kwargs):
+        return FakeMessage()
+
+
+class FakeInteraction:
+    def __init__(self, user: FakeMember):
+        self.user = user
+        self.guild = FakeGuild()
+        self.guild_id = None  # Commands are called directly, outside any guild, so views match them
+        self.channel = FakeChannel()
+        self.message = FakeMessage()
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+
+# ------------------ DATASETS ------------------
+
+
+def user_ids(users: int) -> List[int]:
+    return [FIRST_USER_ID + i for i in range(users)]
+
+
+def generate_dataset(users: int, seed: int):
+    """Write balances, bank, inventory and market files for `users` users into the cwd."""
+    rng = random.Random(seed)
+    balances, bank_data, inventories = {}, {}, {}
+    for user_id in map(str, user_ids(users)):
+        balances[user_id] = rng.randint(100, 100_000)
+        plan = rng.choice([None, "basic", "premium", "vip"])
+        bank_data[user_id] = {
+            "plan": plan,
+            "deposited": rng.randint(0, 50_000) if plan else 0,
+            "last_interest_claim": 0,
+            "pending_interest": 0,
+        }
+        inventories[user_id] = {
+            "BobBux": rng.randint(0, 50),
+            "DxBux": rng.randint(0, 50),
+            "Gold": rng.randint(1, 50),
+            "padlock": rng.randint(0, 3),
+            "phone": rng.randint(0, 1),
+        }
+
+    main.save_balances(balances)
+    main.save_bank_data(bank_data)
+    main.save_inventories(inventories)
+    main.save_currency_prices({"BobBux": 500, "DxBux": 750, "Gold": 1000})
+    main.save_currency_stocks({"BobBux": 10 ** 9, "DxBux": 10 ** 9, "Gold": 10 ** 9})
+
+
+def reset_state():
+    """Drop in-memory state left over from the previous dataset."""
+    main.shop_catalog = main.ShopCatalog()
+    main.trade_engine = main.TradeEngine()
+    main.partitions = main.PartitionRegistry()
+
+
+# ------------------ BENCHMARKS ------------------
+# Each benchmark is (setup, op): setup builds the arguments for one call and
+# is not timed; op makes the call being measured.
+
+
+class Bench:
+    def __init__(self, users: int, seed: int):
+        self.ids = user_ids(users)
+        self.rng = random.Random(seed)
+
+    def member(self) -> FakeMember:
+        return FakeMember(self.rng.choice(self.ids))
+
+    def pair(self):
+        a, b = self.rng.sample(self.ids, 2)
+        return FakeMember(a), FakeMember(b)
+
+    # --- bal ---
+    async def setup_bal(self):
+        return FakeContext(self.member())
+
+    async def op_bal(self, ctx):
+        await main.bal.callback(ctx)
+
+    # --- donate ---
+    async def setup_donate(self):
+        sender, recipient = self.pair()
+        return FakeContext(sender), recipient
+
+    async def op_donate(self, state):
+        ctx, recipient = state
+        await main.donate.callback(ctx, recipient, 1)
+
+    # --- rob ---
+    async def setup_rob(self):
+        robber, victim = self.pair()
+        return FakeContext(robber), victim
+
+    async def op_rob(self, state):
+        ctx, victim = state
+        await main.rob.callback(ctx, victim)
+
+    # --- leaderboard ---
+    async def setup_leaderboard(self):
+        return FakeContext(self.member())
+
+    async def op_leaderboard(self, ctx):
+        await main.leaderboard.callback(ctx, "total")
+
+    # --- StockMarketView.confirm_button ---
+    async def setup_stock_confirm(self):
+        member = self.member()
+        view = main.StockMarketView(member.id)
+        view.action = "buy"
+        view.currency = self.rng.choice(["BobBux", "DxBux", "Gold"])
+        view.amount = 1
+        view.message = FakeMessage()
+        return view, FakeInteraction(member)
+
+    async def op_stock_confirm(self, state):
+        view, interaction = state
+        await view.confirm_button.callback(interaction)
+
+    # --- TradeAcceptView.accept ---
+    async def setup_trade_accept(self):
+        initiator, recipient = self.pair()
+        # Hand the initiator the Gold they offer, so long runs never drain anyone
+        main.add_to_inventory(initiator.id, "Gold", 1)
+        trade, error = main.trade_engine.open(initiator.id, recipient.id, {"Gold": 1}, 0, {}, 1)
+        if trade is None:
+            raise RuntimeError(error)
+        return main.TradeAcceptView(trade, initiator, recipient), FakeInteraction(recipient)
+
+    async def op_trade_accept(self, state):
+        view, interaction = state
+        await view.accept.callback(interaction)
+
+
+BENCHES = ["bal", "donate", "rob", "leaderboard", "stock_confirm", "trade_accept"]
+
+
+# ------------------ RUNNER ------------------
+
+
+async def measure(bench: Bench, name: str, args) -> Dict:
+    setup = getattr(bench, f"setup_{name}")
+    op = getattr(bench, f"op_{name}")
+
+    await op(await setup())  # Warm up caches and lazy loads
+    timings = []
+    while len(timings) < args.min_ops or (sum(timings) < args.min_time and len(timings) < args.max_ops):
+        state = await setup()
+        started = time.perf_counter()
+        await op(state)
+        timings.append(time.perf_counter() - started)
+
+    peaks = []
+    retained = []
+    tracemalloc.start()
+    for _ in range(args.alloc_ops):
+        state = await setup()
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        await op(state)
+        current, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+        retained.append(current - before)
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "ops": len(timings),
+        "ops_per_sec": len(timings) / sum(timings),
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "p50_ms": timings[len(timings) // 2] * 1000,
+        "p99_ms": timings[min(int(len(timings) * 0.99), len(timings) - 1)] * 1000,
+        "alloc_peak_kib": statistics.fmean(peaks) / 1024,
+        "alloc_retained_kib": statistics.fmean(retained) / 1024,
+    }
+
+
+async def run_dataset(users: int, args) -> Dict:
+    results = {}
+    with tempfile.TemporaryDirectory(prefix=f"bench-{users}-") as data_dir:
+        cwd = os.getcwd()
+        os.chdir(data_dir)
+        try:
+            reset_state()
+            generate_dataset(users, args.seed)
+            bench = Bench(users, args.seed)
+            for name in args.benches:
+                results[name] = await measure(bench, name, args)
+        finally:
+            main.job_runner.shutdown()  # Its workers and manager belong to this dataset's event loop
+            os.chdir(cwd)
+    return results
+
+
+# ------------------ REPORTING ------------------
+
+
+COLUMNS = ["ops", "ops_per_sec", "mean_ms", "p50_ms", "p99_ms", "alloc_peak_kib", "alloc_retained_kib"]
+
+
+def print_table(title: str, rows: Dict[str, Dict], baseline: Dict[str, Dict] = None):
+    print(f"\n=== {title} ===")
+    header = ["bench"] + COLUMNS + (["vs_base"] if baseline is not None else [])
+    print("  ".join(f"{c:>18}" for c in header))
+    for name, row in rows.items():
+        cells = [f"{name:>18}"]
+        for c in COLUMNS:
+            value = row[c]
+            cells.append(f"{value:>18.3f}" if isinstance(value, float) else f"{value:>18}")
+        if baseline is not None:
+            base = baseline.get(name)
+            if base:
+                change = (row["ops_per_sec"] / base["ops_per_sec"] - 1) * 100
+                cells.append(f"{change:>+17.1f}%")
+            else:
+                cells.append(f"{'-':>18}")
+        print("  ".join(cells))
+
+
+# ------------------ CLI ------------------
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=DATASETS, help="dataset sizes (default: 1k 10k 100k)")
+    parser.add_argument("--benches", nargs="+", choices=BENCHES, default=BENCHES)
+    parser.add_argument("--min-ops", type=int, default=10, help="minimum timed calls per benchmark")
+    parser.add_argument("--max-ops", type=int, default=2000, help="maximum timed calls per benchmark")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds of timed calls per benchmark")
+    parser.add_argument("--alloc-ops", type=int, default=5, help="calls traced with tracemalloc")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="show ops/sec change against saved results")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)["results"]
+
+    report = {
+        "meta": {"timestamp": int(time.time()), "python": platform.python_version(), "seed": args.seed},
+        "results": {},
+    }
+    for users in args.users:
+        results = asyncio.run(run_dataset(users, args))
+        report["results"][str(users)] = results
+        print_table(f"{users:,} users", results, baseline.get(str(users), {}) if baseline is not None else None)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main_cli()
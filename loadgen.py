@@ -0,0 +1,544 @@
+"""Concurrent load generator for the bot, driven through a local gateway stand-in.
+
+Instead of bot.run, the bot logs in against a fake REST API and receives
+MESSAGE_CREATE / INTERACTION_CREATE events built here, so prefix parsing,
+converters, cooldowns, hooks, views and the background tasks all run as they
+do in production. Virtual users issue a weighted mix of rob, donate, cf,
+stock and bal against generated data files; the report covers throughput,
+tail latency per step and invariant violations (coin supply drift, currency
+drift, negative balances).
+
+    python loadgen.py --users 1000 --concurrency 200 --duration 30
+    python loadgen.py --mix rob=1 donate=3 cf=3 stock=2 bal=4 --api-latency 0.05 --json load.json
+"""
+import argparse
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+os.environ.setdefault("PORT", "0")  # Health server on a free port
+
+import discord
+
+import main
+from bench import generate_dataset, user_ids
+
+MIX = {"rob": 1, "donate": 2, "cf": 3, "stock": 1, "bal": 4}
+CURRENCIES = ["BobBux", "DxBux", "Gold"]
+START_STOCK = 5000  # Below the restock cap, so restocks only ever add
+
+GUILD_ID = 1
+CHANNEL_ID = 2
+BOT_ID = 3
+OWNER_ID = 4
+TIMESTAMP = "2024-01-01T00:00:00+00:00"
+STOCK_RECEIPT = re.compile(r"You (buy|sell)ed (\d+) (\w+) for (\d+) coins")
+
+snowflakes = itertools.count(10 ** 18)
+
+
+# ------------------ GATEWAY PAYLOADS ------------------
+
+
+def user_payload(user_id: int, bot: bool = False) -> Dict:
+    return {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0",
+            "global_name": None, "avatar": None, "bot": bot}
+
+
+def member_payload(user_id: int) -> Dict:
+    return {"user": user_payload(user_id), "roles": [], "joined_at": TIMESTAMP,
+            "deaf": False, "mute": False, "flags": 0}
+
+
+def message_payload(message_id: int, author: Dict, content: str = "", embeds=None, components=None,
+                    mentions=None) -> Dict:
+    return {
+        "id": str(message_id), "channel_id": str(CHANNEL_ID), "author": author, "content": content,
+        "timestamp": TIMESTAMP, "edited_timestamp": None, "tts": False, "mention_everyone": False,
+        "mentions": mentions or [], "mention_roles": [], "attachments": [], "embeds": embeds or [],
+        "components": components or [], "pinned": False, "type": 0, "flags": 0,
+    }
+
+
+def guild_payload() -> Dict:
+    return {
+        "id": str(GUILD_ID), "name": "Load Test", "owner_id": str(OWNER_ID), "member_count": 0,
+        "features": [], "emojis": [], "stickers": [], "members": [],
+        "roles": [{"id": str(GUILD_ID), "name": "@everyone", "permissions": "1071698660929",
+                   "position": 0, "color": 0, "hoist": False, "managed": False, "mentionable": False}],
+        "channels": [{"id": str(CHANNEL_ID), "type": 0, "name": "general", "position": 0,
+                      "permission_overwrites": []}],
+    }
+
+
+def command_event(user_id: int, content: str, mentions: List[int] = ()) -> Dict:
+    data = message_payload(next(snowflakes), user_payload(user_id), content,
+                           mentions=[{**user_payload(m), "member": member_payload(m)} for m in mentions])
+    data["guild_id"] = str(GUILD_ID)
+    data["member"] = member_payload(user_id)
+    return data
+
+
+def component_event(user_id: int, message: Dict, component: Dict, values: List[str] = None) -> Dict:
+    interaction_id = next(snowflakes)
+    return {
+        "id": str(interaction_id), "application_id": str(BOT_ID), "type": 3, "token": f"token-{interaction_id}",
+        "version": 1, "guild_id": str(GUILD_ID), "channel_id": str(CHANNEL_ID),
+        "channel": {"id": str(CHANNEL_ID), "type": 0}, "locale": "en-US",
+        "member": {**member_payload(user_id), "permissions": "1071698660929"},
+        "message": message,
+        "data": {"custom_id": component["custom_id"], "component_type": component["type"], "values": values or []},
+    }
+
+
+def find_component(message: Dict, label: str) -> Optional[Dict]:
+    """A button by label or a select by placeholder."""
+    for row in message.get("components", []):
+        for component in row.get("components", []):
+            if label in (component.get("label"), component.get("placeholder")):
+                return component
+    return None
+
+
+# ------------------ FAKE REST API ------------------
+
+
+class Exchange:
+    """One request from a virtual user: the bot's replies and when it finished."""
+
+    def __init__(self):
+        self.replies: List[Dict] = []
+        self.done = asyncio.get_running_loop().create_future()
+        self.error: Optional[BaseException] = None
+
+    def finish(self, error: BaseException = None):
+        if not self.done.done():
+            self.error = error
+            self.done.set_result(None)
+
+# Set around each dispatched event; the command and view tasks inherit it
+current_exchange: contextvars.ContextVar[Optional[Exchange]] = contextvars.ContextVar("current_exchange", default=None)
+
+
+class FakeAPI:
+    """Answers the bot's REST and webhook calls locally after a simulated round trip."""
+
+    def __init__(self, latency: float, jitter: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = Counter()
+
+    async def _round_trip(self, route):
+        self.calls[route.key] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def _bot_message(self, payload: Optional[Dict], message_id: int = None) -> Dict:
+        payload = payload or {}
+        message = message_payload(message_id or next(snowflakes), user_payload(BOT_ID, bot=True),
+                                  payload.get("content") or "", payload.get("embeds"), payload.get("components"))
+        exchange = current_exchange.get()
+        if exchange is not None:
+            exchange.replies.append(message)
+        return message
+
+    async def http_request(self, route, *, files=None, form=None, **kwargs):
+        await self._round_trip(route)
+        payload = kwargs.get("json")
+        if form:
+            payload = json.loads(next(part["value"] for part in form if part["name"] == "payload_json"))
+        last_id = route.url.rsplit("/", 1)[-1]
+
+        if route.path == "/users/@me":
+            return user_payload(BOT_ID, bot=True)
+        if route.path == "/oauth2/applications/@me":
+            return {"id": str(BOT_ID), "name": "bot", "icon": None, "description": "", "rpc_origins": [],
+                    "bot_public": True, "bot_require_code_grant": False, "summary": "", "verify_key": "",
+                    "owner": user_payload(OWNER_ID), "flags": 0}
+        if route.path == "/channels/{channel_id}/messages" and route.method == "POST":
+            return self._bot_message(payload)
+        if route.path == "/channels/{channel_id}/messages/{message_id}" and route.method == "PATCH":
+            return self._bot_message(payload, int(last_id))
+        if route.path == "/guilds/{guild_id}/members/{member_id}":
+            return member_payload(int(last_id))
+        if route.path == "/users/{user_id}":
+            return user_payload(int(last_id))
+        return {}
+
+    async def webhook_request(self, adapter, route, session=None, *, payload=None, multipart=None, **kwargs):
+        await self._round_trip(route)
+        if multipart:
+            payload = json.loads(next(part["value"] for part in multipart if part["name"] == "payload_json"))
+        exchange = current_exchange.get()
+
+        if route.path.endswith("/callback"):
+            data = (payload or {}).get("data") or {}
+            if exchange is not None:
+                exchange.replies.append(message_payload(0, user_payload(BOT_ID, bot=True), data.get("content") or ""))
+                exchange.finish()
+            return None
+        if route.method in ("POST", "PATCH"):
+            message_id = route.url.rsplit("/", 1)[-1] if route.method == "PATCH" else None
+            return self._bot_message(payload, int(message_id) if message_id and message_id.isdigit() else None)
+        return None
+
+
+# ------------------ HARNESS ------------------
+
+
+class Harness:
+    def __init__(self, api: FakeAPI, timeout: float):
+        self.api = api
+        self.timeout = timeout
+        self.state = main.bot._connection
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.outcomes: Dict[str, Counter] = defaultdict(Counter)
+        self.errors: Dict[str, str] = {}
+        self.stock_coins = 0  # Coins that stock trades added to (sold) or took from (bought) wallets
+
+    async def start(self):
+        main.bot.http.request = main.timed_api(self.api.http_request)
+        discord.webhook.async_.AsyncWebhookAdapter.request = main.timed_api(self.api.webhook_request)
+        main.bot.add_listener(self.on_command_completion, "on_command_completion")
+        main.bot.add_listener(self.on_command_error, "on_command_error")
+
+        await main.bot.login("load-test")  # Runs setup_hook: dynamic items, watchdog, health server
+        self.state._add_guild_from_data(guild_payload())
+        main.bot.dispatch("ready")
+        await asyncio.sleep(0.1)
+        main.stock_restock_task.cancel()  # Restocks mint currency; keep them out of the drift check
+
+    async def stop(self):
+        await main.bot.health_runner.cleanup()
+        await main.bot.close()
+
+    async def on_command_completion(self, ctx):
+        exchange = current_exchange.get()
+        if exchange is not None:
+            exchange.finish()
+
+    async def on_command_error(self, ctx, error):
+        exchange = current_exchange.get()
+        if exchange is not None:
+            exchange.finish(error)
+
+    async def _exchange(self, step: str, parse, data: Dict) -> Optional[Exchange]:
+        exchange = Exchange()
+        token = current_exchange.set(exchange)
+        try:
+            started = time.perf_counter()
+            parse(data)
+        finally:
+            current_exchange.reset(token)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(exchange.done), self.timeout)
+        except asyncio.TimeoutError:
+            self.outcomes[step]["timeout"] += 1
+            return None
+        self.latencies[step].append(time.perf_counter() - started)
+
+        error = exchange.error
+        if error is None:
+            self.outcomes[step]["ok"] += 1
+            return exchange
+        if isinstance(error, discord.ext.commands.CommandOnCooldown):
+            self.outcomes[step]["cooldown"] += 1
+        else:
+            self.outcomes[step]["error"] += 1
+            self.errors.setdefault(f"{step}: {type(error).__name__}", repr(getattr(error, "original", error)))
+        return None
+
+    async def command(self, step: str, user_id: int, content: str, mentions: List[int] = ()) -> Optional[Exchange]:
+        return await self._exchange(step, self.state.parse_message_create, command_event(user_id, content, mentions))
+
+    async def click(self, step: str, user_id: int, message: Dict, label: str, values: List[str] = None) -> Optional[Exchange]:
+        component = find_component(message, label)
+        if component is None:
+            self.outcomes[step]["missing"] += 1
+            return None
+        return await self._exchange(step, self.state.parse_interaction_create,
+                                    component_event(user_id, message, component, values))
+
+    async def drain(self):
+        """Wait for command and view callbacks still running in the background."""
+        while True:
+            pending = [
+                task for task in asyncio.all_tasks()
+                if not task.done() and task.get_coro().__qualname__.endswith(("_run_event", "_scheduled_task"))
+            ]
+            if not pending:
+                return
+            await asyncio.wait(pending, timeout=self.timeout)
+
+
+# ------------------ SCENARIOS ------------------
+
+
+def interactive_reply(exchange: Optional[Exchange]) -> Optional[Dict]:
+    if exchange is None:
+        return None
+    return next((reply for reply in exchange.replies if reply["components"]), None)
+
+
+async def op_bal(harness: Harness, user_id: int, peers: List[int]):
+    await harness.command("bal", user_id, "-bal")
+
+
+async def op_donate(harness: Harness, user_id: int, peers: List[int]):
+    target = random.choice(peers)
+    await harness.command("donate", user_id, f"-donate <@{target}> {random.randint(1, 100)}", [target])
+
+
+async def op_rob(harness: Harness, user_id: int, peers: List[int]):
+    target = random.choice(peers)
+    await harness.command("rob", user_id, f"-rob <@{target}>", [target])
+
+
+async def op_cf(harness: Harness, user_id: int, peers: List[int]):
+    message = interactive_reply(await harness.command("cf", user_id, f"-cf {random.randint(1, 500)}"))
+    if message is not None:
+        await harness.click("cf:flip", user_id, message, random.choice(["Heads", "Tails"]))
+
+
+async def op_stock(harness: Harness, user_id: int, peers: List[int]):
+    message = interactive_reply(await harness.command("stock", user_id, "-stock"))
+    if message is None:
+        return
+    selections = [
+        ("Select Action (Buy/Sell)", random.choice(["buy", "sell"])),
+        ("Select Currency", random.choice(CURRENCIES)),
+        ("Select Amount", random.choice(["1", "5", "10"])),
+    ]
+    for placeholder, value in selections:
+        if await harness.click("stock:select", user_id, message, placeholder, [value]) is None:
+            return
+
+    exchange = await harness.click("stock:confirm", user_id, message, "Confirm")
+    for reply in exchange.replies if exchange else ():
+        receipt = STOCK_RECEIPT.search(reply["content"])
+        if receipt:
+            coins = int(receipt.group(4))
+            harness.stock_coins += coins if receipt.group(1) == "sell" else -coins
+
+
+OPS = {"rob": op_rob, "donate": op_donate, "cf": op_cf, "stock": op_stock, "bal": op_bal}
+
+
+async def virtual_user(harness: Harness, user_id: int, peers: List[int], mix: Dict[str, int],
+                       deadline: float, think: float, counts: Counter):
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        op = random.choices(names, weights)[0]
+        await OPS[op](harness, user_id, peers)
+        counts[op] += 1
+        if think:
+            await asyncio.sleep(random.expovariate(1 / think))
+
+
+# ------------------ INVARIANTS ------------------
+
+
+def coin_supply() -> int:
+    wallets = sum(main.load_balances().values())
+    banked = sum(data.get("deposited", 0) for data in main.load_bank_data().values())
+    escrowed = sum(entry["bet"] for entry in main.game_sessions.escrow.values())
+    return wallets + banked + escrowed
+
+
+def currency_supply() -> Dict[str, int]:
+    inventories = main.load_inventories()
+    stocks = main.load_currency_stocks()
+    return {
+        currency: stocks.get(currency, 0) + sum(inv.get(currency, 0) for inv in inventories.values())
+        for currency in CURRENCIES
+    }
+
+
+def house_net() -> int:
+    """Coins the casino games paid out minus what they took, across every user."""
+    return sum(
+        stats.get("won", 0) - stats.get("wagered", 0)
+        for user_stats in main.partitions.current().game_stats._all().values()
+        for stats in user_stats.values()
+    )
+
+
+def negative_holdings() -> List[str]:
+    found = [f"balance {uid}={amount}" for uid, amount in main.load_balances().items() if amount < 0]
+    for uid, inv in main.load_inventories().items():
+        found.extend(f"inventory {uid} {item}={qty}" for item, qty in inv.items()
+                     if isinstance(qty, (int, float)) and qty < 0)
+    return found
+
+
+def snapshot() -> Dict:
+    with main.guild_scope(GUILD_ID), main.store_lock:
+        return {"coins": coin_supply(), "currencies": currency_supply(), "house_net": house_net()}
+
+
+# ------------------ REPORTING ------------------
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000 if ordered else 0.0
+
+
+def build_report(harness: Harness, args, elapsed: float, counts: Counter, before: Dict, after: Dict) -> Dict:
+    steps = {}
+    for step in sorted(set(harness.latencies) | set(harness.outcomes)):
+        ordered = sorted(harness.latencies[step])
+        steps[step] = {
+            "count": len(ordered),
+            "per_sec": len(ordered) / elapsed,
+            "p50_ms": percentile(ordered, 0.50),
+            "p95_ms": percentile(ordered, 0.95),
+            "p99_ms": percentile(ordered, 0.99),
+            "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+            "outcomes": dict(harness.outcomes[step]),
+        }
+
+    expected_coins = before["coins"] + (after["house_net"] - before["house_net"]) + harness.stock_coins
+    violations = []
+    if after["coins"] != expected_coins:
+        violations.append(f"coin supply drifted by {after['coins'] - expected_coins:+d}")
+    for currency in CURRENCIES:
+        drift = after["currencies"][currency] - before["currencies"][currency]
+        if drift:
+            violations.append(f"{currency} supply drifted by {drift:+d}")
+    with main.guild_scope(GUILD_ID):
+        negatives = negative_holdings()
+    if negatives:
+        violations.append(f"{len(negatives)} negative holdings, e.g. {negatives[0]}")
+    timeouts = sum(outcomes.get("timeout", 0) for outcomes in harness.outcomes.values())
+    if timeouts:
+        violations.append(f"{timeouts} requests got no response within {args.timeout}s")
+
+    return {
+        "config": {"users": args.users, "concurrency": args.concurrency, "duration": args.duration,
+                   "mix": args.mix, "api_latency": args.api_latency, "think": args.think, "seed": args.seed},
+        "elapsed": elapsed,
+        "ops": dict(counts),
+        "ops_per_sec": sum(counts.values()) / elapsed,
+        "steps": steps,
+        "api_calls": dict(harness.api.calls),
+        "loop_lag": {key: value for key, value in main.loop_watchdog.stats().items() if key != "minutes"},
+        "startup_ms": main.startup.report(),
+        "supply": {"before": before, "after": after, "expected_coins": expected_coins,
+                   "stock_coins": harness.stock_coins},
+        "errors": harness.errors,
+        "violations": violations,
+    }
+
+
+def print_report(report: Dict):
+    print(f"\n=== {sum(report['ops'].values())} ops in {report['elapsed']:.1f}s "
+          f"({report['ops_per_sec']:.1f} ops/s) ===")
+    columns = ["count", "per_sec", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+    print("  ".join(f"{c:>14}" for c in ["step"] + columns) + "  outcomes")
+    for step, row in report["steps"].items():
+        cells = [f"{step:>14}"] + [
+            f"{row[c]:>14.2f}" if isinstance(row[c], float) else f"{row[c]:>14}" for c in columns
+        ]
+        outcomes = ", ".join(f"{k}={v}" for k, v in sorted(row["outcomes"].items()))
+        print("  ".join(cells) + f"  {outcomes}")
+
+    lag = report["loop_lag"]["recent"]
+    print(f"\nEvent loop lag: p50 {lag['p50_ms']}ms, p99 {lag['p99_ms']}ms, "
+          f"max {report['loop_lag']['max_ms']}ms, {len(report['loop_lag']['stalls'])} stalls")
+    print("Startup: " + ", ".join(f"{name} {ms:.0f}ms" for name, ms in report["startup_ms"].items()))
+    for name, example in report["errors"].items():
+        print(f"Error {name}: {example}")
+    if report["violations"]:
+        print("\nINVARIANT VIOLATIONS:")
+        for violation in report["violations"]:
+            print(f"  - {violation}")
+    else:
+        print("\nAll invariants held.")
+
+
+# ------------------ CLI ------------------
+
+
+async def run(args) -> Dict:
+    with main.guild_scope(GUILD_ID), main.store_lock:
+        generate_dataset(args.users, args.seed)
+        main.save_currency_stocks({currency: START_STOCK for currency in CURRENCIES})
+
+    harness = Harness(FakeAPI(args.api_latency, args.jitter), args.timeout)
+    await harness.start()
+    before = snapshot()
+
+    ids = user_ids(args.users)
+    counts = Counter()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(
+        virtual_user(harness, user_id, ids, args.mix, deadline, args.think, counts)
+        for user_id in ids[:args.concurrency]
+    ))
+    elapsed = time.perf_counter() - started
+    await harness.drain()
+
+    report = build_report(harness, args, elapsed, counts, before, snapshot())
+    await harness.stop()
+    return report
+
+
+def parse_mix(values: List[str]) -> Dict[str, int]:
+    mix = {}
+    for value in values:
+        op, _, weight = value.partition("=")
+        if op not in OPS or not weight.isdigit():
+            raise argparse.ArgumentTypeError(f"bad mix entry {value!r}; use e.g. rob=1 with one of {', '.join(OPS)}")
+        mix[op] = int(weight)
+    return mix
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="users in the generated dataset")
+    parser.add_argument("--concurrency", type=int, default=100, help="virtual users issuing commands at once")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to generate load for")
+    parser.add_argument("--mix", nargs="+", default=[f"{op}={w}" for op, w in MIX.items()],
+                        help="operation weights, e.g. rob=1 donate=2 cf=3 stock=1 bal=4")
+    parser.add_argument("--api-latency", type=float, default=0.02, help="simulated Discord round trip in seconds")
+    parser.add_argument("--jitter", type=float, default=0.5, help="round trip varies by +/- this fraction")
+    parser.add_argument("--think", type=float, default=0.0, help="mean pause between a user's operations")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to wait for a response")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--data-dir", help="keep the data files here instead of a temp directory")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    args = parser.parse_args()
+    args.mix = parse_mix(args.mix)
+    args.concurrency = min(args.concurrency, args.users)
+    random.seed(args.seed)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="loadgen-") as data_dir:
+        data_dir = args.data_dir or data_dir
+        os.makedirs(data_dir, exist_ok=True)
+        os.chdir(data_dir)
+        try:
+            report = asyncio.run(run(args))
+        finally:
+            os.chdir(cwd)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=4)
+    sys.exit(1 if report["violations"] else 0)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,17 +1,466 @@
 import os
 import time
+PROCESS_STARTED = time.perf_counter()  # Startup timings count from here, before the heavy imports
 import discord
 import asyncio
-from typing import List, Dict, Tuple
+import heapq
+from collections import deque
+import bisect
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import List, Dict, Tuple, Optional
 from discord.ext import commands, tasks
 import random
 import json
-from threading import Thread
-from flask import Flask
 import re
+import sys
+import threading
+import shutil
+import signal
+import subprocess
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor
+import traceback
+import math
 from datetime import datetime, timedelta
 from discord.ext.commands import cooldown, BucketType, CommandOnCooldown
 
+try:
+    import fcntl
+except ImportError:  # Windows: single process only
+    fcntl = None
+
+# ------------------ LATENCY METRICS ------------------
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; percentiles interpolate within a bucket."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)  # Last bucket is overflow
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, ms: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, q: float) -> float:
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = LATENCY_BUCKETS_MS[i - 1] if i else 0
+                upper = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max
+                return min(lower + (upper - lower) * (rank - cumulative) / bucket_count, self.max)
+            cumulative += bucket_count
+        return self.max
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else 0,
+            "p50": round(self.percentile(0.50), 3),
+            "p95": round(self.percentile(0.95), 3),
+            "p99": round(self.percentile(0.99), 3),
+            "max": round(self.max, 3),
+        }
+
+class Span:
+    """Time spent in one command or view callback, split by where it went."""
+    __slots__ = ("name", "started", "storage", "api")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.storage = 0.0
+        self.api = 0.0
+
+current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+class LatencyMetrics:
+    """Per-command and per-view-callback histograms of total, storage, Discord API and compute time (ms).
+
+    Compute is whatever is left of the total after storage and API time.
+    """
+
+    PARTS = ("total", "storage", "api", "compute")
+
+    def __init__(self):
+        self.histograms: Dict[str, Dict[str, LatencyHistogram]] = {}
+
+    def start(self, name: str):
+        return current_span.set(Span(name))
+
+    def finish(self, token):
+        span = current_span.get()
+        current_span.reset(token)
+        if span is not None:
+            self.record(span)
+
+    @contextmanager
+    def span(self, name: str):
+        token = self.start(name)
+        try:
+            yield
+        finally:
+            self.finish(token)
+
+    def record(self, span: Span):
+        total = (time.perf_counter() - span.started) * 1000
+        storage = span.storage * 1000
+        api = span.api * 1000
+        histograms = self.histograms.get(span.name)
+        if histograms is None:
+            histograms = self.histograms[span.name] = {part: LatencyHistogram() for part in self.PARTS}
+        histograms["total"].record(total)
+        histograms["storage"].record(storage)
+        histograms["api"].record(api)
+        histograms["compute"].record(max(total - storage - api, 0.0))
+
+    def add_storage(self, seconds: float):
+        span = current_span.get()
+        if span is not None:
+            span.storage += seconds
+
+    def add_api(self, seconds: float):
+        span = current_span.get()
+        if span is not None:
+            span.api += seconds
+
+    def snapshot(self) -> Dict:
+        return {
+            name: {part: histogram.summary() for part, histogram in histograms.items()}
+            for name, histograms in list(self.histograms.items())
+        }
+
+latency = LatencyMetrics()
+
+class IOStats:
+    """Storage calls, bytes and time, attributed to the command or view callback that caused them."""
+
+    def __init__(self):
+        self.by_span: Dict[str, Dict] = {}
+
+    def record(self, op: str, path: str, nbytes: int, seconds: float):
+        span = current_span.get()
+        name = span.name if span is not None else "background"
+        entry = self.by_span.get(name)
+        if entry is None:
+            entry = self.by_span[name] = {
+                "reads": 0, "writes": 0, "bytes_read": 0, "bytes_written": 0, "seconds": 0.0, "files": {}
+            }
+        if op == "read":
+            entry["reads"] += 1
+            entry["bytes_read"] += nbytes
+        else:
+            entry["writes"] += 1
+            entry["bytes_written"] += nbytes
+        entry["seconds"] += seconds
+        entry["files"][path] = entry["files"].get(path, 0) + 1
+
+    def invocations(self, name: str) -> int:
+        histograms = latency.histograms.get(name)
+        return histograms["total"].count if histograms else 0
+
+io_stats = IOStats()
+
+def record_storage(op: str, path: str, nbytes: int, seconds: float):
+    latency.add_storage(seconds)
+    io_stats.record(op, path, nbytes, seconds)
+
+def read_json(path):
+    started = time.perf_counter()
+    nbytes = 0
+    try:
+        with open(path, "rb") as f:
+            payload = f.read()
+        nbytes = len(payload)
+        return json.loads(payload)
+    finally:
+        record_storage("read", path, nbytes, time.perf_counter() - started)
+
+def write_text(path, payload: str):
+    data = payload.encode()  # Count bytes on disk, not characters
+    started = time.perf_counter()
+    try:
+        with open(path, "wb") as f:
+            f.write(data)
+    finally:
+        record_storage("write", path, len(data), time.perf_counter() - started)
+
+def append_text(path, payload: str) -> int:
+    """Append to a file; returns the bytes written."""
+    data = payload.encode()
+    started = time.perf_counter()
+    try:
+        with open(path, "ab") as f:
+            f.write(data)
+    finally:
+        record_storage("write", path, len(data), time.perf_counter() - started)
+    return len(data)
+
+def write_json(path, data, indent=None):
+    write_text(path, json.dumps(data, indent=indent))
+
+def write_json_atomic(path, data, indent=None):
+    """Write to a temp file and swap it in, so readers never see a partial file."""
+    payload = json.dumps(data, indent=indent).encode()
+    started = time.perf_counter()
+    try:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    finally:
+        record_storage("write", path, len(payload), time.perf_counter() - started)
+
+# ------------------ WORKERS & STORE LOCK ------------------
+
+WORKERS = int(os.getenv("WORKERS", 1))  # Bot processes, each running a range of shards
+WORKER_ID = int(os.getenv("WORKER_ID", 0))
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", 0)) or None
+SHARD_IDS = [int(shard) for shard in os.getenv("SHARD_IDS", "").split(",") if shard] or None
+STORE_LOCK_FILE = ".store.lock"
+SHARED_LOCK_FILE = ".shared.lock"  # Held by the worker creating the default shop_items.json
+GUILD_DATA_DIR = os.getenv("GUILD_DATA_DIR", os.path.join("data", "guilds"))
+LEGACY_GUILD_ID = int(os.getenv("LEGACY_GUILD_ID", 0)) or None  # Guild that keeps the pre-partition economy
+
+# The guild whose economy the store is working on; set by every command and component entry point
+current_guild: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("current_guild", default=None)
+
+@contextmanager
+def guild_scope(guild_id: Optional[int]):
+    token = current_guild.set(guild_id)
+    try:
+        yield
+    finally:
+        current_guild.reset(token)
+
+def partition_dir(guild_id: Optional[int]) -> str:
+    """Where a guild's files live. Outside any guild (DMs) it's the working directory."""
+    return os.path.join(GUILD_DATA_DIR, str(guild_id)) if guild_id else "."
+
+def guild_file(path: str) -> str:
+    """`path` inside the partition of the guild in scope."""
+    guild_id = current_guild.get()
+    return os.path.join(GUILD_DATA_DIR, str(guild_id), path) if guild_id else path
+
+def open_partition(guild_id: Optional[int]):
+    """Create a guild's directory on first use. LEGACY_GUILD_ID starts from the shared root files."""
+    path = partition_dir(guild_id)
+    if guild_id is None or os.path.isdir(path):
+        return
+    # Build it aside and rename it into place, so another worker never sees it half-copied
+    staging = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(staging, exist_ok=True)
+    if guild_id == LEGACY_GUILD_ID:
+        for name in PARTITIONED_FILES:
+            if os.path.exists(name):
+                shutil.copyfile(name, os.path.join(staging, name))
+    try:
+        os.rename(staging, path)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)  # Another worker got there first
+        return
+    if guild_id == LEGACY_GUILD_ID:
+        print(f"[Partitions] Guild {guild_id} inherited the shared economy files")
+
+def stranded_economy() -> List[str]:
+    """Root economy files from before partitioning that no guild has been told to inherit.
+
+    Once any partition exists the root files are the DM economy, so this
+    only fires on the first start of a pre-partition deployment.
+    """
+    if LEGACY_GUILD_ID is not None or os.path.isdir(GUILD_DATA_DIR):
+        return []
+    return [name for name in PARTITIONED_FILES if os.path.exists(name)]
+
+def worker_file(path: str) -> str:
+    """Per-worker file name for state a worker only holds in its own memory (escrows)."""
+    if WORKERS == 1:
+        return path
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.worker{WORKER_ID}{ext}"
+
+class StoreLock:
+    """Exclusive lock over the JSON files, shared by every worker process.
+
+    Every load_*/save_* pair is a read-modify-write of a whole file, so two
+    workers interleaving would lose updates. The lock is an fcntl lock on a
+    partition's STORE_LOCK_FILE (a thread lock only where fcntl is missing), re-entrant
+    within a process. Don't await while holding it; wrap coroutines in
+    locked_steps() instead.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fd = None
+        self.depth = 0
+        self.thread_lock = threading.RLock()
+        self.acquired = 0
+        self.waited = 0.0  # Seconds spent waiting for other workers
+        self.contended = 0  # try_enter() calls that found it held
+
+    def __enter__(self):
+        self._acquire(blocking=True)
+        return self
+
+    def try_enter(self) -> bool:
+        """Take the lock only if nobody else holds it; the event loop retries instead of blocking."""
+        if self._acquire(blocking=False):
+            return True
+        self.contended += 1
+        return False
+
+    def _acquire(self, blocking: bool) -> bool:
+        if not self.thread_lock.acquire(blocking=blocking):
+            return False
+        if self.depth == 0 and fcntl is not None:
+            started = time.perf_counter()
+            if self.fd is None:
+                self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(self.fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self.thread_lock.release()
+                return False
+            self.waited += time.perf_counter() - started
+            self.acquired += 1
+        self.depth += 1
+        return True
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if self.depth == 0 and fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.thread_lock.release()
+
+    def close(self) -> bool:
+        if not self.thread_lock.acquire(blocking=False):
+            return False
+        try:
+            if self.depth:
+                return False
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+            return True
+        finally:
+            self.thread_lock.release()
+
+class GuildStoreLock:
+    """`with store_lock:` takes the StoreLock of the guild in scope.
+
+    Each guild partition has its own lock file, so guilds never wait on
+    each other. STORE_FILES are shared by every guild and never written
+    under it: shop_items.json is replaced atomically, and each worker owns
+    its escrow files (worker_file) and writes them under escrow_lock.
+    """
+
+    def __init__(self):
+        self.locks: Dict[Optional[int], StoreLock] = {}
+        self.held = threading.local()
+
+    def lock(self, guild_id: Optional[int]) -> StoreLock:
+        lock = self.locks.get(guild_id)
+        if lock is None:
+            open_partition(guild_id)
+            lock = self.locks.setdefault(guild_id, StoreLock(os.path.join(partition_dir(guild_id), STORE_LOCK_FILE)))
+        return lock
+
+    def forget(self, guild_id: Optional[int]):
+        """Close an idle guild's lock file, unless something is holding it."""
+        lock = self.locks.get(guild_id)
+        if lock is not None and lock.close():
+            del self.locks[guild_id]
+
+    def __enter__(self):
+        lock = self.lock(current_guild.get())
+        lock.__enter__()
+        self.held.__dict__.setdefault("stack", []).append(lock)
+        return lock
+
+    def try_enter(self) -> bool:
+        """Non-blocking __enter__; on success leave with __exit__ as usual."""
+        lock = self.lock(current_guild.get())
+        if not lock.try_enter():
+            return False
+        self.held.__dict__.setdefault("stack", []).append(lock)
+        return True
+
+    def __exit__(self, *exc):
+        self.held.stack.pop().__exit__(*exc)
+
+    @property
+    def acquired(self) -> int:
+        return sum(lock.acquired for lock in list(self.locks.values()))
+
+    @property
+    def waited(self) -> float:
+        return sum(lock.waited for lock in list(self.locks.values()))
+
+    @property
+    def contended(self) -> int:
+        return sum(lock.contended for lock in list(self.locks.values()))
+
+store_lock = GuildStoreLock()
+# Only taken with try_enter(), by the worker that writes the default shop_items.json
+shared_store_lock = StoreLock(SHARED_LOCK_FILE)
+# Escrow files belong to one worker, so only its own threads ever wait on this
+escrow_lock = threading.RLock()
+
+STORE_LOCK_BACKOFF = 0.002  # First retry delay while another worker holds a lock
+STORE_LOCK_BACKOFF_MAX = 0.05
+
+class locked_steps:
+    """Await a coroutine with store_lock held for each step between its awaits.
+
+    Within one process asyncio already runs each step without interruption;
+    holding the lock extends that to every worker, without holding it while
+    the coroutine waits on Discord. While another worker holds the lock the
+    step is retried after an asyncio sleep, so the loop never blocks in flock.
+    """
+    __slots__ = ("coro",)
+
+    def __init__(self, coro):
+        self.coro = coro
+
+    def __await__(self):
+        value, error = None, None
+        while True:
+            delay = STORE_LOCK_BACKOFF
+            while not store_lock.try_enter():
+                try:
+                    yield from asyncio.sleep(delay).__await__()
+                except BaseException as e:
+                    # Cancelled while waiting; keep retrying, then hand the error to the coroutine under the lock
+                    value, error = None, e
+                delay = min(delay * 2, STORE_LOCK_BACKOFF_MAX)
+            try:
+                yielded = self.coro.throw(error) if error is not None else self.coro.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                store_lock.__exit__(None, None, None)
+            try:
+                value, error = (yield yielded), None
+            except BaseException as e:
+                value, error = None, e
+
+async def locked_call(guild_id: Optional[int], func, *args):
+    """Call func(*args) in guild_id's scope under locked_steps(), for store work started by the loop itself."""
+    async def call():
+        return func(*args)
+    with guild_scope(guild_id):
+        return await locked_steps(call())
+
 # ------------------ BALANCE MANAGEMENT ------------------
 
 def format_time_until(timestamp):
@@ -37,6 +486,22 @@ ROB_PROTECTION_FILE = "rob_protection.json"
 ROB_HISTORY_FILE = "rob_history.json"
 CURRENCY_STOCKS_FILE = "currency_stocks.json"
 CURRENCY_PRICES_FILE = "currency_prices.json"
+GAME_ESCROW_FILE = worker_file("game_escrow.json")
+GAME_JOURNAL_FILE = worker_file("game_journal.json")
+GAME_STATS_FILE = "game_stats.json"
+LEGACY_WHEEL_STATS_FILE = "wheel_stats.json"
+TRADE_ESCROW_FILE = worker_file("trade_escrow.json")
+TRADE_JOURNAL_FILE = worker_file("trade_journal.json")
+MARKET_ORDERS_FILE = "market_orders.json"
+MARKET_LOG_FILE = "market_orders.log"
+MARKET_BOARD_FILE = "market_board.json"
+EVENT_BALANCES_FILE = "event_balances.json"
+# Files kept per guild, under partition_dir(); shop items and the escrow files stay shared
+PARTITIONED_FILES = [
+    BALANCE_FILE, BANK_FILE, LOANS_FILE, ALLOWANCE_FILE, INVENTORY_FILE, ROB_PROTECTION_FILE,
+    ROB_HISTORY_FILE, CURRENCY_STOCKS_FILE, CURRENCY_PRICES_FILE, GAME_STATS_FILE,
+    MARKET_ORDERS_FILE, MARKET_LOG_FILE, MARKET_BOARD_FILE, EVENT_BALANCES_FILE,
+]
 WHEEL_SECTIONS = [
     {"name": "100x", "multiplier": 100, "color": 0xFF0000, "weight": 2},  # ~2.5%
     {"name": "10x", "multiplier": 10, "color": 0x00FF00, "weight": 8},    # ~10%
@@ -46,7 +511,7 @@ WHEEL_SECTIONS = [
     {"name": "1.0x", "multiplier": 1, "color": 0xFF00FF, "weight": 30},   # ~18.75%
     {"name": "0.5x", "multiplier": 0.5, "color": 0x00FFFF, "weight": 25},  # ~10%
 ]
-PLINKO_ROWS = 7
+PLINKO_ROWS = int(os.getenv("PLINKO_ROWS", 7))
 PLINKO_WIDTH = 13  # Should be odd number
 PLINKO_MULTIPLIERS = {
     0: 0.0,   # <- 0x
@@ -87,17 +552,114 @@ BANK_PLANS = {
     }
 }
 
+# ------------------ GAME RNG ------------------
+
+class AliasTable:
+    """Walker/Vose alias table: O(n) to build, O(1) per weighted draw."""
+
+    def __init__(self, outcomes: list, weights: list):
+        n = len(outcomes)
+        total = float(sum(weights))
+        scaled = [w * n / total for w in weights]
+        self.outcomes = list(outcomes)
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Whatever is left over is 1.0 up to float error
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def sample_index(self, rng: random.Random) -> int:
+        i = int(rng.random() * len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+    def sample(self, rng: random.Random):
+        return self.outcomes[self.sample_index(rng)]
+
+    def sample_many(self, rng: random.Random, k: int) -> list:
+        n = len(self.prob)
+        prob, alias, outcomes = self.prob, self.alias, self.outcomes
+        draw = rng.random
+        result = []
+        for _ in range(k):
+            i = int(draw() * n)
+            result.append(outcomes[i if draw() < prob[i] else alias[i]])
+        return result
+
+
+class GameRNG:
+    """Single random source for every game, with precomputed alias tables.
+
+    Pass a seed (or set GAME_RNG_SEED) to make every outcome reproducible
+    for tests and replays.
+    """
+
+    def __init__(self, seed=None):
+        self._rng = random.Random(seed)
+        self.rebuild_tables()
+
+    def seed(self, seed=None):
+        self._rng.seed(seed)
+
+    def rebuild_tables(self):
+        self.wheel_table = AliasTable(WHEEL_SECTIONS, [s["weight"] for s in WHEEL_SECTIONS])
+
+    # --- wheel ---
+    def spin_wheel(self) -> Dict:
+        return self.wheel_table.sample(self._rng)
+
+    def spin_wheel_many(self, k: int) -> List[Dict]:
+        return self.wheel_table.sample_many(self._rng, k)
+
+    # --- plinko ---
+    def plinko_move(self) -> int:
+        return 1 if self._rng.getrandbits(1) else -1
+
+    # --- coin flip ---
+    def coin_flip(self) -> str:
+        return "heads" if self._rng.getrandbits(1) else "tails"
+
+    def coin_flip_many(self, k: int) -> List[str]:
+        bits = self._rng.getrandbits(k) if k > 0 else 0
+        return ["heads" if (bits >> i) & 1 else "tails" for i in range(k)]
+
+    # --- generic helpers (blackjack, events) ---
+    def chance(self, probability: float) -> bool:
+        return self._rng.random() < probability
+
+    def randint(self, a: int, b: int) -> int:
+        return self._rng.randint(a, b)
+
+    def randrange(self, n: int) -> int:
+        return self._rng.randrange(n)
+
+    def choice(self, seq):
+        return seq[self._rng.randrange(len(seq))]
+
+    def shuffle(self, seq: list):
+        self._rng.shuffle(seq)
+
+
+game_rng = GameRNG(os.getenv("GAME_RNG_SEED"))
+
 
 def load_balances():
     try:
-        with open(BALANCE_FILE, "r") as f:
-            return json.load(f)
+        return read_json(guild_file(BALANCE_FILE))
     except FileNotFoundError:
         return {}
 
 def save_balances(balances):
-    with open(BALANCE_FILE, "w") as f:
-        json.dump(balances, f)
+    write_json_atomic(guild_file(BALANCE_FILE), balances)
 
 def get_balance(user_id):
     balances = load_balances()
@@ -118,29 +680,25 @@ def update_balance(user_id: int, amount: int):
 
 def load_currency_stocks():
     try:
-        with open(CURRENCY_STOCKS_FILE, "r") as f:
-            return json.load(f)
+        return read_json(guild_file(CURRENCY_STOCKS_FILE))
     except FileNotFoundError:
         stocks = {"BobBux": 10000, "DxBux": 10000, "Gold": 10000}
         save_currency_stocks(stocks)
         return stocks
 
 def save_currency_stocks(stocks):
-    with open(CURRENCY_STOCKS_FILE, "w") as f:
-        json.dump(stocks, f)
+    write_json(guild_file(CURRENCY_STOCKS_FILE), stocks)
 
 def load_currency_prices():
     try:
-        with open(CURRENCY_PRICES_FILE, "r") as f:
-            return json.load(f)
+        return read_json(guild_file(CURRENCY_PRICES_FILE))
     except FileNotFoundError:
         prices = {"BobBux": 500, "DxBux": 750, "Gold": 1000}
         save_currency_prices(prices)
         return prices
 
 def save_currency_prices(prices):
-    with open(CURRENCY_PRICES_FILE, "w") as f:
-        json.dump(prices, f)
+    write_json(guild_file(CURRENCY_PRICES_FILE), prices)
 
 def update_currency_price(currency_name: str, amount: int, is_buy: bool) -> int:
     """Update currency price based on market activity"""
@@ -193,43 +751,17 @@ def update_currency_price(currency_name: str, amount: int, is_buy: bool) -> int:
     
     return new_price
 
-def load_inventories():
-    try:
-        with open(INVENTORY_FILE, "r") as f:
-            inventories = json.load(f)
-    except FileNotFoundError:
-        inventories = {}
-    
-    for user_id, inv in inventories.items():
-        for currency in ["BobBux", "DxBux", "Gold"]:
-            if currency not in inv:
-                inv[currency] = 0
-                
-    return inventories
-
-def get_inventory(user_id):
-    inventories = load_inventories()
-    user_inv = inventories.get(str(user_id), {})
-    
-    for currency in ["BobBux", "DxBux", "Gold"]:
-        if currency not in user_inv:
-            user_inv[currency] = 0
-    
-    return user_inv
-
 
 # ------------------ LOAN MANAGEMENT ------------------
 
 def load_loans():
     try:
-        with open(LOANS_FILE, "r") as f:
-            return json.load(f)
+        return read_json(guild_file(LOANS_FILE))
     except FileNotFoundError:
         return {}
 
 def save_loans(loans):
-    with open(LOANS_FILE, "w") as f:
-        json.dump(loans, f)
+    write_json(guild_file(LOANS_FILE), loans)
 
 def get_loan(user_id):
     loans = load_loans()
@@ -260,14 +792,12 @@ def repay_loan(user_id):
 
 def load_allowances():
     try:
-        with open(ALLOWANCE_FILE, "r") as f:
-            return json.load(f)
+        return read_json(guild_file(ALLOWANCE_FILE))
     except FileNotFoundError:
         return {}
 
 def save_allowances(allowances):
-    with open(ALLOWANCE_FILE, "w") as f:
-        json.dump(allowances, f)
+    write_json(guild_file(ALLOWANCE_FILE), allowances)
 
 def can_claim_allowance(user_id):
     allowances = load_allowances()
@@ -286,14 +816,12 @@ def update_allowance_claim(user_id):
 
 def load_bank_data():
     try:
-        with open(BANK_FILE, "r") as f:
-            return json.load(f)
+        return read_json(guild_file(BANK_FILE))
     except FileNotFoundError:
         return {}
 
 def save_bank_data(bank_data):
-    with open(BANK_FILE, "w") as f:
-        json.dump(bank_data, f)
+    write_json(guild_file(BANK_FILE), bank_data)
         
 def get_bank_data(user_id):
     bank_data = load_bank_data()
@@ -317,7 +845,364 @@ def update_bank_data(user_id, data):
 intents = discord.Intents.default()
 intents.message_content = True
 
-bot = commands.Bot(command_prefix="-", intents=intents)
+class StoreLockedInvoke:
+    """Runs every command in its guild's partition under locked_steps(), so workers don't interleave store writes."""
+
+    async def invoke(self, ctx):
+        with guild_scope(ctx.guild.id if ctx.guild else None):
+            await locked_steps(super().invoke(ctx))
+
+class Bot(StoreLockedInvoke, commands.Bot):
+    pass
+
+class ShardedBot(StoreLockedInvoke, commands.AutoShardedBot):
+    pass
+
+if SHARD_COUNT or SHARD_IDS:
+    bot = ShardedBot(command_prefix="-", intents=intents, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+else:
+    bot = Bot(command_prefix="-", intents=intents)
+
+@bot.before_invoke
+async def start_command_span(ctx):
+    ctx.latency_token = latency.start(f"cmd:{ctx.command.qualified_name}")
+
+@bot.after_invoke
+async def finish_command_span(ctx):
+    latency.finish(ctx.latency_token)
+    startup.mark("first_command")
+
+def timed_api(request):
+    @functools.wraps(request)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await request(*args, **kwargs)
+        finally:
+            latency.add_api(time.perf_counter() - started)
+    return wrapper
+
+# Both request methods are discord.py internals, so only patch the versions requirements.txt pins
+if discord.version_info[:2] == (2, 4):
+    bot.http.request = timed_api(bot.http.request)
+    # Interaction responses and followups go through the webhook adapter, not bot.http
+    discord.webhook.async_.AsyncWebhookAdapter.request = timed_api(discord.webhook.async_.AsyncWebhookAdapter.request)
+else:
+    print(f"[Latency] discord.py {discord.__version__} isn't pinned; API call timing is off")
+
+def callback_name(item: discord.ui.Item) -> str:
+    # Decorated buttons/selects wrap the view method; subclassed items define callback themselves
+    func = getattr(item.callback, "callback", None)
+    return func.__name__ if func is not None else type(item).__name__
+
+def timed_callback(func):
+    """Latency span, guild partition and store lock for a component callback that doesn't belong to a ManagedView."""
+    @functools.wraps(func)
+    async def wrapper(self, interaction: discord.Interaction):
+        with latency.span(f"view:{type(self).__name__}"), guild_scope(interaction.guild_id):
+            return await locked_steps(func(self, interaction))
+    return wrapper
+
+# ------------------ EMBED TEMPLATES ------------------
+
+class TemplateCache:
+    """Builds embeds and option lists from constant catalog data once.
+
+    A template can have a version function (e.g. the shop file's mtime);
+    when it returns something new the template is rebuilt on next use.
+    Templates without one are built once; call invalidate() if the
+    underlying constant is changed at runtime.
+    """
+
+    def __init__(self):
+        self.builders = {}
+        self.cache = {}
+
+    def register(self, key: str, builder, version=None):
+        self.builders[key] = (builder, version)
+
+    def get(self, key: str):
+        """The cached value itself; treat it as read-only."""
+        builder, version = self.builders[key]
+        current = version() if version else None
+        cached = self.cache.get(key)
+        if cached is None or cached[0] != current:
+            cached = self.cache[key] = (current, builder())
+        return cached[1]
+
+    def embed(self, key: str, *path) -> discord.Embed:
+        """A fresh Embed cloned from a cached embed dict (optionally nested under `path`)."""
+        data = self.get(key)
+        for part in path:
+            data = data[part]
+        return discord.Embed.from_dict({**data, "fields": [field.copy() for field in data.get("fields", [])]})
+
+    def invalidate(self, key: str = None):
+        if key is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(key, None)
+
+templates = TemplateCache()
+
+def _shop_catalog_version():
+    shop_catalog.refresh()
+    return shop_catalog.version
+
+def _build_shop_items():
+    return {
+        item_id: {
+            "name": item_data["name"],
+            "value": f"{item_data['description']}\nPrice: {item_data['price']} coins",
+            "inline": False
+        }
+        for item_id, item_data in load_shop_items().items()
+    }
+
+def _build_shop_header():
+    return discord.Embed(
+        title="🛒 Shop",
+        description="Select an item and a quantity, then press Buy!",
+        color=discord.Color.green()
+    ).to_dict()
+
+def _build_event_shop():
+    embed = discord.Embed(
+        title="🛒 Event Shop",
+        description="Spend your event gold on exclusive items!",
+        color=discord.Color.orange()
+    )
+    for name, cost in EVENT_SHOP.items():
+        embed.add_field(name=name, value=f"{cost} event gold", inline=False)
+    return embed.to_dict()
+
+def _build_event_shop_options():
+    return [
+        discord.SelectOption(label=item, description=f"{cost} event gold")
+        for item, cost in EVENT_SHOP.items()
+    ]
+
+def _build_bank_plans():
+    return "\n".join(
+        f"• **{plan['name']}**: {plan['interest']*100}% daily (Min: {plan['min_deposit']:,} coins)"
+        for plan in BANK_PLANS.values()
+    )
+
+def _build_wheel():
+    embed = discord.Embed(title="Wheel of Fortune", color=0x7289DA)
+    for section in WHEEL_SECTIONS:
+        embed.add_field(
+            name=section["name"],
+            value=f"{section['multiplier']}x payout",
+            inline=True
+        )
+    return embed.to_dict()
+
+def _build_event():
+    embed = discord.Embed(
+        title="💰 Greed or Glory!",
+        description=(
+            "You enter the Vault of Midas...\n"
+            "Each step earns more event gold, but one trap and it's all gone.\n\n"
+            "Choose: Go deeper for more riches, or escape with what you have."
+        ),
+        color=discord.Color.gold()
+    )
+    embed.set_footer(text="Trap chance: 10% per round")
+    return embed.to_dict()
+
+templates.register("shop_header", _build_shop_header)
+templates.register("shop_items", _build_shop_items, version=_shop_catalog_version)
+templates.register("event_shop", _build_event_shop)
+templates.register("event_shop_options", _build_event_shop_options)
+templates.register("bank_plans", _build_bank_plans)
+templates.register("wheel", _build_wheel)
+templates.register("event", _build_event)
+
+# ------------------ VIEW REGISTRY ------------------
+MAX_VIEWS_PER_USER = int(os.getenv("MAX_VIEWS_PER_USER", 5))
+MAX_VIEWS_PER_TYPE = int(os.getenv("MAX_VIEWS_PER_TYPE", 1000))
+MAX_VIEWS_TOTAL = int(os.getenv("MAX_VIEWS_TOTAL", 5000))
+
+def estimate_view_size(view: discord.ui.View) -> int:
+    """Shallow size in bytes of a view, its attributes and its components."""
+    size = sys.getsizeof(view) + sys.getsizeof(view.__dict__)
+    for child in view.children:
+        size += sys.getsizeof(child) + sys.getsizeof(child.__dict__)
+    return size
+
+class ViewRegistry:
+    """Live views by type and owner, with caps that evict the oldest view.
+
+    Dicts keep insertion order, so the first evictable entry of each index
+    is the oldest view that can go. Views that aren't evictable (games,
+    whose timeout settles the bet) are never evicted and don't count
+    toward the per-user cap; the session limits bound them instead.
+    """
+
+    def __init__(self, per_user: int = MAX_VIEWS_PER_USER, per_type: int = MAX_VIEWS_PER_TYPE,
+                 total: int = MAX_VIEWS_TOTAL):
+        self.per_user = per_user
+        self.per_type = per_type
+        self.total = total
+        self.views: Dict["ManagedView", None] = {}
+        self.by_type: Dict[str, Dict["ManagedView", None]] = {}
+        self.by_user: Dict[int, Dict["ManagedView", None]] = {}
+        self.tracked = 0
+        self.peak = 0
+        self.evicted = {"user": 0, "type": 0, "total": 0}
+        self.tasks = set()
+
+    def _spawn(self, coro):
+        # The loop only keeps weak references to tasks
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def track(self, view: "ManagedView"):
+        if view in self.views:
+            return
+        view_type = type(view).__name__
+        by_type = self.by_type.setdefault(view_type, {})
+        by_user = None
+        if view.owner_id is not None and view.evictable:
+            by_user = self.by_user.setdefault(view.owner_id, {})
+
+        if by_user is not None and len(by_user) >= self.per_user:
+            self.evict_oldest(by_user, "user")
+        if len(by_type) >= self.per_type and view.evictable:
+            self.evict_oldest(by_type, "type")
+        if len(self.views) >= self.total:
+            self.evict_oldest(self.views, "total")
+
+        self.views[view] = None
+        by_type[view] = None
+        if by_user is not None:
+            by_user[view] = None
+        self.tracked += 1
+        self.peak = max(self.peak, len(self.views))
+        self._spawn(self._untrack_when_done(view))
+
+    def untrack(self, view: "ManagedView"):
+        if view not in self.views:
+            return
+        del self.views[view]
+        view_type = type(view).__name__
+        del self.by_type[view_type][view]
+        if not self.by_type[view_type]:
+            del self.by_type[view_type]
+        if view.owner_id is not None and view.evictable:
+            del self.by_user[view.owner_id][view]
+            if not self.by_user[view.owner_id]:
+                del self.by_user[view.owner_id]
+
+    def evict_oldest(self, views: Dict["ManagedView", None], reason: str):
+        view = next((view for view in views if view.evictable), None)
+        if view is not None:
+            self.evict(view, reason)
+
+    def evict(self, view: "ManagedView", reason: str):
+        """Time the view out early: stop it and run its timeout handler.
+
+        The handler runs as its own task, so views that settle store state
+        there take the store lock through locked_call().
+        """
+        self.untrack(view)
+        self.evicted[reason] += 1
+        view.stop()
+        self._spawn(view.on_timeout())
+
+    async def _untrack_when_done(self, view: "ManagedView"):
+        await view.wait()
+        self.untrack(view)
+
+    def stats(self) -> Dict:
+        by_type = {}
+        for view_type, views in self.by_type.items():
+            by_type[view_type] = {
+                "live": len(views),
+                "bytes": sum(estimate_view_size(view) for view in views),
+            }
+        return {
+            "live": len(self.views),
+            "peak": self.peak,
+            "tracked": self.tracked,
+            "users": len(self.by_user),
+            "bytes": sum(entry["bytes"] for entry in by_type.values()),
+            "evicted": dict(self.evicted),
+            "by_type": by_type,
+        }
+
+view_registry = ViewRegistry()
+
+class ManagedView(discord.ui.View):
+    """A view tracked by view_registry once it's sent.
+
+    Set `message` to the sent message: that starts tracking, and lets a
+    timeout or eviction disable the components in place.
+    """
+
+    evictable = True  # False for views whose timeout settles a game
+
+    def __init__(self, owner_id: Optional[int], *, timeout: Optional[float] = 180):
+        super().__init__(timeout=timeout)
+        self.owner_id = owner_id
+        self._message = None
+        self.created_at = time.time()
+        for item in self.children:
+            self._wrap_callback(item)
+
+    def add_item(self, item: discord.ui.Item):
+        self._wrap_callback(item)
+        return super().add_item(item)
+
+    def _wrap_callback(self, item: discord.ui.Item):
+        """Run the item's callback in a latency span and its guild's partition, under the store lock."""
+        callback = item.callback
+        if getattr(callback, "store_locked", False):
+            return
+        name = f"view:{type(self).__name__}.{callback_name(item)}"
+
+        async def wrapper(interaction: discord.Interaction):
+            with latency.span(name), guild_scope(interaction.guild_id):
+                return await locked_steps(callback(interaction))
+        wrapper.store_locked = True
+        item.callback = wrapper
+
+    @property
+    def message(self) -> Optional[discord.Message]:
+        return self._message
+
+    @message.setter
+    def message(self, message: Optional[discord.Message]):
+        self._message = message
+        if message is not None:
+            view_registry.track(self)
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
+
+class GuildModal(discord.ui.Modal):
+    """A modal whose on_submit runs in the submitting guild's partition, under the store lock."""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        on_submit = cls.__dict__.get("on_submit")
+        if on_submit is not None:
+            cls.on_submit = guild_locked(on_submit)
+
+def guild_locked(func):
+    @functools.wraps(func)
+    async def wrapper(self, interaction: discord.Interaction):
+        with guild_scope(interaction.guild_id):
+            return await locked_steps(func(self, interaction))
+    return wrapper
 
 # ------------------ LOAN COMMANDS ------------------
 
@@ -617,20 +1502,244 @@ async def donate(ctx, member: discord.Member, amount: int):
 
 # ------------------ TRADING ------------------
 
+TRADE_ITEMS = {  # Inventory key -> display name
+    "BobBux": "BobBux",
+    "DxBux": "DxBux",
+    "Gold": "Gold",
+    "phone": "Phone",
+    "padlock": "Padlock",
+}
+
+def format_trade_side(items: Dict, coins: int) -> str:
+    parts = [f"{qty}x {TRADE_ITEMS.get(item, item)}" for item, qty in items.items()]
+    if coins:
+        parts.append(f"{coins} coins")
+    return ", ".join(parts) or "Nothing"
+
+class Trade:
+    __slots__ = ("id", "guild_id", "initiator_id", "recipient_id", "offer_items", "offer_coins",
+                 "want_items", "want_coins", "closed")
+
+    def __init__(self, trade_id: str, guild_id: Optional[int], initiator_id: int, recipient_id: int,
+                 offer_items: Dict, offer_coins: int, want_items: Dict, want_coins: int):
+        self.id = trade_id
+        self.guild_id = guild_id
+        self.initiator_id = initiator_id
+        self.recipient_id = recipient_id
+        self.offer_items = offer_items
+        self.offer_coins = offer_coins
+        self.want_items = want_items
+        self.want_coins = want_coins
+        self.closed = False
+
+    def to_dict(self) -> Dict:
+        return {
+            "guild_id": self.guild_id,
+            "initiator_id": self.initiator_id,
+            "recipient_id": self.recipient_id,
+            "offer_items": self.offer_items,
+            "offer_coins": self.offer_coins,
+            "want_items": self.want_items,
+            "want_coins": self.want_coins,
+        }
+
+def load_trade_escrow():
+    try:
+        return read_json(TRADE_ESCROW_FILE)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_trade_escrow(escrow):
+    with escrow_lock:
+        write_json_atomic(TRADE_ESCROW_FILE, escrow)
+
+def load_trade_journal():
+    try:
+        return read_json(TRADE_JOURNAL_FILE)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_trade_journal(journal):
+    with escrow_lock:
+        write_json_atomic(TRADE_JOURNAL_FILE, journal)
+
+class TradeEngine:
+    """Escrows the initiator's side of a trade from the moment it is sent.
+
+    Every step reads and writes balances.json and inventories.json at most
+    once, so a trade costs the same I/O no matter how many users exist,
+    and other users' data is always written back untouched.
+
+    A step touches up to three files, so it is journaled first: the
+    journal holds the final values of the users it changes and the escrow
+    after it. A crash midway is finished from the journal on the next
+    start, before orphaned escrow is released.
+    """
+
+    def __init__(self):
+        self.trades: Dict[str, Trade] = {}
+        self._counter = 0
+
+    def open(self, initiator_id: int, recipient_id: int, offer_items: Dict, offer_coins: int,
+             want_items: Dict, want_coins: int) -> Tuple[Optional[Trade], str]:
+        """Move the offered items and coins into escrow. Returns (trade, "") or (None, reason)."""
+        balances = load_balances()
+        inventories = load_inventories()
+        uid = str(initiator_id)
+        balance = balances.get(uid, 1000)
+        inv = inventories.setdefault(uid, {})
+
+        for item, qty in offer_items.items():
+            if inv.get(item, 0) < qty:
+                return None, f"You don't have {qty}x {TRADE_ITEMS.get(item, item)}."
+        if balance < offer_coins:
+            return None, f"You don't have {offer_coins} coins."
+
+        for item, qty in offer_items.items():
+            inv[item] -= qty
+        if offer_coins:
+            balances[uid] = balance - offer_coins
+
+        self._counter += 1
+        trade = Trade(f"{int(time.time())}-{self._counter}", current_guild.get(), initiator_id, recipient_id,
+                      dict(offer_items), offer_coins, dict(want_items), want_coins)
+        self.trades[trade.id] = trade
+        self._commit([uid], balances if offer_coins else None, inventories if offer_items else None,
+                     self._escrow())
+        return trade, ""
+
+    def settle(self, trade: Trade) -> str:
+        """Swap both sides in one commit. Returns "" on success, else why it failed."""
+        with guild_scope(trade.guild_id), store_lock:
+            return self._settle(trade)
+
+    def _settle(self, trade: Trade) -> str:
+        if trade.closed:
+            return "This trade is no longer open."
+        balances = load_balances()
+        inventories = load_inventories()
+        initiator, recipient = str(trade.initiator_id), str(trade.recipient_id)
+        recipient_inv = inventories.setdefault(recipient, {})
+        recipient_balance = balances.get(recipient, 1000)
+
+        for item, qty in trade.want_items.items():
+            if recipient_inv.get(item, 0) < qty:
+                return f"You don't have {qty}x {TRADE_ITEMS.get(item, item)}."
+        if recipient_balance < trade.want_coins:
+            return f"You don't have {trade.want_coins} coins."
+
+        initiator_inv = inventories.setdefault(initiator, {})
+        for item, qty in trade.want_items.items():
+            recipient_inv[item] -= qty
+            initiator_inv[item] = initiator_inv.get(item, 0) + qty
+        for item, qty in trade.offer_items.items():
+            recipient_inv[item] = recipient_inv.get(item, 0) + qty
+
+        balances[recipient] = recipient_balance - trade.want_coins + trade.offer_coins
+        balances[initiator] = balances.get(initiator, 1000) + trade.want_coins
+
+        self._close(trade)
+        self._commit([initiator, recipient], balances, inventories, self._escrow())
+        return ""
+
+    def release(self, trade: Trade) -> bool:
+        """Return escrow to the initiator. False if the trade was already closed."""
+        with guild_scope(trade.guild_id), store_lock:
+            if trade.closed:
+                return False
+            self._close(trade)
+            self._refund(trade.initiator_id, trade.offer_items, trade.offer_coins, self._escrow())
+            return True
+
+    def release_orphaned(self) -> int:
+        """Finish an interrupted step, then return escrow left behind by a previous run. Call once at startup."""
+        self.recover()
+        orphaned = load_trade_escrow()
+        released = len(orphaned)
+        # Each refund commits the escrow without its entry, so a crash here never refunds twice
+        for trade_id, entry in list(orphaned.items()):
+            del orphaned[trade_id]
+            with guild_scope(entry.get("guild_id", LEGACY_GUILD_ID)), store_lock:
+                self._refund(entry["initiator_id"], entry["offer_items"], entry["offer_coins"], dict(orphaned))
+        if released:
+            print(f"[Trades] Released {released} orphaned trade escrows")
+        return released
+
+    def recover(self) -> bool:
+        """Apply a journaled step a crash left half-written. True if there was one."""
+        journal = load_trade_journal()
+        if not journal:
+            return False
+        # The journal holds final values, so applying it again is harmless
+        with guild_scope(journal["guild_id"]), store_lock:
+            if journal["inventories"] is not None:
+                inventories = load_inventories()
+                inventories.update(journal["inventories"])
+                save_inventories(inventories)
+            if journal["balances"] is not None:
+                balances = load_balances()
+                balances.update(journal["balances"])
+                save_balances(balances)
+        save_trade_escrow(journal["escrow"])
+        save_trade_journal({})
+        print("[Trades] Finished a trade step interrupted by the last shutdown")
+        return True
+
+    def _refund(self, user_id: int, items: Dict, coins: int, escrow: Dict):
+        uid = str(user_id)
+        inventories = balances = None
+        if items:
+            inventories = load_inventories()
+            inv = inventories.setdefault(uid, {})
+            for item, qty in items.items():
+                inv[item] = inv.get(item, 0) + qty
+        if coins:
+            balances = load_balances()
+            balances[uid] = balances.get(uid, 1000) + coins
+        self._commit([uid], balances, inventories, escrow)
+
+    def _commit(self, user_ids: List[str], balances: Optional[Dict], inventories: Optional[Dict], escrow: Dict):
+        """Write a step's balances, inventories and escrow, journaled so a crash can't leave it half done."""
+        save_trade_journal({
+            "guild_id": current_guild.get(),
+            "balances": {uid: balances[uid] for uid in user_ids if uid in balances} if balances is not None else None,
+            "inventories": (
+                {uid: inventories[uid] for uid in user_ids if uid in inventories} if inventories is not None else None
+            ),
+            "escrow": escrow,
+        })
+        if inventories is not None:
+            save_inventories(inventories)
+        if balances is not None:
+            save_balances(balances)
+        save_trade_escrow(escrow)
+        save_trade_journal({})
+
+    def _close(self, trade: Trade):
+        trade.closed = True
+        self.trades.pop(trade.id, None)
+
+    def _escrow(self) -> Dict:
+        return {trade_id: trade.to_dict() for trade_id, trade in self.trades.items()}
+
+trade_engine = TradeEngine()
+
+
 
 @bot.command()
 async def trade(ctx, member: discord.Member):
     if member.id == ctx.author.id:
         return await ctx.send("You can't trade with yourself.")
     await ctx.send(f"{ctx.author.mention} is starting a trade with {member.mention}...")
-    await ctx.send("Please select what you want to offer:", view=TradeOfferView(ctx.author, member))
+    view = TradeOfferView(ctx.author, member)
+    view.message = await ctx.send("Please select what you want to offer:", view=view)
 
 
 # --- Trade UI ---
 
-class TradeOfferView(discord.ui.View):
+class TradeOfferView(ManagedView):
     def __init__(self, initiator, recipient):
-        super().__init__(timeout=120)
+        super().__init__(initiator.id, timeout=120)
         self.initiator = initiator
         self.recipient = recipient
         self.offered_items = {}  # item_name: quantity
@@ -638,13 +1747,7 @@ class TradeOfferView(discord.ui.View):
 
     @discord.ui.select(
         placeholder="Select items to offer", min_values=1, max_values=5,
-        options=[
-            discord.SelectOption(label="BobBux", value="BobBux"),
-            discord.SelectOption(label="DxBux", value="DxBux"),
-            discord.SelectOption(label="Gold", value="Gold"),
-            discord.SelectOption(label="Phone", value="Phone"),
-            discord.SelectOption(label="Padlock", value="Padlock"),
-        ]
+        options=[discord.SelectOption(label=label, value=item) for item, label in TRADE_ITEMS.items()]
     )
     async def select_items(self, interaction: discord.Interaction, select: discord.ui.Select):
         if interaction.user != self.initiator:
@@ -653,7 +1756,8 @@ class TradeOfferView(discord.ui.View):
         # Set default quantity = 1 for all selected items
         self.offered_items = {item: 1 for item in select.values}
         await interaction.response.send_message(
-            f"Selected items: {', '.join(select.values)}. Use 'Set Quantities' button to edit amounts.",
+            f"Selected items: {', '.join(TRADE_ITEMS[item] for item in select.values)}. "
+            "Use 'Set Quantities' button to edit amounts.",
             ephemeral=True
         )
 
@@ -685,11 +1789,12 @@ class TradeOfferView(discord.ui.View):
             if qty <= 0:
                 return await interaction.response.send_message("Quantities must be positive.", ephemeral=True)
 
-        await interaction.message.edit(content="What do you want in return from the recipient?", view=TradeRequestView(
-            self.initiator, self.recipient, self.offered_items, self.offered_coins
-        ))
+        view = TradeRequestView(self.initiator, self.recipient, self.offered_items, self.offered_coins)
+        view.message = interaction.message
+        self.stop()
+        await interaction.message.edit(content="What do you want in return from the recipient?", view=view)
 
-class SetQuantitiesModal(discord.ui.Modal, title="Set Quantities for Offered Items"):
+class SetQuantitiesModal(GuildModal, title="Set Quantities for Offered Items"):
     def __init__(self, trade_view: TradeOfferView):
         super().__init__()
         self.trade_view = trade_view
@@ -699,7 +1804,7 @@ class SetQuantitiesModal(discord.ui.Modal, title="Set Quantities for Offered Ite
             default_value = str(self.trade_view.offered_items[item])
             self.add_item(
                 discord.ui.TextInput(
-                    label=f"Quantity for {item}",
+                    label=f"Quantity for {TRADE_ITEMS.get(item, item)}",
                     default=default_value,
                     placeholder="Enter quantity",
                     required=True,
@@ -722,12 +1827,12 @@ class SetQuantitiesModal(discord.ui.Modal, title="Set Quantities for Offered Ite
 
         self.trade_view.offered_items = new_quantities
         await interaction.response.send_message(
-            f"Updated quantities: {', '.join(f'{k}: {v}' for k,v in new_quantities.items())}",
+            f"Updated quantities: {format_trade_side(new_quantities, 0)}",
             ephemeral=True
         )
 
 
-class CoinModal(discord.ui.Modal, title="Enter coins to offer"):
+class CoinModal(GuildModal, title="Enter coins to offer"):
     amount = discord.ui.TextInput(label="Coins", placeholder="Amount to offer", required=True)
 
     def __init__(self, view_ref):
@@ -748,9 +1853,9 @@ class CoinModal(discord.ui.Modal, title="Enter coins to offer"):
             await interaction.response.send_message("Enter a valid positive number.", ephemeral=True)
 
 
-class TradeRequestView(discord.ui.View):
+class TradeRequestView(ManagedView):
     def __init__(self, initiator, recipient, offered_items, offered_coins):
-        super().__init__(timeout=120)
+        super().__init__(initiator.id, timeout=120)
         self.initiator = initiator
         self.recipient = recipient
         self.offered_items = offered_items
@@ -760,20 +1865,16 @@ class TradeRequestView(discord.ui.View):
 
     @discord.ui.select(
         placeholder="What do you want in return?", min_values=1, max_values=5,
-        options=[
-            discord.SelectOption(label="BobBux"),
-            discord.SelectOption(label="DxBux"),
-            discord.SelectOption(label="Gold"),
-            discord.SelectOption(label="Phone"),
-            discord.SelectOption(label="Padlock"),
-        ]
+        options=[discord.SelectOption(label=label, value=item) for item, label in TRADE_ITEMS.items()]
     )
     async def want_items(self, interaction: discord.Interaction, select: discord.ui.Select):
         if interaction.user != self.initiator:
             return await interaction.response.send_message("You can't modify this trade.", ephemeral=True)
 
         self.requested_items = {item: 1 for item in select.values}
-        await interaction.response.send_message(f"Requested: {', '.join(select.values)} (default 1)", ephemeral=True)
+        await interaction.response.send_message(
+            f"Requested: {', '.join(TRADE_ITEMS[item] for item in select.values)} (default 1)", ephemeral=True
+        )
 
     @discord.ui.button(label="Request Coins", style=discord.ButtonStyle.blurple)
     async def request_coins(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -786,28 +1887,35 @@ class TradeRequestView(discord.ui.View):
         if interaction.user != self.initiator:
             return await interaction.response.send_message("Only the initiator can send this trade.", ephemeral=True)
 
+        # The offered side leaves the initiator's wallet and inventory until the trade closes
+        trade, error = trade_engine.open(
+            self.initiator.id, self.recipient.id,
+            self.offered_items, self.offered_coins,
+            self.requested_items, self.requested_coins
+        )
+        if trade is None:
+            return await interaction.response.send_message(f"❌ {error}", ephemeral=True)
+
+        self.stop()
+        await interaction.response.edit_message(content="📨 Trade request sent!", view=None)
+
         embed = discord.Embed(
             title="Trade Offer",
             description=f"{self.initiator.mention} wants to trade with you.",
             color=discord.Color.blue()
         )
-        embed.add_field(name="They offer", value=f"{self.offered_items} + {self.offered_coins} coins", inline=False)
-        embed.add_field(name="They want", value=f"{self.requested_items} + {self.requested_coins} coins", inline=False)
+        embed.add_field(name="They offer", value=format_trade_side(trade.offer_items, trade.offer_coins), inline=False)
+        embed.add_field(name="They want", value=format_trade_side(trade.want_items, trade.want_coins), inline=False)
 
-        view = TradeAcceptView(
-            self.initiator, self.recipient,
-            self.offered_items, self.offered_coins,
-            self.requested_items, self.requested_coins
-        )
-
-        await interaction.channel.send(
+        view = TradeAcceptView(trade, self.initiator, self.recipient)
+        view.message = await interaction.channel.send(
             f"{self.recipient.mention}, you have a new trade request!",
             embed=embed,
             view=view
         )
 
 
-class RequestCoinModal(discord.ui.Modal, title="Enter coins to request"):
+class RequestCoinModal(GuildModal, title="Enter coins to request"):
     amount = discord.ui.TextInput(label="Coins", placeholder="Amount to request", required=True)
 
     def __init__(self, view_ref):
@@ -825,95 +1933,585 @@ class RequestCoinModal(discord.ui.Modal, title="Enter coins to request"):
             await interaction.response.send_message("Enter a valid positive number.", ephemeral=True)
 
 
-class TradeAcceptView(discord.ui.View):
-    def __init__(self, user1, user2, offer1_items, offer1_coins, want_items, want_coins):
-        super().__init__(timeout=60)
+class TradeAcceptView(ManagedView):
+    evictable = False  # Its timeout releases the initiator's escrow, so only the trade's own timeout may end it
+
+    def __init__(self, trade: Trade, user1, user2):
+        super().__init__(user2.id, timeout=60)
+        self.trade = trade
         self.user1 = user1
         self.user2 = user2
-        self.offer1_items = offer1_items
-        self.offer1_coins = offer1_coins
-        self.want_items = want_items
-        self.want_coins = want_coins
 
     @discord.ui.button(label="Accept ✅", style=discord.ButtonStyle.success)
     async def accept(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user != self.user2:
             return await interaction.response.send_message("You're not the recipient!", ephemeral=True)
 
-        inv1 = get_inventory(self.user1.id)
-        inv2 = get_inventory(self.user2.id)
-        bal1 = get_balance(self.user1.id)
-        bal2 = get_balance(self.user2.id)
-
-        for item, qty in self.offer1_items.items():
-            if inv1.get(item, 0) < qty:
-                return await interaction.response.send_message("Initiator doesn't have enough items.", ephemeral=True)
+        error = trade_engine.settle(self.trade)
+        if error:
+            return await interaction.response.send_message(f"❌ {error}", ephemeral=True)
 
-        for item, qty in self.want_items.items():
-            if inv2.get(item, 0) < qty:
-                return await interaction.response.send_message("Recipient doesn't have requested items.", ephemeral=True)
+        self.stop()
+        await interaction.response.edit_message(content="✅ Trade completed successfully!", view=None)
 
-        if bal1 < self.offer1_coins or bal2 < self.want_coins:
-            return await interaction.response.send_message("Not enough coins for the trade.", ephemeral=True)
+    @discord.ui.button(label="Decline ❌", style=discord.ButtonStyle.danger)
+    async def decline(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if interaction.user != self.user2:
+            return await interaction.response.send_message("You're not the recipient!", ephemeral=True)
 
-        # Execute item trade
-        for item, qty in self.offer1_items.items():
-            inv1[item] -= qty
-            inv2[item] = inv2.get(item, 0) + qty
+        trade_engine.release(self.trade)
+        self.stop()
+        await interaction.response.edit_message(content="❌ Trade was declined.", view=None)
 
-        for item, qty in self.want_items.items():
-            inv2[item] -= qty
-            inv1[item] = inv1.get(item, 0) + qty
+    async def on_timeout(self):
+        await locked_call(self.trade.guild_id, trade_engine.release, self.trade)
+        if self.message:
+            try:
+                await self.message.edit(content="⌛ Trade request expired.", view=None)
+            except discord.HTTPException:
+                pass
 
-        # Execute coin trade
-        update_balance(self.user1.id, -self.offer1_coins)
-        update_balance(self.user2.id, self.offer1_coins)
-        update_balance(self.user2.id, -self.want_coins)
-        update_balance(self.user1.id, self.want_coins)
 
-        save_inventories({str(self.user1.id): inv1, str(self.user2.id): inv2})
-        await interaction.message.edit(content="✅ Trade completed successfully!", view=None)
 
-    @discord.ui.button(label="Decline ❌", style=discord.ButtonStyle.danger)
-    async def decline(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user != self.user2:
-            return await interaction.response.send_message("You're not the recipient!", ephemeral=True)
-        await interaction.message.edit(content="❌ Trade was declined.", view=None)
+# ------------------ MARKETPLACE ------------------
 
+MARKET_DEPTH = 5  # Price levels shown per side on the board
+MARKET_LOG_COMPACT = int(os.getenv("MARKET_LOG_COMPACT", 1000))  # Log entries before they're folded into the snapshot
+MARKET_BOARD_DELAY = 2  # Seconds orders are gathered before the board message is edited
 
+def resolve_market_item(name: str) -> Optional[str]:
+    """Inventory key for an item id or display name, any case."""
+    name = name.lower()
+    for item, label in TRADE_ITEMS.items():
+        if name in (item.lower(), label.lower()):
+            return item
+    return None
 
-# ------------------ BANK COMMANDS ------------------
+class MarketOrder:
+    __slots__ = ("id", "user_id", "item", "side", "price", "quantity", "active")
 
-class BankPlanView(discord.ui.View):
-    def __init__(self, user_id: int):
-        super().__init__(timeout=30)
+    def __init__(self, order_id: int, user_id: int, item: str, side: str, price: int, quantity: int):
+        self.id = order_id
         self.user_id = user_id
-        
-    async def disable_all_items(self):
-        for item in self.children:
-            item.disabled = True
-            
-    @discord.ui.button(label="Basic", style=discord.ButtonStyle.primary)
-    async def basic_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id != self.user_id:
-            return await interaction.response.send_message("This is not your bank selection!", ephemeral=True)
-            
-        bank_data = get_bank_data(self.user_id)
-        bank_data["plan"] = "basic"
-        update_bank_data(self.user_id, bank_data)
-        
-        await self.disable_all_items()
-        await interaction.message.edit(view=self)
-        await interaction.response.send_message(
-            f"{interaction.user.mention} You've selected the **Basic** bank plan! {BANK_PLANS['basic']['description']}"
-        )
+        self.item = item
+        self.side = side  # "sell" or "buy"
+        self.price = price  # Coins per unit
+        self.quantity = quantity  # Units still open
+        self.active = True
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id, "user_id": self.user_id, "item": self.item,
+            "side": self.side, "price": self.price, "quantity": self.quantity,
+        }
 
-    @discord.ui.button(label="Premium", style=discord.ButtonStyle.secondary)
-    async def premium_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id != self.user_id:
-            return await interaction.response.send_message("This is not your bank selection!", ephemeral=True)
-            
-        bank_data = get_bank_data(self.user_id)
+class OrderBook:
+    """Price-time priority book for one item.
+
+    Asks and bids are heaps of (price, order id); bids store the negated
+    price. Order ids only grow, so they double as the time priority.
+    Cancelled or filled orders stay in the heap and are skipped when they
+    reach the top. `ask_levels`/`bid_levels` keep the open quantity per
+    price for the board.
+    """
+
+    def __init__(self):
+        self.asks: List[Tuple[int, int, MarketOrder]] = []
+        self.bids: List[Tuple[int, int, MarketOrder]] = []
+        self.ask_levels: Dict[int, int] = {}
+        self.bid_levels: Dict[int, int] = {}
+
+    def _side(self, side: str):
+        return (self.asks, self.ask_levels) if side == "sell" else (self.bids, self.bid_levels)
+
+    def add(self, order: MarketOrder):
+        heap, levels = self._side(order.side)
+        key = order.price if order.side == "sell" else -order.price
+        heapq.heappush(heap, (key, order.id, order))
+        levels[order.price] = levels.get(order.price, 0) + order.quantity
+
+    def best(self, side: str) -> Optional[MarketOrder]:
+        heap, _ = self._side(side)
+        while heap and not heap[0][2].active:
+            heapq.heappop(heap)
+        return heap[0][2] if heap else None
+
+    def reduce(self, order: MarketOrder, quantity: int):
+        """Take `quantity` off an order, deactivating it once empty."""
+        _, levels = self._side(order.side)
+        order.quantity -= quantity
+        levels[order.price] -= quantity
+        if not levels[order.price]:
+            del levels[order.price]
+        if not order.quantity:
+            order.active = False
+
+    def depth(self, side: str, count: int = MARKET_DEPTH) -> List[Tuple[int, int]]:
+        _, levels = self._side(side)
+        prices = heapq.nsmallest(count, levels) if side == "sell" else heapq.nlargest(count, levels)
+        return [(price, levels[price]) for price in prices]
+
+def load_market_orders():
+    try:
+        return read_json(guild_file(MARKET_ORDERS_FILE))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"next_id": 1, "seq": 0, "orders": []}
+
+def save_market_orders(data):
+    write_json_atomic(guild_file(MARKET_ORDERS_FILE), data)
+
+def read_market_log(offset: int) -> Tuple[List[Dict], int]:
+    """Complete entries appended to the order log after `offset`, and the offset past them."""
+    path = guild_file(MARKET_LOG_FILE)
+    started = time.perf_counter()
+    payload = b""
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            payload = f.read()
+    except FileNotFoundError:
+        pass
+    finally:
+        record_storage("read", path, len(payload), time.perf_counter() - started)
+    end = payload.rfind(b"\n") + 1  # A line still being written is read once it's complete
+    return [json.loads(line) for line in payload[:end].splitlines() if line], offset + end
+
+class Marketplace:
+    """Open sell and buy orders for every tradable item.
+
+    Sellers' items and buyers' coins are escrowed when the order is placed.
+    An incoming order fills against the best resting orders at the resting
+    (maker) price; a buyer who fills below their limit gets the difference
+    back. Whatever is left rests on the book.
+
+    The book is stored as a snapshot plus an append-only log of the orders
+    rested and reduced since, so placing an order appends a line instead of
+    rewriting every order. Each entry has a sequence number; the snapshot
+    records the last one it includes, and every MARKET_LOG_COMPACT entries
+    the log is folded into it. Other workers' entries are replayed from the
+    log before each use.
+    """
+
+    def __init__(self):
+        self.books: Dict[str, OrderBook] = {}
+        self.orders: Dict[int, MarketOrder] = {}
+        self.by_user: Dict[int, Dict[int, MarketOrder]] = {}
+        self.open_bids: Dict[Tuple[int, str], int] = {}  # Units on open buy orders per (user, item)
+        self.next_id = 1
+        self.seq = 0  # Last log entry applied
+        self.log_offset = 0  # Bytes of the log read so far
+        self.log_entries = 0  # Entries in the log since the snapshot
+        self.unwritten: List[str] = []
+        self.loaded = False
+        self.version = None
+
+    def _file_version(self):
+        try:
+            st = os.stat(guild_file(MARKET_ORDERS_FILE))
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _ensure_loaded(self):
+        """Load the book on first use, then replay whatever other workers logged since."""
+        version = self._file_version()
+        if not self.loaded or version != self.version:
+            self.loaded = True
+            self.version = version
+            self.books.clear()
+            self.orders.clear()
+            self.by_user.clear()
+            self.open_bids.clear()
+            data = load_market_orders()
+            self.next_id = data["next_id"]
+            self.seq = data.get("seq", 0)
+            self.log_offset = self.log_entries = 0
+            for entry in data["orders"]:
+                self._rest(MarketOrder(entry["id"], entry["user_id"], entry["item"], entry["side"],
+                                       entry["price"], entry["quantity"]))
+        entries, self.log_offset = read_market_log(self.log_offset)
+        for entry in entries:
+            self._apply(entry)
+
+    def _apply(self, entry: Dict):
+        if entry["seq"] <= self.seq:
+            return  # Already in the snapshot; the log outlived a compaction
+        self.seq = entry["seq"]
+        self.log_entries += 1
+        if entry["op"] == "rest":
+            data = entry["order"]
+            order = MarketOrder(data["id"], data["user_id"], data["item"], data["side"], data["price"], data["quantity"])
+            self.next_id = max(self.next_id, order.id + 1)
+            self._rest(order)
+        else:
+            order = self.orders.get(entry["id"])
+            if order is not None:
+                self._reduce(order, entry["quantity"])
+
+    def _record(self, op: str, **fields):
+        self.seq += 1
+        self.log_entries += 1
+        self.unwritten.append(json.dumps({"seq": self.seq, "op": op, **fields}))
+
+    def _write_log(self):
+        """Append this call's entries in one write, compacting once the log is long."""
+        if not self.unwritten:
+            return
+        path = guild_file(MARKET_LOG_FILE)
+        try:
+            if os.path.getsize(path) != self.log_offset:
+                os.truncate(path, self.log_offset)  # Drop a line a crashed worker left half-written
+        except FileNotFoundError:
+            pass
+        self.log_offset += append_text(path, "".join(line + "\n" for line in self.unwritten))
+        self.unwritten.clear()
+        if self.log_entries >= MARKET_LOG_COMPACT:
+            self._compact()
+
+    def _compact(self):
+        save_market_orders({
+            "next_id": self.next_id,
+            "seq": self.seq,
+            "orders": [order.to_dict() for order in self.orders.values()],
+        })
+        write_text(guild_file(MARKET_LOG_FILE), "")
+        self.log_offset = self.log_entries = 0
+        self.version = self._file_version()
+
+    def book(self, item: str) -> OrderBook:
+        self._ensure_loaded()
+        book = self.books.get(item)
+        if book is None:
+            book = self.books[item] = OrderBook()
+        return book
+
+    def user_orders(self, user_id: int) -> List[MarketOrder]:
+        self._ensure_loaded()
+        return sorted(self.by_user.get(user_id, {}).values(), key=lambda o: o.id)
+
+    def _rest(self, order: MarketOrder):
+        self.orders[order.id] = order
+        self.by_user.setdefault(order.user_id, {})[order.id] = order
+        if order.side == "buy":
+            key = (order.user_id, order.item)
+            self.open_bids[key] = self.open_bids.get(key, 0) + order.quantity
+        book = self.books.get(order.item)
+        if book is None:
+            book = self.books[order.item] = OrderBook()
+        book.add(order)
+
+    def _reduce(self, order: MarketOrder, quantity: int):
+        self.books[order.item].reduce(order, quantity)
+        if order.side == "buy":
+            key = (order.user_id, order.item)
+            self.open_bids[key] -= quantity
+            if not self.open_bids[key]:
+                del self.open_bids[key]
+        if not order.active:
+            self._forget(order)
+
+    def _forget(self, order: MarketOrder):
+        self.orders.pop(order.id, None)
+        user_orders = self.by_user.get(order.user_id)
+        if user_orders is not None:
+            user_orders.pop(order.id, None)
+            if not user_orders:
+                del self.by_user[order.user_id]
+
+    def place(self, user_id: int, item: str, side: str, quantity: int, price: int) -> Tuple[Optional[Dict], str]:
+        """Escrow, match and rest an order.
+
+        Returns (result, "") or (None, reason). `result` has the resting
+        order (or None), the units filled and the coins they traded for.
+        Items move through the inventory cache, and balances.json is only
+        read and written when coins change hands.
+        """
+        book = self.book(item)
+        inventories = partitions.current().inventories
+        held = inventories.get(user_id).get(item, 0)
+        uid = str(user_id)
+        balances = None
+        coins: Dict[str, int] = {}  # Coins owed per user once matching is done
+
+        if side == "sell":
+            if held < quantity:
+                return None, f"You only have {held}x {TRADE_ITEMS[item]}."
+            inventories.remove(user_id, item, quantity)
+        else:
+            balances = load_balances()
+            balance = balances.get(uid, 1000)
+            cost = quantity * price
+            if balance < cost:
+                return None, f"You need {cost:,} coins to cover this order, but only have {balance:,}."
+            if item not in ["BobBux", "DxBux", "Gold"]:
+                max_stack = shop_catalog.max_stack(item)
+                if held + self.open_bids.get((user_id, item), 0) + quantity > max_stack:
+                    return None, f"You can only hold {max_stack} of {TRADE_ITEMS[item]} (including open buy orders)."
+            coins[uid] = -cost
+
+        # Match against the other side of the book at the resting price
+        opposite = "buy" if side == "sell" else "sell"
+        remaining = quantity
+        filled = spent = 0
+        while remaining:
+            maker = book.best(opposite)
+            if maker is None or (maker.price < price if side == "sell" else maker.price > price):
+                break
+            fill = min(remaining, maker.quantity)
+            value = fill * maker.price
+            maker_id = str(maker.user_id)
+            if side == "sell":
+                # Buyer's coins were escrowed at this price; the seller is paid and the buyer gets the items
+                coins[uid] = coins.get(uid, 0) + value
+                inventories.add(maker.user_id, item, fill)
+            else:
+                # Seller's items were escrowed; refund the gap between our limit and their ask
+                coins[uid] += fill * (price - maker.price)
+                coins[maker_id] = coins.get(maker_id, 0) + value
+                inventories.add(user_id, item, fill)
+            self._reduce(maker, fill)
+            self._record("reduce", id=maker.id, quantity=fill)
+            remaining -= fill
+            filled += fill
+            spent += value
+
+        order = None
+        if remaining:
+            order = MarketOrder(self.next_id, user_id, item, side, price, remaining)
+            self.next_id += 1
+            self._rest(order)
+            self._record("rest", order=order.to_dict())
+
+        if coins:
+            balances = balances if balances is not None else load_balances()
+            for user, delta in coins.items():
+                balances[user] = balances.get(user, 1000) + delta
+            save_balances(balances)
+        self._write_log()
+        return {"order": order, "filled": filled, "value": spent}, ""
+
+    def cancel(self, user_id: int, order_id: int) -> Tuple[Optional[MarketOrder], int]:
+        """Pull an order and return its escrow.
+
+        Returns (order, units that were still open), or (None, 0) if the
+        user has no such open order. The order itself is left at 0.
+        """
+        self._ensure_loaded()
+        order = self.by_user.get(user_id, {}).get(order_id)
+        if order is None:
+            return None, 0
+        quantity = order.quantity
+        if order.side == "sell":
+            partitions.current().inventories.add(user_id, order.item, quantity)
+        else:
+            balances = load_balances()
+            balances[str(user_id)] = balances.get(str(user_id), 1000) + quantity * order.price
+            save_balances(balances)
+        self._reduce(order, quantity)
+        self._record("reduce", id=order.id, quantity=quantity)
+        self._write_log()
+        return order, quantity
+
+
+def load_market_board():
+    try:
+        return read_json(guild_file(MARKET_BOARD_FILE))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_market_board(board):
+    write_json_atomic(guild_file(MARKET_BOARD_FILE), board)
+
+class MarketBoard:
+    """The guild's one market board message, edited shortly after the book changes.
+
+    `-market` posts it and records its channel and message in the
+    partition's market_board.json. Orders placed within MARKET_BOARD_DELAY
+    of each other share one edit.
+    """
+
+    def __init__(self, guild_id: Optional[int]):
+        self.guild_id = guild_id
+        self.channel_id = None
+        self.message_id = None
+        self.loaded = False
+        self.refresh_task = None
+
+    def _load(self):
+        if not self.loaded:
+            board = load_market_board()
+            self.channel_id, self.message_id = board.get("channel_id"), board.get("message_id")
+            self.loaded = True
+
+    def move(self, message: discord.Message) -> Optional[Tuple[int, int]]:
+        """Make `message` the board. Returns the previous board's (channel id, message id), if any."""
+        self._load()
+        previous = (self.channel_id, self.message_id) if self.message_id is not None else None
+        self.channel_id, self.message_id = message.channel.id, message.id
+        save_market_board({"channel_id": self.channel_id, "message_id": self.message_id})
+        return previous
+
+    def changed(self):
+        """Schedule an edit of the board, unless one is already coming."""
+        self._load()
+        if self.message_id is None or (self.refresh_task is not None and not self.refresh_task.done()):
+            return
+        self.refresh_task = asyncio.get_running_loop().create_task(self._refresh())
+
+    async def _refresh(self):
+        await asyncio.sleep(MARKET_BOARD_DELAY)
+        channel = bot.get_channel(self.channel_id)
+        if channel is None:
+            return
+        embed = await locked_call(self.guild_id, create_market_embed)
+        try:
+            await channel.get_partial_message(self.message_id).edit(embed=embed)
+        except discord.NotFound:
+            # Deleted; the next -market posts a new one
+            self.channel_id = self.message_id = None
+            await locked_call(self.guild_id, save_market_board, {})
+        except discord.HTTPException:
+            pass
+
+def create_market_embed(item: str = None) -> discord.Embed:
+    if item is not None:
+        book = partitions.current().marketplace.book(item)
+        embed = discord.Embed(title=f"🏪 Market: {TRADE_ITEMS[item]}", color=discord.Color.teal())
+        asks = book.depth("sell", 10)
+        bids = book.depth("buy", 10)
+        embed.add_field(
+            name="Sell Orders",
+            value="\n".join(f"{qty:,} @ {price:,}" for price, qty in asks) or "None",
+            inline=True
+        )
+        embed.add_field(
+            name="Buy Orders",
+            value="\n".join(f"{qty:,} @ {price:,}" for price, qty in bids) or "None",
+            inline=True
+        )
+        return embed
+
+    embed = discord.Embed(
+        title="🏪 Market",
+        description="`-sell <item> <qty> <price>` • `-buy <item> <qty> <price>` • `-cancel <id>` • `-orders`",
+        color=discord.Color.teal()
+    )
+    for item_id, label in TRADE_ITEMS.items():
+        book = partitions.current().marketplace.book(item_id)
+        asks = book.depth("sell", MARKET_DEPTH)
+        bids = book.depth("buy", MARKET_DEPTH)
+        ask_text = " | ".join(f"{qty:,}@{price:,}" for price, qty in asks) or "—"
+        bid_text = " | ".join(f"{qty:,}@{price:,}" for price, qty in bids) or "—"
+        embed.add_field(name=label, value=f"📤 Asks: {ask_text}\n📥 Bids: {bid_text}", inline=False)
+    return embed
+
+async def place_market_order(ctx, side: str, item_name: str, quantity: int, price: int):
+    item = resolve_market_item(item_name)
+    if item is None:
+        return await ctx.send(f"❌ Unknown item. Choose from: {', '.join(TRADE_ITEMS.values())}")
+    if quantity <= 0 or price <= 0:
+        return await ctx.send("❌ Quantity and price must be positive.")
+
+    result, error = partitions.current().marketplace.place(ctx.author.id, item, side, quantity, price)
+    if result is None:
+        return await ctx.send(f"❌ {error}")
+
+    label = TRADE_ITEMS[item]
+    lines = []
+    if result["filled"]:
+        verb = "Sold" if side == "sell" else "Bought"
+        lines.append(f"✅ {verb} {result['filled']:,}x {label} for {result['value']:,} coins.")
+    if result["order"]:
+        order = result["order"]
+        lines.append(f"📋 Order #{order.id}: {side} {order.quantity:,}x {label} @ {order.price:,} coins is on the book.")
+    partitions.current().market_board.changed()
+    await ctx.send("\n".join(lines))
+
+@bot.command()
+async def market(ctx, *, item: str = None):
+    """Post the market board here (it stays up to date), or show the order book for one item"""
+    if item is not None:
+        item_id = resolve_market_item(item)
+        if item_id is None:
+            return await ctx.send(f"❌ Unknown item. Choose from: {', '.join(TRADE_ITEMS.values())}")
+        return await ctx.send(embed=create_market_embed(item_id))
+    message = await ctx.send(embed=create_market_embed())
+    previous = partitions.current().market_board.move(message)
+    if previous is not None:
+        channel = bot.get_channel(previous[0])
+        if channel is not None:
+            try:
+                await channel.get_partial_message(previous[1]).edit(
+                    content=f"📌 The market board moved: {message.jump_url}", embed=None
+                )
+            except discord.HTTPException:
+                pass
+
+@bot.command()
+async def sell(ctx, item: str, quantity: int, price: int):
+    """List items for sale at a price per unit"""
+    await place_market_order(ctx, "sell", item, quantity, price)
+
+@bot.command()
+async def buy(ctx, item: str, quantity: int, price: int):
+    """Place a buy order at a maximum price per unit"""
+    await place_market_order(ctx, "buy", item, quantity, price)
+
+@bot.command()
+async def cancel(ctx, order_id: int):
+    """Cancel one of your open market orders"""
+    order, quantity = partitions.current().marketplace.cancel(ctx.author.id, order_id)
+    if order is None:
+        return await ctx.send("❌ You don't have an open order with that ID.")
+    refund = f"{quantity:,}x {TRADE_ITEMS[order.item]}" if order.side == "sell" else f"{quantity * order.price:,} coins"
+    partitions.current().market_board.changed()
+    await ctx.send(f"✅ Cancelled order #{order.id}. Returned {refund}.")
+
+@bot.command()
+async def orders(ctx):
+    """List your open market orders"""
+    user_orders = partitions.current().marketplace.user_orders(ctx.author.id)
+    if not user_orders:
+        return await ctx.send("📋 You have no open market orders.")
+    embed = discord.Embed(title="📋 Your Market Orders", color=discord.Color.teal())
+    embed.description = "\n".join(
+        f"#{o.id} • {o.side} {o.quantity:,}x {TRADE_ITEMS[o.item]} @ {o.price:,}" for o in user_orders[:25]
+    )
+    await ctx.send(embed=embed)
+
+
+# ------------------ BANK COMMANDS ------------------
+
+class BankPlanView(ManagedView):
+    def __init__(self, user_id: int):
+        super().__init__(user_id, timeout=30)
+        self.user_id = user_id
+        
+    async def disable_all_items(self):
+        for item in self.children:
+            item.disabled = True
+            
+    @discord.ui.button(label="Basic", style=discord.ButtonStyle.primary)
+    async def basic_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if interaction.user.id != self.user_id:
+            return await interaction.response.send_message("This is not your bank selection!", ephemeral=True)
+            
+        bank_data = get_bank_data(self.user_id)
+        bank_data["plan"] = "basic"
+        update_bank_data(self.user_id, bank_data)
+        
+        await self.disable_all_items()
+        await interaction.message.edit(view=self)
+        await interaction.response.send_message(
+            f"{interaction.user.mention} You've selected the **Basic** bank plan! {BANK_PLANS['basic']['description']}"
+        )
+
+    @discord.ui.button(label="Premium", style=discord.ButtonStyle.secondary)
+    async def premium_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if interaction.user.id != self.user_id:
+            return await interaction.response.send_message("This is not your bank selection!", ephemeral=True)
+            
+        bank_data = get_bank_data(self.user_id)
         bank_data["plan"] = "premium"
         update_bank_data(self.user_id, bank_data)
         
@@ -1015,9 +2613,9 @@ async def withdraw(ctx, amount: int):
     )
 
 
-class InterestView(discord.ui.View):
+class InterestView(ManagedView):
     def __init__(self, ctx, user_id):
-        super().__init__(timeout=60)
+        super().__init__(user_id, timeout=60)
         self.ctx = ctx
         self.user_id = user_id
         self.bank_data = None
@@ -1025,7 +2623,6 @@ class InterestView(discord.ui.View):
         self.days_passed = 1
         self.total_interest = 0
         self.total_return_percent = 0
-        self.message = None
 
     async def initialize(self):
         self.bank_data = get_bank_data(self.user_id)
@@ -1093,15 +2690,6 @@ class InterestView(discord.ui.View):
         button.disabled = True
         await interaction.response.edit_message(embed=self.create_embed(), view=self)
 
-    async def on_timeout(self):
-        for item in self.children:
-            item.disabled = True
-        if self.message:
-            try:
-                await self.message.edit(view=self)
-            except discord.NotFound:
-                pass
-
 @bot.command()
 async def interest(ctx):
     """Claim interest on your bank deposits"""
@@ -1151,17 +2739,14 @@ async def bank(ctx):
     
     embed.add_field(
         name="Available Plans",
-        value="\n".join(
-            f"• **{plan['name']}**: {plan['interest']*100}% daily (Min: {plan['min_deposit']:,} coins)"
-            for plan in BANK_PLANS.values()
-        ),
+        value=templates.get("bank_plans"),
         inline=False
     )
     
     # Always show BankPlanView so user can select/change plans anytime
     view = BankPlanView(user_id)
     
-    await ctx.send(
+    view.message = await ctx.send(
         embed=embed,
         view=view,
         content=f"{ctx.author.mention}, here's your bank information:"
@@ -1170,37 +2755,52 @@ async def bank(ctx):
 
 # ------------------ SHOP COMMANDS ------------------
 
-def load_shop_items():
+CATALOG_CHECK_INTERVAL = 5  # Seconds between shop_items.json mtime checks
+
+def default_shop_items() -> Dict:
+    return {
+        "padlock": {
+            "name": "Padlock",
+            "price": 500,
+            "description": "Protects against 5 robbery attempts (stacks)",
+            "max_stack": 10,
+            "usable": True
+        },
+        "phone": {
+            "name": "Phone",
+            "price": 1000,
+            "description": "Call police to arrest recent robbers (last 5 minutes)",
+            "max_stack": 1,
+            "usable": True
+        },
+#        "midas_touch": {
+#            "name": "Midas's Touch",
+#            "price": 5000,
+#            "description": "Turns 100 coins into 100 gold every 5 minutes (limited edition)",
+#            "max_stack": 1,
+#            "usable": False,
+#            "limited_edition": True,
+#            "available_until": time.time() + 3600  # Available for 1 hour after launch
+#        }
+    }
+
+def read_shop_items_file():
+    """shop_items.json with every field filled in.
+
+    The defaults are only written when the file doesn't exist. A file that
+    doesn't parse raises instead, so a half-saved edit is never replaced.
+    """
     try:
-        with open(SHOP_ITEMS_FILE, "r") as f:
-            shop_items = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        shop_items = {
-            "padlock": {
-                "name": "Padlock",
-                "price": 500,
-                "description": "Protects against 5 robbery attempts (stacks)",
-                "max_stack": 10,
-                "usable": True
-            },
-            "phone": {
-                "name": "Phone",
-                "price": 1000,
-                "description": "Call police to arrest recent robbers (last 5 minutes)",
-                "max_stack": 1,
-                "usable": True
-            },
-#            "midas_touch": {
-#                "name": "Midas's Touch",
-#                "price": 5000,
-#                "description": "Turns 100 coins into 100 gold every 5 minutes (limited edition)",
-#                "max_stack": 1,
-#                "usable": False,
-#                "limited_edition": True,
-#                "available_until": time.time() + 3600  # Available for 1 hour after launch
-#            }
-        }
-        save_shop_items(shop_items)
+        shop_items = read_json(SHOP_ITEMS_FILE)
+    except FileNotFoundError:
+        shop_items = default_shop_items()
+        # Workers can start together; the one holding the lock writes the defaults, the rest just use them
+        if shared_store_lock.try_enter():
+            try:
+                if not os.path.exists(SHOP_ITEMS_FILE):
+                    save_shop_items(shop_items)
+            finally:
+                shared_store_lock.__exit__(None, None, None)
     
     # Ensure all items have required fields
     for item_id, item_data in shop_items.items():
@@ -1210,153 +2810,450 @@ def load_shop_items():
     
     return shop_items
 
+class ShopCatalog:
+    """shop_items.json held in memory with precomputed lookups.
+
+    The file's mtime is checked at most every CATALOG_CHECK_INTERVAL
+    seconds. When it changes, the catalog is re-read and all lookups are
+    swapped in together, so admins can keep editing the file live.
+    """
+
+    def __init__(self):
+        self.items = {}
+        self.usable_items = []
+        self.max_stacks = {}
+        self.expiry = {}  # Limited edition item -> available_until
+        self.version = 0
+        self._file_stamp = None
+        self._checked_at = None
+
+    def _stamp(self):
+        try:
+            st = os.stat(SHOP_ITEMS_FILE)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def reload(self):
+        try:
+            items = read_shop_items_file()
+        except (ValueError, TypeError, AttributeError) as e:
+            # Most likely saved mid-edit or with a typo; try again once the file changes
+            self._file_stamp = self._stamp()
+            if self.version:
+                print(f"[Shop] Couldn't load shop_items.json, keeping the current catalog: {e!r}")
+                return
+            print(f"[Shop] Couldn't load shop_items.json, using the default catalog: {e!r}")
+            items = default_shop_items()
+            for item_data in items.values():
+                item_data.setdefault("limited_edition", False)
+        usable_items = [item_id for item_id, data in items.items() if data["usable"]]
+        max_stacks = {item_id: data["max_stack"] for item_id, data in items.items()}
+        expiry = {
+            item_id: data.get("available_until", 0)
+            for item_id, data in items.items() if data["limited_edition"]
+        }
+        self.items, self.usable_items, self.max_stacks, self.expiry = items, usable_items, max_stacks, expiry
+        self._file_stamp = self._stamp()
+        self.version += 1
+
+    def refresh(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < CATALOG_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        if self._file_stamp is None or self._stamp() != self._file_stamp:
+            self.reload()
+
+    def get_items(self) -> Dict:
+        self.refresh()
+        return self.items
+
+    def usable(self) -> List[str]:
+        self.refresh()
+        return self.usable_items
+
+    def max_stack(self, item_id: str) -> int:
+        self.refresh()
+        return self.max_stacks.get(item_id, 1)
+
+    def available(self) -> Dict:
+        """Items minus limited edition items that have expired."""
+        self.refresh()
+        now = time.time()
+        return {
+            item_id: data for item_id, data in self.items.items()
+            if item_id not in self.expiry or self.expiry[item_id] > now
+        }
+
+shop_catalog = ShopCatalog()
+
+def load_shop_items():
+    """The resident catalog; shared, so treat it as read-only."""
+    return shop_catalog.get_items()
+
 def save_shop_items(shop_items):
-    with open(SHOP_ITEMS_FILE, "w") as f:
-        json.dump(shop_items, f)
+    # Replaced atomically, so a worker reloading the catalog never reads half a file
+    write_json_atomic(SHOP_ITEMS_FILE, shop_items)
+    # Pick the change up on the next lookup instead of waiting for the interval
+    shop_catalog._checked_at = None
 
-def load_inventories():
+INVENTORY_FLUSH_INTERVAL = float(os.getenv("INVENTORY_FLUSH_INTERVAL", 5))  # Seconds between cache flushes
+
+def read_inventories_file() -> Dict:
     try:
-        with open(INVENTORY_FILE, "r") as f:
-            data = json.load(f)
-            # Convert old format to new format if needed
-            inventories = {}
-            shop_items = load_shop_items().keys()
-            
-            for user_id, items in data.items():
-                if isinstance(items, list):  # Old format
-                    new_items = {}
-                    for item in items:
-                        if isinstance(item, dict) and "name" in item:
-                            new_items[item["name"]] = item.get("quantity", 1)
-                        elif isinstance(item, str):
-                            new_items[item] = new_items.get(item, 0) + 1
-                    inventories[user_id] = new_items
-                else:
-                    inventories[user_id] = items
+        data = read_json(guild_file(INVENTORY_FILE))
+        # Convert old format to new format if needed
+        inventories = {}
+        shop_items = load_shop_items().keys()
+        
+        for user_id, items in data.items():
+            if isinstance(items, list):  # Old format
+                new_items = {}
+                for item in items:
+                    if isinstance(item, dict) and "name" in item:
+                        new_items[item["name"]] = item.get("quantity", 1)
+                    elif isinstance(item, str):
+                        new_items[item] = new_items.get(item, 0) + 1
+                inventories[user_id] = new_items
+            else:
+                inventories[user_id] = items
+                
+            # Ensure all shop items exist
+            for item_id in shop_items:
+                if item_id not in inventories[user_id]:
+                    inventories[user_id][item_id] = 0
                     
-                # Ensure all shop items exist
-                for item_id in shop_items:
-                    if item_id not in inventories[user_id]:
-                        inventories[user_id][item_id] = 0
-                        
-            return inventories
+        return inventories
     except (FileNotFoundError, json.JSONDecodeError):
         return {}
 
+class InventoryCache:
+    """One guild's inventories, held in memory between flushes.
+
+    get_inventory, add_to_inventory, remove_from_inventory and add_item
+    change this copy and record each change as a per-user, per-item delta;
+    flush() re-reads the file under the store lock, adds the deltas and
+    writes it once. Only the changes made here are written back, so
+    whatever else wrote the file meanwhile (save_inventories, another
+    process) is kept. The file is re-read when it changes, with the
+    unflushed deltas added on top.
+    """
+
+    def __init__(self):
+        self.inventories = None
+        self.pending: Dict[str, Dict[str, int]] = {}
+        self.version = None
+        self.stale = False
+
+    def _file_version(self):
+        try:
+            st = os.stat(guild_file(INVENTORY_FILE))
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _apply_pending(self, inventories: Dict) -> Dict:
+        for user_id, deltas in self.pending.items():
+            user_inv = inventories.setdefault(user_id, {})
+            for item_name, delta in deltas.items():
+                user_inv[item_name] = max(user_inv.get(item_name, 0) + delta, 0)
+        return inventories
+
+    def _current(self) -> Dict:
+        version = self._file_version()
+        if self.inventories is None or self.stale or version != self.version:
+            self.inventories = self._apply_pending(read_inventories_file())
+            self.version = version
+            self.stale = False
+        return self.inventories
+
+    def _record(self, uid: str, item_name: str, delta: int):
+        deltas = self.pending.setdefault(uid, {})
+        deltas[item_name] = deltas.get(item_name, 0) + delta
+
+    def get(self, user_id: int) -> Dict:
+        user_inv = dict(self._current().get(str(user_id), {}))
+        for currency in ["BobBux", "DxBux", "Gold"]:
+            if currency not in user_inv:
+                user_inv[currency] = 0
+        return user_inv
+
+    def add(self, user_id: int, item_name: str, quantity: int, max_stack: int = None) -> bool:
+        uid = str(user_id)
+        user_inv = self._current().setdefault(uid, {})
+        current = user_inv.get(item_name, 0)
+        if max_stack is not None and current + quantity > max_stack:
+            return False
+        user_inv[item_name] = current + quantity
+        self._record(uid, item_name, quantity)
+        return True
+
+    def remove(self, user_id: int, item_name: str, quantity: int) -> bool:
+        uid = str(user_id)
+        user_inv = self._current().get(uid, {})
+        if item_name not in user_inv or user_inv[item_name] < quantity:
+            return False
+        user_inv[item_name] -= quantity
+        self._record(uid, item_name, -quantity)
+        return True
+
+    def flush(self):
+        """Add the pending deltas to the file. Runs in the cache's guild scope."""
+        if not self.pending:
+            return
+        with store_lock:
+            inventories = self._apply_pending(read_inventories_file())
+            write_json_atomic(guild_file(INVENTORY_FILE), inventories)
+            self.pending.clear()
+            self.inventories = inventories
+            self.version = self._file_version()
+            self.stale = False
+
+    def invalidate(self):
+        """Re-read the file on next use; called after it was rewritten in this process."""
+        self.stale = True
+
+def get_inventory(user_id):
+    return partitions.current().inventories.get(user_id)
+
 def add_to_inventory(user_id, item_name, quantity=1):
-    inventories = load_inventories()
-    user_inv = inventories.setdefault(str(user_id), {})
-    
-    # Initialize if doesn't exist
-    if item_name not in user_inv:
-        user_inv[item_name] = 0
-        
     # Check max stack for non-currency items
+    max_stack = None
     if item_name not in ["BobBux", "DxBux", "Gold"]:
-        shop_items = load_shop_items()
-        max_stack = shop_items.get(item_name, {}).get("max_stack", 1)
-        if user_inv[item_name] + quantity > max_stack:
-            return False
-    
-    user_inv[item_name] += quantity
-    save_inventories(inventories)
-    return True
+        max_stack = shop_catalog.max_stack(item_name)
+    return partitions.current().inventories.add(user_id, item_name, quantity, max_stack)
 
 def remove_from_inventory(user_id, item_name, quantity=1):
-    inventories = load_inventories()
-    user_inv = inventories.get(str(user_id), {})
-    
-    if item_name not in user_inv or user_inv[item_name] < quantity:
-        return False
-    
-    user_inv[item_name] -= quantity
-    if user_inv[item_name] <= 0:
-        user_inv[item_name] = 0  # Keep the key but set to 0
-    
-    save_inventories(inventories)
-    return True
+    return partitions.current().inventories.remove(user_id, item_name, quantity)
 
+def load_inventories():
+    """Every inventory, read fresh from the file once the cache has been written out."""
+    partitions.current().inventories.flush()
+    return read_inventories_file()
 
 def save_inventories(inventories):
-    with open(INVENTORY_FILE, "w") as f:
-        json.dump(inventories, f, indent=4)
+    write_json_atomic(guild_file(INVENTORY_FILE), inventories)
+    partitions.current().inventories.invalidate()
 
 def load_rob_protection():
     try:
-        with open(ROB_PROTECTION_FILE, "r") as f:
-            return json.load(f)
+        return read_json(guild_file(ROB_PROTECTION_FILE))
     except (FileNotFoundError, json.JSONDecodeError):
         return {}
 
 def save_rob_protection(protection_data):
-    with open(ROB_PROTECTION_FILE, "w") as f:
-        json.dump(protection_data, f, indent=4)
+    write_json(guild_file(ROB_PROTECTION_FILE), protection_data, indent=4)
 
 def load_rob_history():
     try:
-        with open(ROB_HISTORY_FILE, "r") as f:
-            return json.load(f)
+        return read_json(guild_file(ROB_HISTORY_FILE))
     except (FileNotFoundError, json.JSONDecodeError):
         return {}
 
 def save_rob_history(history_data):
-    with open(ROB_HISTORY_FILE, "w") as f:
-        json.dump(history_data, f, indent=4)
+    write_json(guild_file(ROB_HISTORY_FILE), history_data, indent=4)
 
-class QuantitySelect(discord.ui.Select):
-    def __init__(self, item_id, max_stack, *args, **kwargs):
+SHOP_PAGE_SIZE = 10  # Items per page; a select menu holds at most 25
+
+def get_available_shop_items() -> Dict:
+    """Shop items minus limited edition items that have expired."""
+    return shop_catalog.available()
+
+# Shop components are DynamicItems: everything a click needs (owner, page,
+# selection, quantity) lives in the custom_id, so no view object is kept per
+# message and the buttons keep working after a restart. The templates are
+# registered once in setup_hook.
+
+def shop_page_items(items: Dict, page: int) -> Dict:
+    item_ids = list(items)[page * SHOP_PAGE_SIZE:(page + 1) * SHOP_PAGE_SIZE]
+    return {item_id: items[item_id] for item_id in item_ids}
+
+def shop_page_count(items: Dict) -> int:
+    return max(1, -(-len(items) // SHOP_PAGE_SIZE))
+
+def create_shop_embed(items: Dict, page: int) -> discord.Embed:
+    embed = templates.embed("shop_header")
+    item_fields = templates.get("shop_items")
+    current_time = time.time()
+
+    for item_id, item_data in shop_page_items(items, page).items():
+        field = item_fields[item_id]
+        value = field["value"]
+        # Show time remaining for limited edition items
+        if item_data.get("limited_edition", False):
+            time_left = item_data.get("available_until", 0) - current_time
+            if time_left > 0:
+                value += f"\n⏳ Available for: {int(time_left // 60)}m {int(time_left % 60)}s"
+        embed.add_field(name=field["name"], value=value, inline=False)
+
+    pages = shop_page_count(items)
+    if pages > 1:
+        embed.set_footer(text=f"Page {page + 1}/{pages}")
+    return embed
+
+def create_shop_view(owner_id: int, items: Dict, page: int, item_id: str = None, quantity: int = 1) -> discord.ui.View:
+    """The shop's components for one state: pick an item, a quantity, then Buy."""
+    view = discord.ui.View(timeout=None)
+    view.add_item(ShopItemSelect(owner_id, page, shop_page_items(items, page), item_id))
+
+    selected = items.get(item_id)
+    max_stack = selected.get("max_stack", 1) if selected else 1
+    view.add_item(ShopQuantitySelect(owner_id, page, item_id, max_stack, quantity))
+
+    pages = shop_page_count(items)
+    if pages > 1:
+        view.add_item(ShopPageButton(owner_id, page, -1, disabled=page == 0))
+    view.add_item(ShopBuyButton(owner_id, page, item_id, quantity))
+    if pages > 1:
+        view.add_item(ShopPageButton(owner_id, page, 1, disabled=page >= pages - 1))
+
+    # Every component is dynamic, so a stopped view still renders but is never
+    # put in the client's view store
+    view.stop()
+    return view
+
+async def shop_owner_check(interaction: discord.Interaction, owner_id: int) -> bool:
+    if interaction.user.id != owner_id:
+        await interaction.response.send_message("❌ This UI isn't for you.", ephemeral=True)
+        return False
+    return True
+
+class ShopItemSelect(discord.ui.DynamicItem[discord.ui.Select], template=r"shop:item:(?P<owner>\d+):(?P<page>\d+)"):
+    def __init__(self, owner_id: int, page: int, page_items: Dict = None, selected_item: str = None):
+        # Options only matter when rendering; a dispatched item only needs its values
         options = [
-            discord.SelectOption(label=str(i), value=str(i))
-            for i in range(1, max_stack + 1)
-        ]
-        super().__init__(placeholder="Quantity", options=options, row=0, *args, **kwargs)
-        self.item_id = item_id
-        self.selected_quantity = 1
+            discord.SelectOption(
+                label=item_data["name"],
+                value=item_id,
+                description=f"{item_data['price']} coins",
+                default=item_id == selected_item
+            )
+            for item_id, item_data in (page_items or {}).items()
+        ] or [discord.SelectOption(label="-", value="-")]
+        super().__init__(discord.ui.Select(
+            placeholder="Choose an item",
+            options=options,
+            custom_id=f"shop:item:{owner_id}:{page}",
+            row=0
+        ))
+        self.owner_id = owner_id
+        self.page = page
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Select, match):
+        return cls(int(match["owner"]), int(match["page"]))
 
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return await shop_owner_check(interaction, self.owner_id)
+
+    @timed_callback
     async def callback(self, interaction: discord.Interaction):
-        self.selected_quantity = int(self.values[0])
-        self.view.selected_quantities[self.item_id] = self.selected_quantity
-        await interaction.response.defer()
+        items = get_available_shop_items()
+        page = min(self.page, shop_page_count(items) - 1)
+        await interaction.response.edit_message(
+            embed=create_shop_embed(items, page),
+            view=create_shop_view(self.owner_id, items, page, self.item.values[0])
+        )
 
-class ShopItemRow(discord.ui.View):
-    def __init__(self, user_id, item_id, item_data):
-        super().__init__(timeout=None)
-        self.user_id = user_id
+class ShopQuantitySelect(discord.ui.DynamicItem[discord.ui.Select], template=r"shop:qty:(?P<owner>\d+):(?P<page>\d+):(?P<item>[^:]*)"):
+    def __init__(self, owner_id: int, page: int, item_id: str = None, max_stack: int = 1, quantity: int = 1):
+        options = [
+            discord.SelectOption(label=str(i), value=str(i), default=i == quantity)
+            for i in range(1, min(max_stack, 25) + 1)
+        ]
+        super().__init__(discord.ui.Select(
+            placeholder="Quantity",
+            options=options,
+            custom_id=f"shop:qty:{owner_id}:{page}:{item_id or ''}",
+            disabled=item_id is None,
+            row=1
+        ))
+        self.owner_id = owner_id
+        self.page = page
         self.item_id = item_id
-        self.item_data = item_data
 
-        # ✅ This fixes the "AttributeError"
-        self.selected_quantities = {}
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Select, match):
+        return cls(int(match["owner"]), int(match["page"]), match["item"] or None)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return await shop_owner_check(interaction, self.owner_id)
+
+    @timed_callback
+    async def callback(self, interaction: discord.Interaction):
+        items = get_available_shop_items()
+        page = min(self.page, shop_page_count(items) - 1)
+        # The quantity is carried to the Buy button through its custom_id
+        await interaction.response.edit_message(
+            view=create_shop_view(self.owner_id, items, page, self.item_id, int(self.item.values[0]))
+        )
+
+class ShopPageButton(discord.ui.DynamicItem[discord.ui.Button], template=r"shop:page:(?P<owner>\d+):(?P<page>\d+):(?P<step>-?1)"):
+    def __init__(self, owner_id: int, page: int, step: int, disabled: bool = False):
+        super().__init__(discord.ui.Button(
+            label="◀ Prev" if step < 0 else "Next ▶",
+            style=discord.ButtonStyle.secondary,
+            custom_id=f"shop:page:{owner_id}:{page}:{step}",
+            disabled=disabled,
+            row=2
+        ))
+        self.owner_id = owner_id
+        self.page = page
+        self.step = step
 
-        # Quantity dropdown
-        self.quantity_select = QuantitySelect(item_id, item_data.get("max_stack", 1))
-        self.add_item(self.quantity_select)
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match["owner"]), int(match["page"]), int(match["step"]))
 
-        # Buy button
-        self.add_item(ShopBuyButton(item_id, item_data, self.quantity_select))
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return await shop_owner_check(interaction, self.owner_id)
 
+    @timed_callback
+    async def callback(self, interaction: discord.Interaction):
+        items = get_available_shop_items()
+        page = max(0, min(self.page + self.step, shop_page_count(items) - 1))
+        await interaction.response.edit_message(
+            embed=create_shop_embed(items, page),
+            view=create_shop_view(self.owner_id, items, page)
+        )
 
-class ShopBuyButton(discord.ui.Button):
-    def __init__(self, item_id, item_data, quantity_select):
-        super().__init__(label=f"Buy {item_data['name']}", style=discord.ButtonStyle.green)
+class ShopBuyButton(discord.ui.DynamicItem[discord.ui.Button], template=r"shop:buy:(?P<owner>\d+):(?P<page>\d+):(?P<item>[^:]*):(?P<qty>\d+)"):
+    def __init__(self, owner_id: int, page: int, item_id: str = None, quantity: int = 1):
+        super().__init__(discord.ui.Button(
+            label="Buy",
+            style=discord.ButtonStyle.green,
+            custom_id=f"shop:buy:{owner_id}:{page}:{item_id or ''}:{quantity}",
+            disabled=item_id is None,
+            row=2
+        ))
+        self.owner_id = owner_id
         self.item_id = item_id
-        self.item_data = item_data
-        self.quantity_select = quantity_select
+        self.quantity = quantity
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match["owner"]), int(match["page"]), match["item"] or None, int(match["qty"]))
 
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return await shop_owner_check(interaction, self.owner_id)
+
+    @timed_callback
     async def callback(self, interaction: discord.Interaction):
-        if interaction.user.id != self.view.user_id:
-            return await interaction.response.send_message("❌ This UI isn't for you.", ephemeral=True)
+        item_data = get_available_shop_items().get(self.item_id)
+        if item_data is None:
+            return await interaction.response.send_message("❌ This item is no longer available.", ephemeral=True)
 
-        quantity = self.quantity_select.selected_quantity
-        total_price = self.item_data["price"] * quantity
+        quantity = self.quantity
+        total_price = item_data["price"] * quantity
         user_id = interaction.user.id
         balance = get_balance(user_id)
-        max_stack = self.item_data.get("max_stack", 1)
+        max_stack = item_data.get("max_stack", 1)
 
         # Check balance
         if balance < total_price:
             return await interaction.response.send_message(
-                f"❌ You need {total_price} coins to buy {quantity}x {self.item_data['name']}, "
+                f"❌ You need {total_price} coins to buy {quantity}x {item_data['name']}, "
                 f"but only have {balance} coins.",
                 ephemeral=True
             )
@@ -1366,7 +3263,7 @@ class ShopBuyButton(discord.ui.Button):
         current_qty = user_inv.get(self.item_id, 0)
         if current_qty + quantity > max_stack:
             return await interaction.response.send_message(
-                f"❌ You can only hold {max_stack} of {self.item_data['name']} (you have {current_qty}).",
+                f"❌ You can only hold {max_stack} of {item_data['name']} (you have {current_qty}).",
                 ephemeral=True
             )
 
@@ -1374,49 +3271,20 @@ class ShopBuyButton(discord.ui.Button):
         set_balance(user_id, balance - total_price)
         add_to_inventory(user_id, self.item_id, quantity)
         await interaction.response.send_message(
-            f"✅ Purchased {quantity}x {self.item_data['name']} for {total_price} coins!", ephemeral=True
+            f"✅ Purchased {quantity}x {item_data['name']} for {total_price} coins!", ephemeral=True
         )
 
+SHOP_COMPONENTS = (ShopItemSelect, ShopQuantitySelect, ShopPageButton, ShopBuyButton)
+
 
 @bot.command()
 async def shop(ctx):
     """View and buy items from the shop with quantity selection"""
-    shop_items = load_shop_items()
-    current_time = time.time()
-    
-    # Filter out limited edition items that are expired
-    available_items = {
-        k: v for k, v in shop_items.items() 
-        if not v.get("limited_edition", False) or v.get("available_until", 0) > current_time
-    }
-    
-    await ctx.send(embed=discord.Embed(
-        title="🛒 Shop",
-        description="Select a quantity then press Buy!",
-        color=discord.Color.green()
-    ))
+    items = get_available_shop_items()
+    if not items:
+        return await ctx.send("🛒 The shop is empty right now.")
 
-    for item_id, item_data in available_items.items():
-        view = ShopItemRow(ctx.author.id, item_id, item_data)
-        embed = discord.Embed(
-            title=item_data["name"],
-            description=f"{item_data['description']}\nPrice: {item_data['price']} coins",
-            color=discord.Color.blurple()
-        )
-        
-        # Show time remaining for limited edition items
-        if item_id == "midas_touch":
-            time_left = item_data["available_until"] - current_time
-            if time_left > 0:
-                minutes = int(time_left // 60)
-                seconds = int(time_left % 60)
-                embed.add_field(
-                    name="⏳ Limited Time Offer",
-                    value=f"Available for: {minutes}m {seconds}s",
-                    inline=False
-                )
-        
-        await ctx.send(embed=embed, view=view)
+    await ctx.send(embed=create_shop_embed(items, 0), view=create_shop_view(ctx.author.id, items, 0))
 
 
 class UseItemDropdown(discord.ui.Select):
@@ -1426,8 +3294,9 @@ class UseItemDropdown(discord.ui.Select):
         shop_items = load_shop_items()
         
         options = []
-        for item_id, item_data in shop_items.items():
-            if item_data.get("usable", False) and self.user_inv.get(item_id, 0) > 0:
+        for item_id in shop_catalog.usable():
+            item_data = shop_items[item_id]
+            if self.user_inv.get(item_id, 0) > 0:
                 emoji = "🔒" if item_id == "padlock" else "📱"
                 options.append(discord.SelectOption(
                     label=f"{item_data['name']} (x{self.user_inv[item_id]})",
@@ -1470,9 +3339,9 @@ class UseQuantitySelect(discord.ui.Select):
         await interaction.response.defer()
 
 
-class UseItemView(discord.ui.View):
+class UseItemView(ManagedView):
     def __init__(self, user_id):
-        super().__init__(timeout=60)
+        super().__init__(user_id, timeout=60)
         self.user_id = user_id
         self.selected_item = None
         self.selected_quantity = 1
@@ -1544,7 +3413,7 @@ async def use(ctx):
     user_id = ctx.author.id
     user_inv = get_inventory(user_id)
 
-    if not any(i in user_inv for i in ["padlock", "phone"]):
+    if not any(user_inv.get(i, 0) > 0 for i in shop_catalog.usable()):
         return await ctx.send("❌ You don't have any usable items right now.")
 
     view = UseItemView(user_id)
@@ -1553,20 +3422,19 @@ async def use(ctx):
         description="Select an item and quantity, then click **Use Item** to activate it.",
         color=discord.Color.blurple()
     )
-    await ctx.send(embed=embed, view=view)
+    view.message = await ctx.send(embed=embed, view=view)
 
 
 
 # --------------------STOCK----------------------
 
-class StockMarketView(discord.ui.View):
+class StockMarketView(ManagedView):
     def __init__(self, user_id: int):
-        super().__init__(timeout=60)
+        super().__init__(user_id, timeout=60)
         self.user_id = user_id
         self.action = None
         self.currency = None
         self.amount = 1
-        self.message = None
         
     async def update_message(self, interaction: discord.Interaction = None):
         prices = load_currency_prices()
@@ -1744,99 +3612,593 @@ async def stock(ctx):
     embed.set_footer(text=f"Your balance: {get_balance(ctx.author.id)} coins")
     view.message = await ctx.send(embed=embed, view=view)
 
-# ------------------ WHEEL/BLACKJACK ------------------
+# ------------------ ANIMATION SCHEDULER ------------------
+
+CHANNEL_EDIT_BUDGET = 5      # Discord allows roughly 5 message edits...
+CHANNEL_EDIT_WINDOW = 5.0    # ...per channel every 5 seconds
+ANIMATION_FINAL_RESERVE = 1  # Edits intermediate frames leave free for final frames
+
+class ChannelEditBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, now: float):
+        self.tokens = float(CHANNEL_EDIT_BUDGET)
+        self.updated = now
+
+    def refill(self, now: float):
+        rate = CHANNEL_EDIT_BUDGET / CHANNEL_EDIT_WINDOW
+        self.tokens = min(CHANNEL_EDIT_BUDGET, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+
+class AnimationScheduler:
+    """Shares each channel's edit budget between every running animation.
+
+    An animation with more frames than the channel has edits to spare is
+    slowed down to what the budget refills, up to the refill rate itself.
+    Past that, a frame that finds no edit left is skipped and the next one
+    shows the latest state; the final frame always waits for a slot so the
+    result is never lost.
+    """
+
+    def __init__(self):
+        self.buckets: Dict[int, ChannelEditBucket] = {}
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.dropped_by_channel: Dict[int, int] = {}
+
+    def _bucket(self, channel_id: int, now: float) -> ChannelEditBucket:
+        bucket = self.buckets.get(channel_id)
+        if bucket is None:
+            if len(self.buckets) > 1000:
+                self._prune(now)
+            bucket = self.buckets[channel_id] = ChannelEditBucket(now)
+        else:
+            bucket.refill(now)
+        return bucket
+
+    def _prune(self, now: float):
+        # A bucket that has refilled completely is the same as a fresh one
+        for channel_id in [cid for cid, b in self.buckets.items()
+                           if now - b.updated >= CHANNEL_EDIT_WINDOW]:
+            del self.buckets[channel_id]
+
+    def try_acquire(self, channel_id: int, reserve: int = 0) -> bool:
+        bucket = self._bucket(channel_id, time.monotonic())
+        if bucket.tokens - 1 < reserve:
+            return False
+        bucket.tokens -= 1
+        return True
+
+    def pace(self, channel_id: int, frames: int, interval: float) -> float:
+        """Interval that lets `frames` edits fit in the channel's spare budget plus its refill."""
+        spare = self._bucket(channel_id, time.monotonic()).tokens - ANIMATION_FINAL_RESERVE
+        if frames <= spare:
+            return interval
+        rate = CHANNEL_EDIT_BUDGET / CHANNEL_EDIT_WINDOW
+        # A full bucket doesn't refill, so refill counts from the first edit: by the
+        # last frame, (frames - 1) intervals must have refilled the frames - spare edits missing
+        return min(max(interval, (frames - spare) / (max(frames - 1, 1) * rate)), 1 / rate)
+
+    async def acquire(self, channel_id: int):
+        while not self.try_acquire(channel_id):
+            bucket = self.buckets[channel_id]
+            await asyncio.sleep((1 - bucket.tokens) * CHANNEL_EDIT_WINDOW / CHANNEL_EDIT_BUDGET)
+
+    async def play(self, message, frames: List[Dict], interval: float, final_delay: float = None) -> int:
+        """Edit `message` through `frames` (message.edit kwargs). Returns how many frames were dropped."""
+        channel_id = message.channel.id
+        dropped = 0
+        interval = self.pace(channel_id, len(frames) - 1, interval)
+
+        for frame in frames[:-1]:
+            await asyncio.sleep(interval)
+            if self.try_acquire(channel_id, ANIMATION_FINAL_RESERVE):
+                await message.edit(**frame)
+                self.frames_sent += 1
+            else:
+                dropped += 1
+
+        await asyncio.sleep(interval if final_delay is None else final_delay)
+        await self.acquire(channel_id)
+        await message.edit(**frames[-1])
+        self.frames_sent += 1
+
+        if dropped:
+            self.frames_dropped += dropped
+            self.dropped_by_channel[channel_id] = self.dropped_by_channel.get(channel_id, 0) + dropped
+        return dropped
+
+animator = AnimationScheduler()
 
-def get_wheel_stats(user_id: int) -> Dict:
+# ------------------ GAME STATS ------------------
+
+GAME_LABELS = {
+    "wheel": "🎡 Wheel",
+    "plinko": "🔴 Plinko",
+    "blackjack": "🃏 Blackjack",
+    "coinflip": "🪙 Coin Flip",
+    "event": "💰 Greed or Glory",
+}
+
+def empty_game_stats() -> Dict:
+    return {"plays": 0, "wagered": 0, "won": 0, "biggest_win": 0}
+
+def load_game_stats():
     try:
-        with open("wheel_stats.json", "r") as f:
-            all_stats = json.load(f)
-            return all_stats.get(str(user_id), {"spins": 0, "total_won": 0, "biggest_win": 0})
-    except FileNotFoundError:
-        return {"spins": 0, "total_won": 0, "biggest_win": 0}
+        return read_json(guild_file(GAME_STATS_FILE))
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
 
-def update_wheel_stats(user_id: int, amount_won: int):
+    # First run: carry over the old wheel-only stats, which belong to the pre-partition economy
+    if current_guild.get() not in (None, LEGACY_GUILD_ID):
+        return {}
     try:
-        with open("wheel_stats.json", "r") as f:
-            all_stats = json.load(f)
-    except FileNotFoundError:
-        all_stats = {}
-    
-    user_stats = all_stats.get(str(user_id), {"spins": 0, "total_won": 0, "biggest_win": 0})
-    user_stats["spins"] += 1
-    user_stats["total_won"] += amount_won
-    if amount_won > user_stats["biggest_win"]:
-        user_stats["biggest_win"] = amount_won
-    
-    all_stats[str(user_id)] = user_stats
-    
-    with open("wheel_stats.json", "w") as f:
-        json.dump(all_stats, f)
+        wheel_stats = read_json(LEGACY_WHEEL_STATS_FILE)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    # The old file never recorded bets; legacy_won keeps those wins out of Net
+    return {
+        user_id: {"wheel": {
+            "plays": data.get("spins", 0),
+            "wagered": 0,
+            "won": data.get("total_won", 0),
+            "biggest_win": data.get("biggest_win", 0),
+            "legacy_won": data.get("total_won", 0)
+        }}
+        for user_id, data in wheel_stats.items()
+    }
 
-# Add this class for Blackjack
-class BlackjackGame:
-    def __init__(self, player_id: int, bet: int):
-        self.player_id = player_id
-        self.bet = bet
-        self.deck = self.create_deck()
-        self.player_hand = []
-        self.dealer_hand = []
-        self.game_over = False
-        self.outcome = ""
-        self.payout = 0
-        
-        # Deal initial cards
-        self.player_hand.append(self.draw_card())
-        self.dealer_hand.append(self.draw_card())
-        self.player_hand.append(self.draw_card())
-        self.dealer_hand.append(self.draw_card())
-    
-    @staticmethod
-    def create_deck() -> List[Dict]:
-        ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-        suits = ['♥', '♦', '♣', '♠']
-        deck = [{'rank': rank, 'suit': suit} for suit in suits for rank in ranks]
-        random.shuffle(deck)
-        return deck
-    
-    def draw_card(self) -> Dict:
-        return self.deck.pop()
-    
-    def calculate_hand_value(self, hand: List[Dict]) -> int:
-        value = 0
-        aces = 0
-        
-        for card in hand:
-            rank = card['rank']
-            if rank in ['J', 'Q', 'K']:
-                value += 10
-            elif rank == 'A':
-                value += 11
-                aces += 1
-            else:
-                value += int(rank)
+def write_game_stats(payload: str):
+    write_text(guild_file(GAME_STATS_FILE), payload)
+
+def add_game_stats(all_stats: Dict, user_id: str, game: str, plays: int, wagered: int, won: int, biggest_win: int):
+    stats = all_stats.setdefault(user_id, {}).get(game)
+    if stats is None:
+        stats = all_stats[user_id][game] = empty_game_stats()
+    stats["plays"] += plays
+    stats["wagered"] += wagered
+    stats["won"] += won
+    if biggest_win > stats["biggest_win"]:
+        stats["biggest_win"] = biggest_win
+
+def merge_game_stats(pending: Dict) -> Dict:
+    """Add `pending` counters to the stats file under the store lock; returns the merged stats."""
+    with store_lock:
+        all_stats = load_game_stats()
+        for user_id, games in pending.items():
+            for game, delta in games.items():
+                add_game_stats(all_stats, user_id, game, **delta)
+        write_game_stats(json.dumps(all_stats))
+    return all_stats
+
+class GameStatsService:
+    """In-memory per-user, per-game counters, flushed to disk by a background task.
+
+    Flushes merge only the plays recorded since the last flush into the file,
+    so every worker process can keep its own counters.
+    """
+
+    def __init__(self):
+        self.stats = None
+        self.pending: Dict[str, Dict[str, Dict]] = {}
+
+    def _all(self) -> Dict:
+        if self.stats is None:
+            self.stats = load_game_stats()
+        return self.stats
+
+    def record(self, user_id: int, game: str, wagered: int, won: int):
+        uid = str(user_id)
+        add_game_stats(self._all(), uid, game, 1, wagered, won, won)
+        add_game_stats(self.pending, uid, game, 1, wagered, won, won)
+
+    def get(self, user_id: int, game: str) -> Dict:
+        return dict(self._all().get(str(user_id), {}).get(game) or empty_game_stats())
+
+    def get_user(self, user_id: int) -> Dict[str, Dict]:
+        return {game: dict(stats) for game, stats in self._all().get(str(user_id), {}).items()}
+
+    def _merged(self, all_stats: Dict) -> Dict:
+        # Plays recorded while the merge ran are still pending; keep showing them
+        for user_id, games in self.pending.items():
+            for game, delta in games.items():
+                add_game_stats(all_stats, user_id, game, **delta)
+        return all_stats
+
+    def _restore(self, pending: Dict, error: Exception):
+        # The write failed; put the plays back so the next flush retries them
+        for user_id, games in pending.items():
+            for game, delta in games.items():
+                add_game_stats(self.pending, user_id, game, **delta)
+        print(f"[GameStats] Flush failed, keeping {len(pending)} users pending: {error!r}")
+
+    async def flush(self):
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, {}
+        try:
+            merged = await asyncio.to_thread(merge_game_stats, pending)
+        except Exception as e:
+            return self._restore(pending, e)
+        self.stats = self._merged(merged)
+
+    def flush_now(self):
+        if self.pending:
+            pending, self.pending = self.pending, {}
+            try:
+                merged = merge_game_stats(pending)
+            except Exception as e:
+                return self._restore(pending, e)
+            self.stats = self._merged(merged)
+
+# ------------------ GUILD PARTITIONS ------------------
+
+PARTITION_IDLE_SECONDS = int(os.getenv("PARTITION_IDLE_SECONDS", 1800))  # Idle time before a guild is evicted
+
+class GuildPartition:
+    """One guild's in-memory economy state. Its files live in partition_dir(guild_id)."""
+
+    def __init__(self, guild_id: Optional[int]):
+        self.guild_id = guild_id
+        self.marketplace = Marketplace()
+        self.market_board = MarketBoard(guild_id)
+        self.game_stats = GameStatsService()
+        self.inventories = InventoryCache()
+        self.last_used = time.monotonic()
+
+class PartitionRegistry:
+    """Guild partitions, loaded on first use and evicted once idle.
+
+    Nothing outside this registry keeps a reference to a partition, so an
+    evicted guild just loads again from its files the next time it's used.
+    """
+
+    def __init__(self):
+        self.partitions: Dict[Optional[int], GuildPartition] = {}
+        self.evicted = 0
+
+    def get(self, guild_id: Optional[int]) -> GuildPartition:
+        partition = self.partitions.get(guild_id)
+        if partition is None:
+            open_partition(guild_id)
+            partition = self.partitions[guild_id] = GuildPartition(guild_id)
+        partition.last_used = time.monotonic()
+        return partition
+
+    def current(self) -> GuildPartition:
+        return self.get(current_guild.get())
+
+    def peek(self, guild_id: Optional[int]) -> Optional[GuildPartition]:
+        """The guild's partition if it's loaded, without counting as a use."""
+        return self.partitions.get(guild_id)
+
+    def guild_ids(self) -> List[Optional[int]]:
+        """Every guild with data on disk, plus None for the shared (DM) files."""
+        try:
+            names = os.listdir(GUILD_DATA_DIR)
+        except FileNotFoundError:
+            names = []
+        return [None] + [int(name) for name in names if name.isdigit()]
+
+    async def flush(self):
+        for guild_id, partition in list(self.partitions.items()):
+            with guild_scope(guild_id):
+                await partition.game_stats.flush()
+
+    async def flush_inventories(self):
+        for guild_id, partition in list(self.partitions.items()):
+            await locked_call(guild_id, partition.inventories.flush)
+
+    def flush_now(self):
+        for guild_id, partition in list(self.partitions.items()):
+            with guild_scope(guild_id):
+                partition.inventories.flush()
+                partition.game_stats.flush_now()
+
+    async def evict_idle(self, idle: float = PARTITION_IDLE_SECONDS) -> int:
+        cutoff = time.monotonic() - idle
+        evicted = 0
+        for guild_id, partition in list(self.partitions.items()):
+            if partition.last_used > cutoff:
+                continue
+            await locked_call(guild_id, partition.inventories.flush)
+            with guild_scope(guild_id):
+                await partition.game_stats.flush()
+            if partition.last_used > cutoff or partition.game_stats.pending or partition.inventories.pending:
+                continue  # Used again while flushing
+            del self.partitions[guild_id]
+            store_lock.forget(guild_id)
+            evicted += 1
+        self.evicted += evicted
+        return evicted
+
+partitions = PartitionRegistry()
+
+# ------------------ GAME SESSIONS ------------------
+
+MAX_SESSIONS_PER_USER = 3
+MAX_SESSIONS_TOTAL = 5000
+SESSION_GRACE = 5  # Seconds past the view timeout before the reaper settles a session
+
+def load_game_escrow():
+    try:
+        return read_json(GAME_ESCROW_FILE)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_game_escrow(escrow):
+    with escrow_lock:
+        write_json_atomic(GAME_ESCROW_FILE, escrow)
+
+def load_game_journal():
+    try:
+        return read_json(GAME_JOURNAL_FILE)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_game_journal(journal):
+    with escrow_lock:
+        write_json_atomic(GAME_JOURNAL_FILE, journal)
+
+class GameSession:
+    __slots__ = ("id", "guild_id", "user_id", "game", "bet", "expires_at", "on_expire", "view", "closed")
+
+    def __init__(self, session_id: str, guild_id: Optional[int], user_id: int, game: str, bet: int,
+                 expires_at: float, on_expire=None):
+        self.id = session_id
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.game = game
+        self.bet = bet
+        self.expires_at = expires_at
+        self.on_expire = on_expire  # Returns the payout for an abandoned game; default is a refund
+        self.view = None
+        self.closed = False
+
+class GameSessionManager:
+    """Holds every running game's bet in escrow until it is settled.
+
+    The bet leaves the wallet when the game starts, so a user can't open
+    several games against the same coins, and each user can only have
+    MAX_SESSIONS_PER_USER games at once. Abandoned sessions are popped off a
+    timeout heap and settled (or refunded) by the reaper task.
+
+    Each step changes the wallet and the escrow file together, so it is
+    journaled like a trade step: the journal is written first with the new
+    balance and escrow, and replayed on the next start if a crash cut the
+    step short.
+    """
+
+    def __init__(self):
+        self.sessions: Dict[str, GameSession] = {}
+        self.by_user: Dict[int, set] = {}
+        self.expiry_heap: List[Tuple[float, str]] = []
+        self.escrow = {}
+        self._counter = 0
+
+    def active_count(self, user_id: int) -> int:
+        return len(self.by_user.get(user_id, ()))
+
+    def at_capacity(self, user_id: int) -> bool:
+        return self.active_count(user_id) >= MAX_SESSIONS_PER_USER or len(self.sessions) >= MAX_SESSIONS_TOTAL
+
+    def open(self, user_id: int, game: str, bet: int, timeout: float, on_expire=None) -> Optional[GameSession]:
+        """Escrow `bet` and start a session. Returns None if the user can't cover it or is at capacity."""
+        if self.at_capacity(user_id):
+            return None
+        balance = get_balance(user_id)
+        if balance < bet:
+            return None
+
+        self._counter += 1
+        session_id = f"{int(time.time())}-{self._counter}"
+        guild_id = current_guild.get()
+        session = GameSession(session_id, guild_id, user_id, game, bet, time.time() + timeout + SESSION_GRACE, on_expire)
+        self.sessions[session_id] = session
+        self.by_user.setdefault(user_id, set()).add(session_id)
+        heapq.heappush(self.expiry_heap, (session.expires_at, session_id))
+
+        self.escrow[session_id] = {"guild_id": guild_id, "user_id": user_id, "game": game, "bet": bet}
+        self._commit(user_id, balance - bet, self.escrow)
+        return session
+
+    def _commit(self, user_id: int, balance: Optional[int], escrow: Dict):
+        """Save the escrow and, if given, the user's new balance; journaled so a crash can't apply just one."""
+        save_game_journal({"guild_id": current_guild.get(), "user_id": user_id, "balance": balance, "escrow": escrow})
+        if balance is not None:
+            set_balance(user_id, balance)
+        save_game_escrow(escrow)
+        save_game_journal({})
+
+    def _close(self, session: GameSession) -> bool:
+        if session.closed:
+            return False
+        session.closed = True
+        self.sessions.pop(session.id, None)
+        user_sessions = self.by_user.get(session.user_id)
+        if user_sessions is not None:
+            user_sessions.discard(session.id)
+            if not user_sessions:
+                del self.by_user[session.user_id]
+        self.escrow.pop(session.id, None)
+        if session.view is not None:
+            session.view.stop()
+            session.view = None
+        return True
+
+    def settle(self, session: GameSession, payout: int, record: bool = True) -> bool:
+        """Release the escrow, paying out `payout`. False if the session was already closed."""
+        with guild_scope(session.guild_id), store_lock:
+            if not self._close(session):
+                return False
+            self._commit(session.user_id, get_balance(session.user_id) + payout if payout else None, self.escrow)
+            if record:
+                partitions.current().game_stats.record(session.user_id, session.game, session.bet, payout)
+            return True
+
+    def refund(self, session: GameSession) -> bool:
+        return self.settle(session, session.bet, record=False)
+
+    def expire(self, session: GameSession) -> bool:
+        with guild_scope(session.guild_id), store_lock:
+            if session.closed:
+                return False
+            if session.on_expire is None:
+                return self.refund(session)
+            return self.settle(session, session.on_expire())
+
+    def due(self, now: float = None) -> List[GameSession]:
+        """Pop the open sessions whose timeout has passed; the reaper expires each one."""
+        now = now or time.time()
+        sessions = []
+        while self.expiry_heap and self.expiry_heap[0][0] <= now:
+            _, session_id = heapq.heappop(self.expiry_heap)
+            session = self.sessions.get(session_id)
+            if session:
+                sessions.append(session)
+        return sessions
+
+    def refund_orphaned(self) -> int:
+        """Finish an interrupted step, then refund bets left in escrow by a previous run. Call once, before any game starts."""
+        self.recover()
+        orphaned = load_game_escrow()
+        refunded = len(orphaned)
+        # Each refund commits the escrow without its entry, so a crash here never refunds twice
+        for session_id, entry in list(orphaned.items()):
+            del orphaned[session_id]
+            with guild_scope(entry.get("guild_id", LEGACY_GUILD_ID)), store_lock:
+                self._commit(entry["user_id"], get_balance(entry["user_id"]) + entry["bet"], dict(orphaned))
+        if refunded:
+            print(f"[GameSessions] Refunded {refunded} orphaned bets")
+        return refunded
+
+    def recover(self) -> bool:
+        """Apply a journaled step a crash left half-written. True if there was one."""
+        journal = load_game_journal()
+        if not journal:
+            return False
+        # The journal holds the final balance, so applying it again is harmless
+        if journal["balance"] is not None:
+            with guild_scope(journal["guild_id"]), store_lock:
+                set_balance(journal["user_id"], journal["balance"])
+        save_game_escrow(journal["escrow"])
+        save_game_journal({})
+        print("[GameSessions] Finished a game step interrupted by the last shutdown")
+        return True
+
+game_sessions = GameSessionManager()
+
+# ------------------ WHEEL/BLACKJACK ------------------
+
+# ------------------ CARDS ------------------
+
+# Cards are ints 0-51: rank = card % 13, suit = card // 13
+CARD_RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+CARD_SUITS = ['♥', '♦', '♣', '♠']
+ACE = 12
+CARD_VALUES = [2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11] * 4
+CARD_LABELS = [f"{rank}{suit}" for suit in CARD_SUITS for rank in CARD_RANKS]
+
+BLACKJACK_SHOE_DECKS = int(os.getenv("BLACKJACK_SHOE_DECKS", 0))  # 0 = fresh deck every game
+BLACKJACK_SHOE_PENETRATION = float(os.getenv("BLACKJACK_SHOE_PENETRATION", 0.75))
+
+class BlackjackHand:
+    """Cards plus a running total, so the hand value is never recomputed."""
+    __slots__ = ("cards", "total", "soft_aces")
+
+    def __init__(self):
+        self.cards = []
+        self.total = 0
+        self.soft_aces = 0  # Aces still counted as 11
+
+    def add(self, card: int):
+        self.cards.append(card)
+        self.total += CARD_VALUES[card]
+        if card % 13 == ACE:
+            self.soft_aces += 1
+        while self.total > 21 and self.soft_aces:
+            self.total -= 10
+            self.soft_aces -= 1
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __str__(self):
+        return " ".join(CARD_LABELS[card] for card in self.cards)
+
+class Shoe:
+    """One or more decks dealt by lazy Fisher-Yates.
+
+    Every draw picks uniformly from the undealt part of the array, so no
+    up-front shuffle is needed and a reshuffle just marks every card undealt.
+    In a shared shoe, cards still on the table in other games go back in on
+    reshuffle; each game still sees a fair draw.
+    """
+
+    def __init__(self, decks: int = 1, penetration: float = BLACKJACK_SHOE_PENETRATION):
+        self.cards = list(range(52)) * decks
+        self.remaining = len(self.cards)
+        self.reshuffle_at = int(len(self.cards) * (1 - penetration))
+
+    def draw(self, rng: GameRNG) -> int:
+        if not self.remaining:
+            self.reshuffle()
+        j = rng.randrange(self.remaining)
+        self.remaining -= 1
+        cards = self.cards
+        cards[j], cards[self.remaining] = cards[self.remaining], cards[j]
+        return cards[self.remaining]
+
+    def needs_reshuffle(self) -> bool:
+        return self.remaining <= self.reshuffle_at
+
+    def reshuffle(self):
+        self.remaining = len(self.cards)
+
+blackjack_shoe = Shoe(BLACKJACK_SHOE_DECKS) if BLACKJACK_SHOE_DECKS > 0 else None
+
+# Add this class for Blackjack
+class BlackjackGame:
+    def __init__(self, player_id: int, bet: int, shoe: Shoe = None):
+        self.player_id = player_id
+        self.bet = bet
+        self.shoe = shoe or blackjack_shoe or Shoe()
+        if self.shoe.needs_reshuffle():
+            self.shoe.reshuffle()
+        self.player_hand = BlackjackHand()
+        self.dealer_hand = BlackjackHand()
+        self.game_over = False
+        self.outcome = ""
+        self.payout = 0
         
-        while value > 21 and aces > 0:
-            value -= 10
-            aces -= 1
-            
-        return value
+        # Deal initial cards
+        self.player_hand.add(self.draw_card())
+        self.dealer_hand.add(self.draw_card())
+        self.player_hand.add(self.draw_card())
+        self.dealer_hand.add(self.draw_card())
+    
+    def draw_card(self) -> int:
+        return self.shoe.draw(game_rng)
+    
+    def calculate_hand_value(self, hand: BlackjackHand) -> int:
+        return hand.total
     
     def hit(self):
         if not self.game_over:
-            self.player_hand.append(self.draw_card())
-            if self.calculate_hand_value(self.player_hand) > 21:
+            self.player_hand.add(self.draw_card())
+            if self.player_hand.total > 21:
                 self.stand()
     
     def stand(self):
         if not self.game_over:
             self.game_over = True
-            player_value = self.calculate_hand_value(self.player_hand)
-            dealer_value = self.calculate_hand_value(self.dealer_hand)
+            player_value = self.player_hand.total
             
             # Dealer draws until 17 or higher
-            while dealer_value < 17 and player_value <= 21:
-                self.dealer_hand.append(self.draw_card())
-                dealer_value = self.calculate_hand_value(self.dealer_hand)
+            while self.dealer_hand.total < 17 and player_value <= 21:
+                self.dealer_hand.add(self.draw_card())
+            dealer_value = self.dealer_hand.total
             
             # Determine outcome
             if player_value > 21:
@@ -1855,22 +4217,22 @@ class BlackjackGame:
                 self.outcome = f"You lose! {player_value} vs {dealer_value}"
                 self.payout = 0
     
-    def get_hand_as_string(self, hand: List[Dict], hide_first: bool = False) -> str:
+    def get_hand_as_string(self, hand: BlackjackHand, hide_first: bool = False) -> str:
         if hide_first:
-            return f"?? {hand[1]['rank']}{hand[1]['suit']}"
-        return " ".join(f"{card['rank']}{card['suit']}" for card in hand)
+            return f"?? {CARD_LABELS[hand.cards[1]]}"
+        return str(hand)
     
     def get_embed(self) -> discord.Embed:
         embed = discord.Embed(title="Blackjack", color=0x00FF00)
         
-        dealer_value = "??" if not self.game_over else self.calculate_hand_value(self.dealer_hand)
+        dealer_value = "??" if not self.game_over else self.dealer_hand.total
         embed.add_field(
             name=f"Dealer's Hand ({dealer_value})",
             value=self.get_hand_as_string(self.dealer_hand, not self.game_over),
             inline=False
         )
         
-        player_value = self.calculate_hand_value(self.player_hand)
+        player_value = self.player_hand.total
         embed.add_field(
             name=f"Your Hand ({player_value})",
             value=self.get_hand_as_string(self.player_hand),
@@ -1889,18 +4251,28 @@ class BlackjackGame:
         return embed
 
 # Add this view for Blackjack
-class BlackjackView(discord.ui.View):
-    def __init__(self, game: BlackjackGame):
-        super().__init__(timeout=60)
+class BlackjackView(ManagedView):
+    evictable = False
+
+    def __init__(self, game: BlackjackGame, session: GameSession):
+        super().__init__(game.player_id, timeout=60)
         self.game = game
+        self.session = session
+        session.on_expire = self.forfeit
+        session.view = self
+    
+    def forfeit(self) -> int:
+        """Abandoned games stand on the current hand."""
+        self.game.stand()
+        return self.game.payout
     
     async def update_message(self, interaction: discord.Interaction):
         embed = self.game.get_embed()
         if self.game.game_over:
+            # Pay out of escrow; the reaper may have settled it first
+            if not game_sessions.settle(self.session, self.game.payout):
+                return await interaction.response.edit_message(content="⌛ This game has expired.", embed=None, view=None)
             await interaction.response.edit_message(embed=embed, view=None)
-            # Update player's balance
-            current_balance = get_balance(self.game.player_id)
-            set_balance(self.game.player_id, current_balance - self.game.bet + self.game.payout)
         else:
             await interaction.response.edit_message(embed=embed, view=self)
     
@@ -1908,6 +4280,8 @@ class BlackjackView(discord.ui.View):
     async def hit_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user.id != self.game.player_id:
             return await interaction.response.send_message("This isn't your game!", ephemeral=True)
+        if self.session.closed:
+            return await interaction.response.send_message("This game has expired.", ephemeral=True)
         self.game.hit()
         await self.update_message(interaction)
     
@@ -1915,16 +4289,30 @@ class BlackjackView(discord.ui.View):
     async def stand_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user.id != self.game.player_id:
             return await interaction.response.send_message("This isn't your game!", ephemeral=True)
+        if self.session.closed:
+            return await interaction.response.send_message("This game has expired.", ephemeral=True)
         self.game.stand()
         await self.update_message(interaction)
+    
+    async def on_timeout(self):
+        await locked_call(self.session.guild_id, game_sessions.expire, self.session)
+        await super().on_timeout()
 
 # Add this view for Wheel
-class WheelView(discord.ui.View):
-    def __init__(self, user_id: int, bet: int):
-        super().__init__(timeout=30)
+class WheelView(ManagedView):
+    evictable = False
+
+    def __init__(self, user_id: int, bet: int, session: GameSession):
+        super().__init__(user_id, timeout=30)
         self.user_id = user_id
         self.bet = bet
+        self.session = session
         self.spinning = False
+        session.view = self
+
+    async def on_timeout(self):
+        await locked_call(self.session.guild_id, game_sessions.expire, self.session)
+        await super().on_timeout()
 
     @discord.ui.button(label="Spin Wheel!", style=discord.ButtonStyle.primary, emoji="🎡")
     async def spin_button(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -1934,19 +4322,20 @@ class WheelView(discord.ui.View):
         if self.spinning:
             return await interaction.response.send_message("Wheel is already spinning!", ephemeral=True)
 
+        selected = game_rng.spin_wheel()
+        winnings = int(self.bet * selected["multiplier"])
+        if not game_sessions.settle(self.session, winnings):
+            return await interaction.response.send_message("This spin has expired.", ephemeral=True)
+
         self.spinning = True
         button.disabled = True
         await interaction.message.edit(view=self)
 
         await interaction.response.defer()
 
-        total_weight = sum(section["weight"] for section in WHEEL_SECTIONS)
-        selected = random.choices(WHEEL_SECTIONS, weights=[s["weight"] for s in WHEEL_SECTIONS], k=1)[0]
-
-        message = await interaction.followup.send("Spinning the wheel... 🎡")
-
+        frames = []
         for _ in range(5):
-            temp_selection = random.choice(WHEEL_SECTIONS)
+            temp_selection = game_rng.choice(WHEEL_SECTIONS)
             embed = discord.Embed(
                 title="Wheel of Fortune",
                 description=f"Bet: {self.bet} coins",
@@ -1958,10 +4347,8 @@ class WheelView(discord.ui.View):
                       f"Payout: {int(self.bet * temp_selection['multiplier'])} coins",
                 inline=False
             )
-            await message.edit(embed=embed)
-            await asyncio.sleep(0.5)
+            frames.append({"embed": embed})
 
-        winnings = int(self.bet * selected["multiplier"])
         embed = discord.Embed(
             title="Wheel of Fortune",
             description=f"Bet: {self.bet} coins",
@@ -1974,20 +4361,18 @@ class WheelView(discord.ui.View):
             inline=False
         )
 
-        current_balance = get_balance(self.user_id)
-        set_balance(self.user_id, current_balance - self.bet + winnings)
-        update_wheel_stats(self.user_id, winnings)
-
-        stats = get_wheel_stats(self.user_id)
+        stats = partitions.current().game_stats.get(self.user_id, "wheel")
         embed.add_field(
             name="Your Wheel Stats",
-            value=f"Total spins: {stats['spins']}\n"
-                  f"Total won: {stats['total_won']} coins\n"
+            value=f"Total spins: {stats['plays']}\n"
+                  f"Total won: {stats['won']} coins\n"
                   f"Biggest win: {stats['biggest_win']} coins",
             inline=False
         )
+        frames.append({"embed": embed})
 
-        await message.edit(embed=embed)
+        message = await interaction.followup.send("Spinning the wheel... 🎡")
+        await animator.play(message, frames, interval=0.5)
         await interaction.message.delete()
 
 # Replace the stub BJ command with this implementation
@@ -1995,80 +4380,102 @@ class WheelView(discord.ui.View):
 async def bj(ctx, amount: int):
     """Play a game of Blackjack"""
     user_id = ctx.author.id
-    current_balance = get_balance(user_id)
     
     if amount <= 0:
         return await ctx.send("❌ Bet must be more than 0.")
-    if current_balance < amount:
+    if game_sessions.at_capacity(user_id):
+        return await ctx.send(f"❌ You already have {MAX_SESSIONS_PER_USER} games running. Finish one first.")
+    session = game_sessions.open(user_id, "blackjack", amount, timeout=60)
+    if session is None:
         return await ctx.send("❌ You don't have enough balance.")
     
     game = BlackjackGame(user_id, amount)
-    view = BlackjackView(game)
+    view = BlackjackView(game, session)
     
     embed = game.get_embed()
-    await ctx.send(embed=embed, view=view)
+    view.message = await ctx.send(embed=embed, view=view)
 
 # Add this new wheel command
 @bot.command(aliases=["spin"])
 async def wheel(ctx, amount: int):
     """Spin the wheel of fortune with your bet"""
     user_id = ctx.author.id
-    current_balance = get_balance(user_id)
     
     if amount <= 0:
         return await ctx.send("❌ Bet must be more than 0.")
-    if current_balance < amount:
+    if game_sessions.at_capacity(user_id):
+        return await ctx.send(f"❌ You already have {MAX_SESSIONS_PER_USER} games running. Finish one first.")
+    session = game_sessions.open(user_id, "wheel", amount, timeout=30)
+    if session is None:
         return await ctx.send("❌ You don't have enough balance.")
     
     # Show wheel sections
-    embed = discord.Embed(
-        title="Wheel of Fortune",
-        description=f"Bet: {amount} coins\n\n"
-                   "Possible outcomes:",
-        color=0x7289DA
-    )
+    embed = templates.embed("wheel")
+    embed.description = f"Bet: {amount} coins\n\nPossible outcomes:"
     
-    for section in WHEEL_SECTIONS:
-        embed.add_field(
-            name=section["name"],
-            value=f"{section['multiplier']}x payout",
-            inline=True
-        )
-    
-    view = WheelView(user_id, amount)
-    await ctx.send(embed=embed, view=view)
+    view = WheelView(user_id, amount, session)
+    view.message = await ctx.send(embed=embed, view=view)
 
 # Add this command to check wheel stats
 @bot.command()
 async def wheelstats(ctx, member: discord.Member = None):
     """Check your wheel spin statistics"""
     user = member or ctx.author
-    stats = get_wheel_stats(user.id)
+    stats = partitions.current().game_stats.get(user.id, "wheel")
     
     embed = discord.Embed(
         title=f"{user.display_name}'s Wheel Stats",
         color=0x7289DA
     )
-    embed.add_field(name="Total Spins", value=stats["spins"], inline=True)
-    embed.add_field(name="Total Won", value=f"{stats['total_won']} coins", inline=True)
+    embed.add_field(name="Total Spins", value=stats["plays"], inline=True)
+    embed.add_field(name="Total Won", value=f"{stats['won']} coins", inline=True)
     embed.add_field(name="Biggest Win", value=f"{stats['biggest_win']} coins", inline=True)
     
     await ctx.send(embed=embed)
 
+@bot.command()
+async def gamestats(ctx, member: discord.Member = None):
+    """Check your statistics for every game"""
+    user = member or ctx.author
+    user_stats = partitions.current().game_stats.get_user(user.id)
+    
+    embed = discord.Embed(
+        title=f"{user.display_name}'s Game Stats",
+        color=0x7289DA
+    )
+    if not user_stats:
+        embed.description = "No games played yet!"
+    
+    for game, label in GAME_LABELS.items():
+        stats = user_stats.get(game)
+        if not stats:
+            continue
+        unit = "event gold" if game == "event" else "coins"
+        lines = [f"Plays: {stats['plays']:,}"]
+        if stats["wagered"]:
+            lines.append(f"Wagered: {stats['wagered']:,} {unit}")
+            lines.append(f"Net: {stats['won'] - stats.get('legacy_won', 0) - stats['wagered']:+,} {unit}")
+        lines.append(f"Won: {stats['won']:,} {unit}")
+        lines.append(f"Biggest win: {stats['biggest_win']:,} {unit}")
+        embed.add_field(name=label, value="\n".join(lines), inline=True)
+    
+    await ctx.send(embed=embed)
+
 # ------------------ PLINKO ------------------
 
 
-def create_tilted_board() -> list:
+def create_tilted_board(rows: int = None, width: int = PLINKO_WIDTH) -> list:
+    rows = PLINKO_ROWS if rows is None else rows
     board = []
-    for row in range(PLINKO_ROWS):
+    for row in range(rows):
         line = []
-        for col in range(PLINKO_WIDTH):
+        for col in range(width):
             if col % 2 == row % 2:
                 line.append("🟡")  # Peg
             else:
                 line.append("⬛")  # Empty space
         board.append(line)
-    board.append(["🔳" if i in PLINKO_MULTIPLIERS else "⬛" for i in range(PLINKO_WIDTH)])
+    board.append(["🔳" if i in PLINKO_MULTIPLIERS else "⬛" for i in range(width)])
     return board
 
 def render_tilted_board(board: list, ball_pos: tuple = None) -> str:
@@ -2079,6 +4486,36 @@ def render_tilted_board(board: list, ball_pos: tuple = None) -> str:
             display[row][col] = "🔴"
     return "\n".join("".join(r) for r in display)
 
+class PlinkoBoard:
+    """Every animation frame of a board, rendered once and looked up by (row, col)."""
+
+    def __init__(self, rows: int = None, width: int = PLINKO_WIDTH):
+        self.rows = PLINKO_ROWS if rows is None else rows
+        self.width = width
+        board = create_tilted_board(self.rows, width)
+        self.frames = {
+            (row, col): f"**Plinko Ball Drop!**\n{render_tilted_board(board, (row, col))}"
+            for row in range(self.rows + 1)
+            for col in range(width)
+        }
+
+    def sample_path(self, rng: GameRNG) -> List[int]:
+        """Ball column at every row, from the drop point down to the landing slot."""
+        col = self.width // 2
+        path = [col]
+        for _ in range(self.rows):
+            col = max(0, min(col + rng.plinko_move(), self.width - 1))
+            path.append(col)
+        return path
+
+plinko_board = PlinkoBoard()
+
+def set_plinko_rows(rows: int):
+    """Resize the board; its frames are rebuilt before the next drop."""
+    global PLINKO_ROWS, plinko_board
+    PLINKO_ROWS = rows
+    plinko_board = PlinkoBoard(rows)
+
 @bot.command()
 async def plinko(ctx, amount: int):
     user_id = ctx.author.id
@@ -2089,34 +4526,40 @@ async def plinko(ctx, amount: int):
     if balance < amount:
         return await ctx.send("❌ You don't have enough coins.")
 
-    board = create_tilted_board()
-    col = PLINKO_WIDTH // 2
-    message = await ctx.send(f"**Plinko Ball Drop!**\n{render_tilted_board(board, (0, col))}")
-
-    for row in range(PLINKO_ROWS):
-        await asyncio.sleep(0.2)
-        move = random.choice([-1, 1])
-        col = max(0, min(col + move, PLINKO_WIDTH - 1))
-        await message.edit(content=f"**Plinko Ball Drop!**\n{render_tilted_board(board, (row + 1, col))}")
+    board = plinko_board
+    path = board.sample_path(game_rng)
 
     # Final outcome
+    col = path[-1]
     multiplier = PLINKO_MULTIPLIERS.get(col, 0)
     winnings = int(amount * multiplier)
     set_balance(user_id, balance - amount + winnings)
+    partitions.current().game_stats.record(user_id, "plinko", amount, winnings)
+
+    frames = [{"content": board.frames[(row, path[row])]} for row in range(1, board.rows + 1)]
+    frames.append({"content": f"{board.frames[(board.rows, col)]}\n\n"
+                              f"🎯 Landed in slot {col + 1} ({multiplier}x)\n"
+                              f"💰 You won **{winnings} coins**!"})
 
-    await asyncio.sleep(0.5)
-    await message.edit(content=f"**Plinko Ball Drop!**\n{render_tilted_board(board, (PLINKO_ROWS, col))}\n\n"
-                               f"🎯 Landed in slot {col + 1} ({multiplier}x)\n"
-                               f"💰 You won **{winnings} coins**!")
+    message = await ctx.send(board.frames[(0, path[0])])
+    await animator.play(message, frames, interval=0.2, final_delay=0.5)
 
 # ------------------ COIN FLIP BUTTONS ------------------
 
-class CoinFlipView(discord.ui.View):
-    def __init__(self, user_id: int, bet_amount: int):
-        super().__init__(timeout=30)
+class CoinFlipView(ManagedView):
+    evictable = False
+
+    def __init__(self, user_id: int, bet_amount: int, session: GameSession):
+        super().__init__(user_id, timeout=30)
         self.user_id = user_id
         self.bet_amount = bet_amount
+        self.session = session
         self.has_responded = False
+        session.view = self
+
+    async def on_timeout(self):
+        await locked_call(self.session.guild_id, game_sessions.expire, self.session)
+        await super().on_timeout()
 
     async def disable_all_items(self):
         for item in self.children:
@@ -2127,24 +4570,21 @@ class CoinFlipView(discord.ui.View):
             await interaction.response.send_message("You already flipped!", ephemeral=True)
             return
 
-        current_balance = get_balance(self.user_id)
-
-        if self.bet_amount > current_balance:
-            await interaction.response.send_message("You don't have enough balance for this bet!", ephemeral=True)
-            await self.disable_all_items()
-            await interaction.message.edit(view=self)
-            return
-
-        result = random.choice(["heads", "tails"])
+        result = game_rng.coin_flip()
 
         if result == user_choice:
-            new_balance = current_balance + self.bet_amount
+            payout = self.bet_amount * 2
             outcome = f"🎉 It was **{result.capitalize()}**! You **won** {self.bet_amount} coins!"
         else:
-            new_balance = current_balance - self.bet_amount
+            payout = 0
             outcome = f"😢 It was **{result.capitalize()}**. You **lost** {self.bet_amount} coins."
 
-        set_balance(self.user_id, new_balance)
+        # The bet is already in escrow
+        if not game_sessions.settle(self.session, payout):
+            await interaction.response.send_message("This coin flip has expired.", ephemeral=True)
+            return
+
+        new_balance = get_balance(self.user_id)
         self.has_responded = True
         bank_data = get_bank_data(self.user_id)  # Get bank data
 
@@ -2173,15 +4613,121 @@ class CoinFlipView(discord.ui.View):
 @bot.command()
 async def cf(ctx, amount: int):
     user_id = ctx.author.id
-    current_balance = get_balance(user_id)
 
     if amount <= 0:
         return await ctx.send("❌ Bet must be more than 0.")
-    if current_balance < amount:
+    if game_sessions.at_capacity(user_id):
+        return await ctx.send(f"❌ You already have {MAX_SESSIONS_PER_USER} games running. Finish one first.")
+    session = game_sessions.open(user_id, "coinflip", amount, timeout=30)
+    if session is None:
         return await ctx.send("❌ You don't have enough balance.")
 
-    view = CoinFlipView(user_id, amount)
-    await ctx.send(f"{ctx.author.mention}, choose Heads or Tails to flip the coin and bet **{amount}** coins!", view=view)
+    view = CoinFlipView(user_id, amount, session)
+    view.message = await ctx.send(f"{ctx.author.mention}, choose Heads or Tails to flip the coin and bet **{amount}** coins!", view=view)
+
+# ------------------ JOB RUNNER ------------------
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_PROGRESS_INTERVAL = 2.0  # Seconds between status message edits
+JOB_PROGRESS_STEPS = 20  # Progress updates a job sends over its whole run
+
+def report_progress(progress, done: int, total: int):
+    """Called by jobs in the pool; sends roughly JOB_PROGRESS_STEPS updates per job."""
+    if progress is not None and (done == total or done % max(total // JOB_PROGRESS_STEPS, 1) == 0):
+        progress.put((done, total))
+
+def run_in_guild(data_dir: str, guild_id: Optional[int], job, *args):
+    """Pool entry point: run `job` in the partition of the guild that started it.
+
+    Store paths are relative, so the worker moves to the bot's data
+    directory first; it may have been started from another one.
+    """
+    os.chdir(data_dir)
+    with guild_scope(guild_id):
+        return job(*args)
+
+def latest_progress(progress) -> Optional[Tuple[int, int]]:
+    latest = None
+    while True:
+        try:
+            latest = progress.get_nowait()
+        except queue.Empty:
+            return latest
+
+class JobRunner:
+    """Runs CPU-heavy jobs in a process pool so they don't stall the event loop.
+
+    A job is a module-level function whose first argument is a progress
+    queue (or None); it puts (done, total) on it, which run() shows by
+    editing a status message in the channel. Jobs run in the partition of
+    the guild that started them and take store_lock themselves while they
+    read or write the store.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.pool = None
+        self.manager = None
+        self.running = set()
+
+    def _start(self):
+        if self.pool is None:
+            # Only jobs need these, so they're imported on the first one
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # Forking a process that has a running event loop and threads isn't safe
+            context = multiprocessing.get_context("spawn")
+            self.manager = context.Manager()
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=context)
+
+    async def run(self, ctx, name: str, job, *args, status: bool = True):
+        """Run `job` in the pool. Returns its result, or None if it failed or is already running."""
+        key = (current_guild.get(), name)
+        if status and key in self.running:
+            await ctx.send(f"❌ `{name}` is already running.")
+            return None
+        if status:
+            self.running.add(key)
+        try:
+            # The job reads the files from another process
+            await locked_call(current_guild.get(), partitions.current().inventories.flush)
+            if self.pool is None:
+                await asyncio.to_thread(self._start)
+            progress = await asyncio.to_thread(self.manager.Queue) if status else None
+            started = time.perf_counter()
+            future = asyncio.wrap_future(self.pool.submit(run_in_guild, os.getcwd(), current_guild.get(), job, progress, *args))
+            message = await ctx.send(f"⏳ `{name}` started...") if status else None
+
+            while not future.done():
+                await asyncio.wait({future}, timeout=JOB_PROGRESS_INTERVAL)
+                update = await asyncio.to_thread(latest_progress, progress) if progress is not None else None
+                if update and not future.done():
+                    done, total = update
+                    await message.edit(content=f"⏳ `{name}`: {done:,}/{total:,} ({done * 100 // max(total, 1)}%)")
+
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"[Jobs] {name} failed: {e!r}")
+                if message:
+                    await message.edit(content=f"❌ `{name}` failed: {e}")
+                else:
+                    await ctx.send(f"❌ `{name}` failed, try again later.")
+                return None
+            if message:
+                await message.edit(content=f"✅ `{name}` finished in {time.perf_counter() - started:.1f}s")
+            return result
+        finally:
+            self.running.discard(key)
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.manager.shutdown()
+            self.pool = self.manager = None  # The next job starts a fresh pool
+
+job_runner = JobRunner(JOB_WORKERS)
 
 # ------------------ BALANCE CHECK COMMANDS ------------------
 
@@ -2192,14 +4738,13 @@ async def bal(ctx, member: discord.Member = None):
     await view.initialize()
     await view.send_initial_message(ctx)
 
-class BalanceView(discord.ui.View):
+class BalanceView(ManagedView):
     def __init__(self, user_id: int, ctx):
-        super().__init__(timeout=60)
+        super().__init__(ctx.author.id, timeout=60)
         self.user_id = user_id
         self.ctx = ctx
         self.member = None
         self.current_mode = "wallet"
-        self.message = None
 
     async def initialize(self):
         self.member = self.ctx.guild.get_member(self.user_id)
@@ -2279,49 +4824,44 @@ class BalanceView(discord.ui.View):
         self.current_mode = "currency"
         await interaction.response.edit_message(embed=self.create_embed(), view=self)
 
-    async def on_timeout(self):
-        for item in self.children:
-            item.disabled = True
-        if self.message:
-            try:
-                await self.message.edit(view=self)
-            except discord.NotFound:
-                pass
 
+def leaderboard_job(progress, type: str, user_id: str):
+    """Rank every user by wallet, bank or total.
 
-@bot.command(aliases=["lb"])
-async def leaderboard(ctx, type: str = "wallet"):
-    """Show the wealth leaderboard (wallet, bank, or total)"""
-    valid_types = ["wallet", "bank", "total"]
-    if type.lower() not in valid_types:
-        return await ctx.send(f"❌ Invalid type. Use: {', '.join(valid_types)}")
-
-    balances = load_balances()
-    bank_data = load_bank_data()
+    Returns the top 10 as (user_id, amount) and user_id's (position, amount).
+    """
+    with store_lock:
+        balances = load_balances()
+        bank_data = load_bank_data()
 
-    # Prepare leaderboard data
     lb_data = []
-    for user_id, balance in balances.items():
-        bank_amount = bank_data.get(str(user_id), {}).get("deposited", 0)
+    for uid, balance in balances.items():
+        bank_amount = bank_data.get(str(uid), {}).get("deposited", 0)
         if type == "wallet":
             amount = balance
         elif type == "bank":
             amount = bank_amount
         else:  # total
             amount = balance + bank_amount
+        lb_data.append((uid, amount))
+        report_progress(progress, len(lb_data), len(balances))
 
-        # Try to get member name
-        try:
-            member = await ctx.guild.fetch_member(int(user_id))
-            name = member.display_name
-        except:
-            name = f"User {user_id}"
+    lb_data.sort(key=lambda x: x[1], reverse=True)
+    current = next(((i, amount) for i, (uid, amount) in enumerate(lb_data, 1) if uid == user_id), (None, 0))
+    return lb_data[:10], current
 
-        lb_data.append((user_id, name, amount))  # Store user_id along with name and amount
+@bot.command(aliases=["lb"])
+async def leaderboard(ctx, type: str = "wallet"):
+    """Show the wealth leaderboard (wallet, bank, or total)"""
+    valid_types = ["wallet", "bank", "total"]
+    type = type.lower()
+    if type not in valid_types:
+        return await ctx.send(f"❌ Invalid type. Use: {', '.join(valid_types)}")
 
-    # Sort and get top 10
-    lb_data.sort(key=lambda x: x[2], reverse=True)  # Sort by amount (index 2)
-    top_10 = lb_data[:10]
+    ranked = await job_runner.run(ctx, "leaderboard", leaderboard_job, type, str(ctx.author.id), status=False)
+    if ranked is None:
+        return
+    top_10, (current_pos, current_amount) = ranked
 
     # Create embed
     embed = discord.Embed(
@@ -2329,7 +4869,15 @@ async def leaderboard(ctx, type: str = "wallet"):
         color=discord.Color.gold()
     )
 
-    for i, (_, name, amount) in enumerate(top_10, 1):
+    for i, (user_id, amount) in enumerate(top_10, 1):
+        # Only the top 10 need a name
+        member = ctx.guild.get_member(int(user_id))
+        if member is None:
+            try:
+                member = await ctx.guild.fetch_member(int(user_id))
+            except discord.HTTPException:
+                pass
+        name = member.display_name if member else f"User {user_id}"
         embed.add_field(
             name=f"{i}. {name}",
             value=f"{amount:,} coins",
@@ -2337,17 +4885,6 @@ async def leaderboard(ctx, type: str = "wallet"):
         )
 
     # Add current user's position if not in top 10
-    current_user_id = str(ctx.author.id)
-    current_pos = None
-    current_amount = 0
-    
-    # Find the current user's position
-    for i, (user_id, _, amount) in enumerate(lb_data, 1):
-        if user_id == current_user_id:
-            current_pos = i
-            current_amount = amount
-            break
-
     if current_pos and current_pos > 10:
         embed.add_field(
             name=f"Your Position: #{current_pos}",
@@ -2381,30 +4918,128 @@ async def admin_setbal(ctx, member: discord.Member, amount: int):
 
 @bot.command()
 @is_admin()
-async def checkall(ctx):
-    """Export all user data including current stock levels and event gold"""
-    def safe_convert(value):
-        """Convert values safely handling scientific notation and large numbers"""
-        try:
-            if isinstance(value, str) and 'e' in value.lower():
-                return int(float(value))
-            return int(value)
-        except (ValueError, TypeError):
-            return 0
+async def animstats(ctx):
+    """Show how many animation frames were sent and dropped"""
+    busiest = sorted(animator.dropped_by_channel.items(), key=lambda x: x[1], reverse=True)[:5]
+    embed = discord.Embed(title="🎞️ Animation Scheduler", color=discord.Color.blurple())
+    embed.add_field(name="Frames Sent", value=f"{animator.frames_sent:,}", inline=True)
+    embed.add_field(name="Frames Dropped", value=f"{animator.frames_dropped:,}", inline=True)
+    embed.add_field(name="Tracked Channels", value=str(len(animator.buckets)), inline=True)
+    if busiest:
+        embed.add_field(
+            name="Most Dropped",
+            value="\n".join(f"<#{channel_id}>: {count:,}" for channel_id, count in busiest),
+            inline=False
+        )
+    await ctx.send(embed=embed)
 
-    balances = load_balances()
-    bank_data = load_bank_data()
-    loans = load_loans()
-    inventories = load_inventories()
-    currency_prices = load_currency_prices()
-    currency_stocks = load_currency_stocks()
-    
-    # Load event balances
+@bot.command()
+@is_admin()
+async def viewstats(ctx):
+    """Show live UI views, their estimated memory and evictions"""
+    stats = view_registry.stats()
+    embed = discord.Embed(title="🧩 Live Views", color=discord.Color.blurple())
+    embed.add_field(name="Live", value=f"{stats['live']:,} / {view_registry.total:,}", inline=True)
+    embed.add_field(name="Peak", value=f"{stats['peak']:,}", inline=True)
+    embed.add_field(name="Est. Memory", value=f"{stats['bytes'] / 1024:,.1f} KiB", inline=True)
+    embed.add_field(name="Users", value=f"{stats['users']:,}", inline=True)
+    embed.add_field(name="Tracked", value=f"{stats['tracked']:,}", inline=True)
+    embed.add_field(
+        name="Evicted",
+        value=" | ".join(f"{reason}: {count:,}" for reason, count in stats["evicted"].items()),
+        inline=True
+    )
+    if stats["by_type"]:
+        by_type = sorted(stats["by_type"].items(), key=lambda x: x[1]["live"], reverse=True)
+        embed.add_field(
+            name="By Type",
+            value="\n".join(
+                f"{view_type}: {entry['live']:,} ({entry['bytes'] / 1024:,.1f} KiB)"
+                for view_type, entry in by_type[:10]
+            ),
+            inline=False
+        )
+    await ctx.send(embed=embed)
+
+@bot.command()
+@is_admin()
+async def iostats(ctx, *, name: str = None):
+    """Show storage I/O per command, or the per-file breakdown for one command"""
+    if name is not None:
+        if name not in io_stats.by_span and not name.startswith(("cmd:", "view:")):
+            name = f"cmd:{name}"
+        entry = io_stats.by_span.get(name)
+        if entry is None:
+            return await ctx.send(f"❌ No I/O recorded for `{name}`.")
+        calls = io_stats.invocations(name)
+        embed = discord.Embed(title=f"💾 I/O: {name}", color=discord.Color.blurple())
+        embed.add_field(name="Invocations", value=f"{calls:,}", inline=True)
+        embed.add_field(name="Reads / Writes", value=f"{entry['reads']:,} / {entry['writes']:,}", inline=True)
+        embed.add_field(name="Time", value=f"{entry['seconds'] * 1000:,.1f} ms", inline=True)
+        embed.add_field(
+            name="Bytes Read / Written",
+            value=f"{entry['bytes_read'] / 1024:,.1f} / {entry['bytes_written'] / 1024:,.1f} KiB",
+            inline=False
+        )
+        files = sorted(entry["files"].items(), key=lambda x: x[1], reverse=True)
+        embed.add_field(
+            name="Files",
+            value="\n".join(
+                f"{path}: {count:,}" + (f" ({count / calls:.1f}/call)" if calls else "")
+                for path, count in files[:15]
+            ),
+            inline=False
+        )
+        return await ctx.send(embed=embed)
+
+    if not io_stats.by_span:
+        return await ctx.send("💾 No storage I/O recorded yet.")
+    ranked = sorted(
+        io_stats.by_span.items(),
+        key=lambda x: x[1]["bytes_read"] + x[1]["bytes_written"],
+        reverse=True
+    )
+    lines = []
+    for span_name, entry in ranked[:15]:
+        calls = io_stats.invocations(span_name)
+        ops = entry["reads"] + entry["writes"]
+        per_call = f", {ops / calls:.1f} ops/call" if calls else ""
+        lines.append(
+            f"`{span_name}`: {ops:,} ops{per_call}, "
+            f"{(entry['bytes_read'] + entry['bytes_written']) / 1024:,.1f} KiB, {entry['seconds'] * 1000:,.0f} ms"
+        )
+    embed = discord.Embed(title="💾 Storage I/O by Command", description="\n".join(lines), color=discord.Color.blurple())
+    embed.set_footer(text="-iostats <command> for a per-file breakdown")
+    await ctx.send(embed=embed)
+
+@bot.command()
+@is_admin()
+async def plinkorows(ctx, rows: int):
+    """Change the number of plinko peg rows"""
+    if not 1 <= rows <= 12:
+        return await ctx.send("❌ Rows must be between 1 and 12.")
+    set_plinko_rows(rows)
+    await ctx.send(f"✅ Plinko board now has **{rows} rows**.")
+
+def safe_convert(value):
+    """Convert values safely handling scientific notation and large numbers"""
     try:
-        with open("event_balances.json", "r") as f:
-            event_balances = json.load(f)
-    except FileNotFoundError:
-        event_balances = {}
+        if isinstance(value, str) and 'e' in value.lower():
+            return int(float(value))
+        return int(value)
+    except (ValueError, TypeError):
+        return 0
+
+def checkall_job(progress) -> List[str]:
+    """Build the checkall export; returns it split into message-sized chunks."""
+    with store_lock:
+        balances = load_balances()
+        bank_data = load_bank_data()
+        loans = load_loans()
+        inventories = load_inventories()
+        currency_prices = load_currency_prices()
+        currency_stocks = load_currency_stocks()
+        event_balances = load_event_balances()
 
     output = ["=== MARKET DATA ==="]
     for currency in ["BobBux", "DxBux", "Gold"]:
@@ -2415,7 +5050,8 @@ async def checkall(ctx):
     output.append("\n=== USER DATA ===")
     all_user_ids = set(balances.keys()) | set(bank_data.keys()) | set(loans.keys()) | set(inventories.keys()) | set(event_balances.keys())
 
-    for user_id in all_user_ids:
+    for done, user_id in enumerate(all_user_ids, 1):
+        report_progress(progress, done, len(all_user_ids))
         wallet = safe_convert(balances.get(user_id, 1000))
         
         b_data = bank_data.get(user_id, {"plan": None, "deposited": 0})
@@ -2466,52 +5102,37 @@ async def checkall(ctx):
 
     if current_chunk:
         chunks.append(current_chunk)
+    return chunks
+
+@bot.command()
+@is_admin()
+async def checkall(ctx):
+    """Export all user data including current stock levels and event gold"""
+    chunks = await job_runner.run(ctx, "checkall", checkall_job)
+    if chunks is None:
+        return
 
     for i, chunk in enumerate(chunks, 1):
         if len(chunks) > 1:
             chunk = f"=== PART {i}/{len(chunks)} ===\n{chunk}"
         await ctx.send(f"```{chunk}```")
 
-@bot.command()
-@is_admin()
-async def setall(ctx, *, data: str = None):
-    """Import all user data including stock-aware currencies and event gold
-    Usage: 
-    - Paste the data directly after the command
-    - Or attach a .txt file with the data
-    """
-    # Check for file attachment if no text data provided
-    if data is None and ctx.message.attachments:
-        attachment = ctx.message.attachments[0]
-        if not attachment.filename.lower().endswith('.txt'):
-            return await ctx.send("❌ Please upload a .txt file")
-        
-        try:
-            file_content = await attachment.read()
-            data = file_content.decode('utf-8')
-        except Exception as e:
-            return await ctx.send(f"❌ Error reading file: {e}")
-    
-    # If still no data, show help
-    if data is None:
-        return await ctx.send("❌ Please provide data either as text or in a .txt file attachment")
-
-    # Clean the input data
-    if data.startswith('```') and data.endswith('```'):
-        data = data[3:-3].strip()
-
+def setall_job(progress, data: str) -> Dict:
+    """Parse a checkall export and replace the store with it; returns a summary for the reply."""
     lines = data.split('\n')
     balances = {}
     bank_data = {}
     loans = {}
     inventories = {}
     event_balances = {}
-    currency_prices = load_currency_prices()
-    currency_stocks = load_currency_stocks()
+    with store_lock:
+        currency_prices = load_currency_prices()
+        currency_stocks = load_currency_stocks()
 
     current_section = None
 
-    for line in lines:
+    for done, line in enumerate(lines, 1):
+        report_progress(progress, done, len(lines))
         line = line.strip()
         if not line:
             continue
@@ -2591,16 +5212,59 @@ async def setall(ctx, *, data: str = None):
                     continue
 
     # Save all data
-    save_balances(balances)
-    save_bank_data(bank_data)
-    save_loans(loans)
-    save_inventories(inventories)
-    save_currency_prices(currency_prices)
-    save_currency_stocks(currency_stocks)
+    with store_lock:
+        save_balances(balances)
+        save_bank_data(bank_data)
+        save_loans(loans)
+        save_inventories(inventories)
+        save_currency_prices(currency_prices)
+        save_currency_stocks(currency_stocks)
+        save_event_balances(event_balances)
+
+    currency_holders = {
+        "BobBux": sum(1 for inv in inventories.values() if inv.get("BobBux", 0) > 0),
+        "DxBux": sum(1 for inv in inventories.values() if inv.get("DxBux", 0) > 0),
+        "Gold": sum(1 for inv in inventories.values() if inv.get("Gold", 0) > 0)
+    }
+    return {
+        "balances": len(balances),
+        "bank_accounts": len(bank_data),
+        "loans": len(loans),
+        "currency_holders": currency_holders,
+        "currency_prices": currency_prices,
+    }
+
+@bot.command()
+@is_admin()
+async def setall(ctx, *, data: str = None):
+    """Import all user data including stock-aware currencies and event gold
+    Usage: 
+    - Paste the data directly after the command
+    - Or attach a .txt file with the data
+    """
+    # Check for file attachment if no text data provided
+    if data is None and ctx.message.attachments:
+        attachment = ctx.message.attachments[0]
+        if not attachment.filename.lower().endswith('.txt'):
+            return await ctx.send("❌ Please upload a .txt file")
+        
+        try:
+            file_content = await attachment.read()
+            data = file_content.decode('utf-8')
+        except Exception as e:
+            return await ctx.send(f"❌ Error reading file: {e}")
     
-    # Save event balances
-    with open("event_balances.json", "w") as f:
-        json.dump(event_balances, f, indent=4)
+    # If still no data, show help
+    if data is None:
+        return await ctx.send("❌ Please provide data either as text or in a .txt file attachment")
+
+    # Clean the input data
+    if data.startswith('```') and data.endswith('```'):
+        data = data[3:-3].strip()
+
+    summary = await job_runner.run(ctx, "setall", setall_job, data)
+    if summary is None:
+        return
 
     # Create success embed
     embed = discord.Embed(
@@ -2609,27 +5273,21 @@ async def setall(ctx, *, data: str = None):
         color=discord.Color.green()
     )
 
-    currency_holders = {
-        "BobBux": sum(1 for inv in inventories.values() if inv.get("BobBux", 0) > 0),
-        "DxBux": sum(1 for inv in inventories.values() if inv.get("DxBux", 0) > 0),
-        "Gold": sum(1 for inv in inventories.values() if inv.get("Gold", 0) > 0)
-    }
-
     embed.add_field(
         name="User Data",
-        value=f"• {len(balances)} balances\n• {len(bank_data)} bank accounts\n• {len(loans)} loans",
+        value=f"• {summary['balances']} balances\n• {summary['bank_accounts']} bank accounts\n• {summary['loans']} loans",
         inline=False
     )
 
     embed.add_field(
         name="Currency Holders",
-        value=f"• BobBux: {currency_holders['BobBux']}\n• DxBux: {currency_holders['DxBux']}\n• Gold: {currency_holders['Gold']}",
+        value=f"• BobBux: {summary['currency_holders']['BobBux']}\n• DxBux: {summary['currency_holders']['DxBux']}\n• Gold: {summary['currency_holders']['Gold']}",
         inline=True
     )
 
     embed.add_field(
         name="Current Prices",
-        value=f"• BobBux: {currency_prices['BobBux']}\n• DxBux: {currency_prices['DxBux']}\n• Gold: {currency_prices['Gold']}",
+        value=f"• BobBux: {summary['currency_prices']['BobBux']}\n• DxBux: {summary['currency_prices']['DxBux']}\n• Gold: {summary['currency_prices']['Gold']}",
         inline=True
     )
 
@@ -2638,23 +5296,27 @@ async def setall(ctx, *, data: str = None):
 #------------------ EVENTS ------------------------
 
 
-def add_event_gold(user_id, amount):
+def load_event_balances():
     try:
-        with open("event_balances.json", "r") as f:
-            data = json.load(f)
+        return read_json(guild_file(EVENT_BALANCES_FILE))
     except FileNotFoundError:
-        data = {}
+        return {}
+
+def save_event_balances(event_balances):
+    write_json(guild_file(EVENT_BALANCES_FILE), event_balances, indent=4)
+
+def add_event_gold(user_id, amount):
+    data = load_event_balances()
 
     user_id = str(user_id)
     data[user_id] = data.get(user_id, 0) + amount
 
-    with open("event_balances.json", "w") as f:
-        json.dump(data, f, indent=4)
+    save_event_balances(data)
 
 
-class GreedGloryView(discord.ui.View):
+class GreedGloryView(ManagedView):
     def __init__(self, user_id):
-        super().__init__(timeout=60)
+        super().__init__(user_id, timeout=60)
         self.user_id = user_id
         self.gold_collected = 0
         self.round = 1
@@ -2666,7 +5328,8 @@ class GreedGloryView(discord.ui.View):
             return
 
         # 25% trap chance
-        if random.random() < 0.10:
+        if game_rng.chance(0.10):
+            partitions.current().game_stats.record(self.user_id, "event", 0, 0)
             await interaction.response.edit_message(embed=discord.Embed(
                 title="💀 Trapped!",
                 description=f"A trap was triggered! You lost **{self.gold_collected} event gold**.",
@@ -2674,7 +5337,7 @@ class GreedGloryView(discord.ui.View):
             ), view=None)
             return
 
-        earned = random.randint(150, 700)
+        earned = game_rng.randint(150, 700)
         self.gold_collected += earned
         self.round += 1
 
@@ -2697,6 +5360,7 @@ class GreedGloryView(discord.ui.View):
             return
 
         add_event_gold(self.user_id, self.gold_collected)
+        partitions.current().game_stats.record(self.user_id, "event", 0, self.gold_collected)
 
         embed = discord.Embed(
             title="🏆 You Escaped!",
@@ -2707,11 +5371,7 @@ class GreedGloryView(discord.ui.View):
 
 @bot.command()
 async def eventbal(ctx):
-    try:
-        with open("event_balances.json", "r") as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        data = {}
+    data = load_event_balances()
 
     user_id = str(ctx.author.id)
     event_gold = data.get(user_id, 0)
@@ -2730,33 +5390,18 @@ EVENT_SHOP = {
 }
 
 def add_item(user_id, item_name, quantity):
-    try:
-        with open("inventories.json", "r") as f:
-            inventories = json.load(f)
-    except FileNotFoundError:
-        inventories = {}
-
-    user_id = str(user_id)
-    if user_id not in inventories:
-        inventories[user_id] = {}
-
-    inventories[user_id][item_name] = inventories[user_id].get(item_name, 0) + quantity
-
-    with open("inventories.json", "w") as f:
-        json.dump(inventories, f, indent=4)
-class EventShopView(discord.ui.View):
+    """Event shop items ignore the shop's stack limits."""
+    partitions.current().inventories.add(user_id, item_name, quantity)
+class EventShopView(ManagedView):
     def __init__(self, user_id):
-        super().__init__(timeout=60)
+        super().__init__(user_id, timeout=60)
         self.user_id = user_id
         self.add_item(EventShopDropdown(user_id))
 
 class EventShopDropdown(discord.ui.Select):
     def __init__(self, user_id):
         self.user_id = user_id
-        options = [
-            discord.SelectOption(label=item, description=f"{cost} event gold")
-            for item, cost in EVENT_SHOP.items()
-        ]
+        options = list(templates.get("event_shop_options"))
         super().__init__(placeholder="Choose an item to buy", options=options)
 
     async def callback(self, interaction: discord.Interaction):
@@ -2767,12 +5412,7 @@ class EventShopDropdown(discord.ui.Select):
         item = self.values[0]
         cost = EVENT_SHOP[item]
 
-        # Load event balances
-        try:
-            with open("event_balances.json", "r") as f:
-                event_data = json.load(f)
-        except FileNotFoundError:
-            event_data = {}
+        event_data = load_event_balances()
 
         user_id = str(self.user_id)
         user_gold = event_data.get(user_id, 0)
@@ -2786,8 +5426,7 @@ class EventShopDropdown(discord.ui.Select):
 
         # Deduct event gold and add item
         event_data[user_id] = user_gold - cost
-        with open("event_balances.json", "w") as f:
-            json.dump(event_data, f, indent=4)
+        save_event_balances(event_data)
 
         add_item(user_id, item, 1)
 
@@ -2797,31 +5436,15 @@ class EventShopDropdown(discord.ui.Select):
 
 @bot.command()
 async def eventshop(ctx):
-    embed = discord.Embed(
-        title="🛒 Event Shop",
-        description="Spend your event gold on exclusive items!",
-        color=discord.Color.orange()
-    )
-    for name, cost in EVENT_SHOP.items():
-        embed.add_field(name=name, value=f"{cost} event gold", inline=False)
-
+    embed = templates.embed("event_shop")
     view = EventShopView(ctx.author.id)
-    await ctx.send(embed=embed, view=view)
+    view.message = await ctx.send(embed=embed, view=view)
 
 @bot.command()
 async def event(ctx):
-    embed = discord.Embed(
-        title="💰 Greed or Glory!",
-        description=(
-            "You enter the Vault of Midas...\n"
-            "Each step earns more event gold, but one trap and it's all gone.\n\n"
-            "Choose: Go deeper for more riches, or escape with what you have."
-        ),
-        color=discord.Color.gold()
-    )
-    embed.set_footer(text="Trap chance: 10% per round")
+    embed = templates.embed("event")
     view = GreedGloryView(user_id=ctx.author.id)
-    await ctx.send(embed=embed, view=view)
+    view.message = await ctx.send(embed=embed, view=view)
 
 
 #------------------BACKGROUND TASKS------------------------
@@ -2833,53 +5456,418 @@ def restock_all_currencies(amount=100, max_stock=10000):
     save_currency_stocks(stocks)
     print("[StockMarket] Stock increased by", amount)
 
+@tasks.loop(seconds=60)
+async def flush_game_stats():
+    await partitions.flush()
+
+@tasks.loop(seconds=INVENTORY_FLUSH_INTERVAL)
+async def flush_inventories():
+    await partitions.flush_inventories()
+
+@tasks.loop(minutes=5)
+async def evict_partitions():
+    evicted = await partitions.evict_idle()
+    if evicted:
+        print(f"[Partitions] Evicted {evicted} idle guilds, {len(partitions.partitions)} loaded")
+
+@tasks.loop(seconds=10)
+async def reap_game_sessions():
+    for session in game_sessions.due():
+        await locked_call(session.guild_id, game_sessions.expire, session)
+
+def upkeep_guild_ids() -> List[Optional[int]]:
+    """Guilds whose restocks and Midas Touch this worker runs: those its shards serve, and DMs on worker 0."""
+    return [
+        guild_id for guild_id in partitions.guild_ids()
+        if serves_guild(guild_id) and (guild_id is not None or WORKER_ID == 0)
+    ]
+
+async def guild_upkeep(guild_id: Optional[int], func):
+    """Run func in the guild's scope without loading its partition, so idle guilds still get evicted."""
+    await locked_call(guild_id, func)
+    if partitions.peek(guild_id) is None:
+        store_lock.forget(guild_id)  # Don't keep idle guilds' lock files open
+
+def restock_all_guilds():
+    for guild_id in upkeep_guild_ids():
+        with guild_scope(guild_id), store_lock:
+            restock_all_currencies()
+
 @tasks.loop(minutes=10)
 async def stock_restock_task():
-    restock_all_currencies()
+    if stock_restock_task.current_loop == 0:
+        return  # hydrate() restocked at startup
+    for guild_id in upkeep_guild_ids():
+        await guild_upkeep(guild_id, restock_all_currencies)
+
+def midas_touch():
+    """Turn 100 coins into 100 gold for each Midas Touch holder in the guild in scope.
+
+    Reads the files directly, so a guild nobody is using stays evictable,
+    and only writes them back when someone holds the item.
+    """
+    partition = partitions.peek(current_guild.get())
+    if partition is not None:
+        partition.inventories.flush()
+    inventories = read_inventories_file()
+    holders = [user_id for user_id, inv in inventories.items() if inv.get("midas_touch", 0) > 0]
+    if not holders:
+        return
+
+    balances = load_balances()
+    for user_id in holders:
+        balance = balances.get(user_id, 1000)
+        if balance >= 100:
+            # Deduct coins and add gold
+            balances[user_id] = balance - 100
+            inv = inventories[user_id]
+            inv["Gold"] = inv.get("Gold", 0) + 100
+
+            # Track conversions in the inventory
+            inv["midas_converted"] = inv.get("midas_converted", 0) + 100
+
+    save_balances(balances)
+    write_json_atomic(guild_file(INVENTORY_FILE), inventories)
+    if partition is not None:
+        partition.inventories.invalidate()
+
 @tasks.loop(minutes=5)
 async def process_midas_touch():
-    inventories = load_inventories()
-    currency_prices = load_currency_prices()
-    
-    for user_id, inv in inventories.items():
-        if inv.get("midas_touch", 0) > 0:  # Check if user has the item
-            balance = get_balance(int(user_id))
-            if balance >= 100:
-                # Deduct coins and add gold
-                set_balance(int(user_id), balance - 100)
-                inv["Gold"] = inv.get("Gold", 0) + 100
-                
-                # Track conversions in the inventory
-                inv["midas_converted"] = inv.get("midas_converted", 0) + 100
-                
-    save_inventories(inventories)
+    for guild_id in upkeep_guild_ids():
+        await guild_upkeep(guild_id, midas_touch)
+
+# ------------------ STARTUP ------------------
+
+STARTUP_THREADS = int(os.getenv("STARTUP_THREADS", 4))  # Threads loading guild partitions at startup
+
+class StartupTimeline:
+    """Seconds from main.py starting to load to each startup milestone, recorded once each."""
+
+    def __init__(self):
+        self.marks: Dict[str, float] = {}
+        self.hydration: Optional[Future] = None
+
+    def mark(self, name: str) -> bool:
+        """Record `name` the first time it happens. False if it already had."""
+        if name in self.marks:
+            return False
+        self.marks[name] = time.perf_counter() - PROCESS_STARTED
+        print(f"[Startup] {name} after {self.marks[name] * 1000:.0f}ms")
+        return True
+
+    def report(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000, 1) for name, seconds in self.marks.items()}
+
+startup = StartupTimeline()
+
+def serves_guild(guild_id: Optional[int]) -> bool:
+    """Whether this worker's shards receive the guild's events."""
+    return guild_id is None or not SHARD_IDS or not SHARD_COUNT or (guild_id >> 22) % SHARD_COUNT in SHARD_IDS
+
+def hydrate_partition(guild_id: Optional[int]):
+    with guild_scope(guild_id), store_lock:
+        partition = partitions.get(guild_id)
+        partition.marketplace._ensure_loaded()
+        partition.game_stats._all()
+        partition.inventories._current()
+
+def hydrate():
+    """Load every store this worker serves, once, before commands arrive."""
+    game_sessions.refund_orphaned()
+    trade_engine.release_orphaned()
+    restock_all_guilds()  # Instant restock on startup
+
+    # The catalog and templates are shared by every partition, so load them first
+    shop_catalog.refresh()
+    for key in templates.builders:
+        templates.get(key)
+    guild_ids = [guild_id for guild_id in partitions.guild_ids() if serves_guild(guild_id)]
+    with ThreadPoolExecutor(STARTUP_THREADS, thread_name_prefix="hydrate") as pool:
+        list(pool.map(hydrate_partition, guild_ids))
+    startup.mark("hydrated")
+    print(f"[Startup] Hydrated {len(guild_ids)} partitions")
+
+def start_hydration() -> Future:
+    """Run hydrate() in the background once; logging in overlaps with it."""
+    if startup.hydration is None:
+        startup.hydration = ThreadPoolExecutor(1, thread_name_prefix="startup").submit(hydrate)
+    return startup.hydration
+
+@bot.event
+async def setup_hook():
+    startup.mark("logged_in")
+    bot.add_dynamic_items(*SHOP_COMPONENTS)
+    loop_watchdog.start()
+    bot.health_runner = await start_health_server()
+    await asyncio.wrap_future(start_hydration())  # The gateway connects, and commands arrive, after this
 
 @bot.event
 async def on_ready():
-    print(f"Bot connected as {bot.user}")
-    restock_all_currencies()  # Instant restock on startup
+    if not startup.mark("ready"):
+        print(f"Bot reconnected as {bot.user} (worker {WORKER_ID})")
+        return
+    print(f"Bot connected as {bot.user} (worker {WORKER_ID}, shards {SHARD_IDS or 'all'})")
+    # Each worker restocks and runs Midas Touch for the guilds it serves
     if not stock_restock_task.is_running():
         stock_restock_task.start()
     if not process_midas_touch.is_running():
         process_midas_touch.start()
+    if not reap_game_sessions.is_running():
+        reap_game_sessions.start()
+    if not flush_game_stats.is_running():
+        flush_game_stats.start()
+    if not flush_inventories.is_running():
+        flush_inventories.start()
+    if not evict_partitions.is_running():
+        evict_partitions.start()
+
+# ------------------ HEALTH SERVER ------------------
+
+HEALTH_PORT = int(os.environ.get("PORT", 8080))
+if HEALTH_PORT:
+    HEALTH_PORT += WORKER_ID  # One port per worker
+LOOP_LAG_INTERVAL = 0.5  # Seconds between event loop heartbeats
+LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", 0.25))  # Seconds of lag before sampling the stack
+LOOP_LAG_SAMPLES = 1200  # Raw heartbeat samples kept (10 minutes)
+LOOP_LAG_MINUTES = 1440  # Per-minute aggregates kept (24 hours)
+LOOP_STALLS_KEPT = 100
+STORE_FILES = [SHOP_ITEMS_FILE, GAME_ESCROW_FILE, GAME_JOURNAL_FILE, TRADE_ESCROW_FILE, TRADE_JOURNAL_FILE]  # Shared files; the rest are per guild
+started_at = time.time()
+
+class LoopWatchdog:
+    """Event loop lag monitor.
+
+    A heartbeat task on the loop records how late each sleep wakes up. A
+    daemon thread watches the heartbeat; once it is more than
+    LOOP_STALL_THRESHOLD overdue, the loop thread is blocked, so the
+    watchdog samples its stack and logs the innermost main.py frames.
+    """
 
-# ------------------ KEEP ALIVE (FLASK) ------------------
-
-app = Flask("")
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, threshold: float = LOOP_STALL_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.last = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=LOOP_LAG_SAMPLES)  # (timestamp, lag seconds)
+        self.minutes = deque(maxlen=LOOP_LAG_MINUTES)  # {"minute", "count", "mean_ms", "max_ms"}
+        self.stalls = deque(maxlen=LOOP_STALLS_KEPT)
+        self.beat = None
+        self.loop_thread_id = None
+        self.task = None
+        self.thread = None
+
+    def start(self):
+        if self.task is not None:
+            return
+        self.loop_thread_id = threading.get_ident()
+        self.beat = time.monotonic()
+        self.task = asyncio.create_task(self._heartbeat())
+        self.thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self.thread.start()
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - expected, 0.0)
+            self.beat = time.monotonic()
+            self._record(lag)
+
+    def _record(self, lag: float):
+        self.last = lag
+        self.max = max(self.max, lag)
+        now = time.time()
+        self.samples.append((now, lag))
+
+        minute = int(now // 60) * 60
+        if not self.minutes or self.minutes[-1]["minute"] != minute:
+            self.minutes.append({"minute": minute, "count": 0, "mean_ms": 0.0, "max_ms": 0.0})
+        bucket = self.minutes[-1]
+        lag_ms = lag * 1000
+        bucket["count"] += 1
+        bucket["mean_ms"] += (lag_ms - bucket["mean_ms"]) / bucket["count"]
+        bucket["max_ms"] = max(bucket["max_ms"], lag_ms)
+
+        # A stall caught by the watchdog ends with this beat; record how long it really was
+        if lag >= self.threshold and self.stalls and self.stalls[-1]["lag_ms"] is None:
+            self.stalls[-1]["lag_ms"] = round(lag_ms, 1)
+
+    def _watch(self):
+        reported_beat = None
+        while True:
+            time.sleep(self.interval / 5)
+            beat = self.beat
+            if beat == reported_beat or time.monotonic() - beat < self.interval + self.threshold:
+                continue
+            reported_beat = beat
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is not None:
+                self._report(frame)
+
+    def _report(self, frame):
+        stack = traceback.extract_stack(frame)
+        ours = [f for f in stack if f.filename == __file__]
+        culprit = (ours or stack)[-1]
+        chain = " <- ".join(f.name for f in reversed(ours[-4:])) or culprit.name
+        self.stalls.append({
+            "at": int(time.time()),
+            "lag_ms": None,  # Filled in when the loop catches up
+            "frame": f"{os.path.basename(culprit.filename)}:{culprit.lineno} in {culprit.name}",
+            "chain": chain,
+        })
+        print(f"[LoopWatchdog] Event loop blocked >{self.threshold * 1000:.0f}ms at "
+              f"{os.path.basename(culprit.filename)}:{culprit.lineno} ({chain})")
+
+    def stats(self) -> Dict:
+        recent = [lag for _, lag in self.samples]
+        ordered = sorted(recent)
+        def pct(q):
+            return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 1) if ordered else 0.0
+        return {
+            "last_ms": round(self.last * 1000, 1),
+            "max_ms": round(self.max * 1000, 1),
+            "recent": {"samples": len(recent), "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99)},
+            "minutes": [dict(bucket, mean_ms=round(bucket["mean_ms"], 2), max_ms=round(bucket["max_ms"], 1)) for bucket in self.minutes],
+            "stalls": list(self.stalls),
+        }
 
-@app.route("/")
-def home():
-    return "I'm alive!"
+loop_watchdog = LoopWatchdog()
 
-def run():
-    port = int(os.environ.get("PORT", 8080))
-    app.run(host="0.0.0.0", port=port)
+def store_health() -> Dict:
+    files = {}
+    for path in STORE_FILES:
+        try:
+            st = os.stat(path)
+        except OSError:
+            files[path] = {"exists": False}
+            continue
+        files[path] = {"exists": True, "bytes": st.st_size, "modified": int(st.st_mtime)}
+    writable = os.access(".", os.W_OK)
+    return {
+        "ok": writable,
+        "writable": writable,
+        "files": files,
+        "open_game_sessions": len(game_sessions.sessions),
+        "open_trades": len(trade_engine.trades),
+        "live_views": len(view_registry.views),
+        "worker": {"id": WORKER_ID, "workers": WORKERS, "shards": SHARD_IDS},
+        "partitions": {"loaded": len(partitions.partitions), "evicted": partitions.evicted},
+        "store_lock": {
+            "acquired": store_lock.acquired, "waited_ms": round(store_lock.waited * 1000, 1),
+            "contended": store_lock.contended,
+        },
+        "shared_store_lock": {
+            "acquired": shared_store_lock.acquired, "waited_ms": round(shared_store_lock.waited * 1000, 1),
+        },
+    }
 
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
+# aiohttp.web is only imported once the health server starts
+
+async def health_home(request):
+    from aiohttp import web
+    return web.Response(text="I'm alive!")
+
+async def health(request):
+    from aiohttp import web
+    gateway_latency = bot.latency
+    store = store_health()
+    return web.json_response({
+        "status": "ok" if bot.is_ready() and store["ok"] else "degraded",
+        "ready": bot.is_ready(),
+        "uptime": int(time.time() - started_at),
+        "gateway_latency_ms": round(gateway_latency * 1000, 1) if math.isfinite(gateway_latency) else None,
+        "loop_lag_ms": round(loop_watchdog.last * 1000, 1),
+        "loop_lag_max_ms": round(loop_watchdog.max * 1000, 1),
+        "loop_stalls": len(loop_watchdog.stalls),
+        "guilds": len(bot.guilds),
+        "startup_ms": startup.report(),
+        "store": store,
+    })
+
+async def health_lag(request):
+    """Loop lag percentiles, per-minute trend and recent stalls"""
+    from aiohttp import web
+    return web.json_response(loop_watchdog.stats())
+
+async def metrics(request):
+    """Latency percentiles (ms) per command and view callback"""
+    from aiohttp import web
+    return web.json_response(latency.snapshot())
+
+async def start_health_server():
+    from aiohttp import web
+    app = web.Application()
+    app.router.add_get("/", health_home)
+    app.router.add_get("/health", health)
+    app.router.add_get("/health/lag", health_lag)
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", HEALTH_PORT).start()
+    print(f"[Health] Listening on port {HEALTH_PORT}")
+    return runner
 
 # ------------------ RUN BOT ------------------
 
-keep_alive()
-bot.run(os.getenv("DISCORD_TOKEN"))
+def shard_ranges(shard_count: int, workers: int) -> List[List[int]]:
+    """Split shard ids into `workers` contiguous, near-equal ranges."""
+    per_worker, extra = divmod(shard_count, workers)
+    ranges, start = [], 0
+    for worker_id in range(workers):
+        size = per_worker + (worker_id < extra)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+def run_workers():
+    """Start one bot process per shard range and restart any that die."""
+    shard_count = SHARD_COUNT or WORKERS
+    ranges = shard_ranges(shard_count, WORKERS)
+    workers: Dict[int, subprocess.Popen] = {}
+
+    def spawn(worker_id: int):
+        env = {
+            **os.environ,
+            "WORKER_ID": str(worker_id),
+            "SHARD_COUNT": str(shard_count),
+            "SHARD_IDS": ",".join(map(str, ranges[worker_id])),
+        }
+        workers[worker_id] = subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env)
+        print(f"[Workers] Worker {worker_id} started with shards {ranges[worker_id]} (pid {workers[worker_id].pid})")
+
+    signal.signal(signal.SIGTERM, signal.default_int_handler)  # Shut the workers down on SIGTERM too
+    for worker_id in range(WORKERS):
+        spawn(worker_id)
+    try:
+        while workers:
+            time.sleep(1)
+            for worker_id, process in list(workers.items()):
+                code = process.poll()
+                if code is None:
+                    continue
+                if code == 0:
+                    del workers[worker_id]
+                else:
+                    print(f"[Workers] Worker {worker_id} exited with code {code}, restarting")
+                    time.sleep(5)
+                    spawn(worker_id)
+    except KeyboardInterrupt:
+        for process in workers.values():
+            process.terminate()
+        for process in workers.values():
+            process.wait()
+
+if __name__ == "__main__":
+    stranded = stranded_economy()
+    if stranded:
+        print(f"❌ Found the pre-partition economy ({', '.join(stranded)}) but LEGACY_GUILD_ID is not set.")
+        print("   Set LEGACY_GUILD_ID to the guild that owns it, or move the files aside to start every guild fresh.")
+        sys.exit(1)
+    if WORKERS > 1 and "WORKER_ID" not in os.environ:
+        run_workers()
+    else:
+        start_hydration()
+        bot.run(os.getenv("DISCORD_TOKEN"))
+        partitions.flush_now()
+        job_runner.shutdown()
@@ -0,0 +1,234 @@
+"""Offline Monte Carlo house-edge simulator for the casino games in main.py.
+
+Reads the live odds (WHEEL_SECTIONS, PLINKO_MULTIPLIERS, blackjack rules,
+Greed-or-Glory trap chance) and plays millions of rounds with NumPy so odds
+can be tuned before shipping a change.
+
+    python simulate.py --rounds 1000000 --bets 10 100 1000
+    python simulate.py --games blackjack --bj-stand 15 16 17 --json sim.json
+"""
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from main import CARD_VALUES, PLINKO_MULTIPLIERS, PLINKO_ROWS, PLINKO_WIDTH, game_rng
+
+GAMES = ["wheel", "plinko", "coinflip", "blackjack", "event"]
+BATCH_SIZE = 250_000
+
+# Blackjack card values by rank index (cards are ints, rank = card % 13)
+BJ_RANK_VALUES = np.array(CARD_VALUES[:13], dtype=np.int8)
+BJ_DEALER_STANDS_ON = 17
+
+EVENT_TRAP_CHANCE = 0.10
+EVENT_GOLD_RANGE = (150, 700)
+
+
+# ------------------ OUTCOME SAMPLERS ------------------
+# Each sampler returns the gross payout multiplier of every round. Payouts in
+# the bot are int(bet * multiplier), so per-bet figures are derived afterwards.
+
+def sample_wheel(rng: np.random.Generator, n: int) -> np.ndarray:
+    table = game_rng.wheel_table
+    prob = np.array(table.prob)
+    alias = np.array(table.alias)
+    multipliers = np.array([s["multiplier"] for s in table.outcomes], dtype=np.float64)
+
+    idx = rng.integers(0, len(prob), n)
+    keep = rng.random(n) < prob[idx]
+    return multipliers[np.where(keep, idx, alias[idx])]
+
+
+def sample_plinko(rng: np.random.Generator, n: int, rows: int = PLINKO_ROWS) -> np.ndarray:
+    multipliers = np.array([PLINKO_MULTIPLIERS.get(i, 0) for i in range(PLINKO_WIDTH)], dtype=np.float64)
+    col = np.full(n, PLINKO_WIDTH // 2, dtype=np.int16)
+    for _ in range(rows):
+        col += (rng.integers(0, 2, n, dtype=np.int16) * 2 - 1)
+        np.clip(col, 0, PLINKO_WIDTH - 1, out=col)
+    return multipliers[col]
+
+
+def sample_coinflip(rng: np.random.Generator, n: int) -> np.ndarray:
+    return np.where(rng.random(n) < 0.5, 2.0, 0.0)
+
+
+def _add_card(total, soft, value, mask):
+    value = np.where(mask, value, 0)
+    total = total + value
+    soft = soft + (value == 11)
+    # One card can force at most two soft aces down to 1
+    for _ in range(2):
+        fix = (total > 21) & (soft > 0)
+        total = total - 10 * fix
+        soft = soft - fix
+    return total, soft
+
+
+def _blackjack_batch(rng: np.random.Generator, n: int, stand_on: int) -> np.ndarray:
+    decks = BJ_RANK_VALUES[np.argsort(rng.random((n, 52)), axis=1) % 13]
+    rows = np.arange(n)
+    zeros = np.zeros(n, dtype=np.int16)
+    everyone = np.ones(n, dtype=bool)
+
+    player, p_soft = _add_card(zeros, zeros, decks[:, 0], everyone)
+    dealer, d_soft = _add_card(zeros, zeros, decks[:, 1], everyone)
+    player, p_soft = _add_card(player, p_soft, decks[:, 2], everyone)
+    dealer, d_soft = _add_card(dealer, d_soft, decks[:, 3], everyone)
+    ptr = np.full(n, 4)
+
+    hitting = player < stand_on
+    while hitting.any():
+        player, p_soft = _add_card(player, p_soft, decks[rows, ptr], hitting)
+        ptr += hitting
+        hitting &= player < stand_on
+
+    drawing = (dealer < BJ_DEALER_STANDS_ON) & (player <= 21)
+    while drawing.any():
+        dealer, d_soft = _add_card(dealer, d_soft, decks[rows, ptr], drawing)
+        ptr += drawing
+        drawing &= dealer < BJ_DEALER_STANDS_ON
+
+    payout = np.zeros(n, dtype=np.float64)
+    alive = player <= 21
+    payout[alive & ((dealer > 21) | (player > dealer))] = 2.0
+    payout[alive & (dealer <= 21) & (player == dealer)] = 1.0
+    return payout
+
+
+def sample_blackjack(rng: np.random.Generator, n: int, stand_on: int = 17) -> np.ndarray:
+    """Batched fixed-threshold strategy: hit until the hand reaches stand_on."""
+    return np.concatenate([
+        _blackjack_batch(rng, min(BATCH_SIZE, n - start), stand_on)
+        for start in range(0, n, BATCH_SIZE)
+    ])
+
+
+def sample_event(rng: np.random.Generator, n: int, rounds: int) -> np.ndarray:
+    """Event gold collected by a player who goes deeper `rounds` times then takes the gold."""
+    trapped = (rng.random((n, rounds)) < EVENT_TRAP_CHANCE).any(axis=1)
+    gold = rng.integers(EVENT_GOLD_RANGE[0], EVENT_GOLD_RANGE[1] + 1, (n, rounds)).sum(axis=1)
+    return np.where(trapped, 0, gold).astype(np.float64)
+
+
+# ------------------ REPORTING ------------------
+
+def _percentile(values: np.ndarray, cumulative: np.ndarray, q: float):
+    return values[np.searchsorted(cumulative, q * cumulative[-1])]
+
+
+def summarize(multipliers: np.ndarray, bet: int) -> Dict:
+    """EV, variance and payout tails of int(bet * multiplier) payouts."""
+    distinct, counts = np.unique(multipliers, return_counts=True)
+    payouts = np.floor(bet * distinct)
+    net = payouts - bet
+    p = counts / counts.sum()
+
+    ev = float((net * p).sum())
+    variance = float((((net - ev) ** 2) * p).sum())
+    cumulative = np.cumsum(counts)
+    return {
+        "bet": bet,
+        "rounds": int(counts.sum()),
+        "ev": ev,
+        "rtp": float((payouts * p).sum()) / bet,
+        "house_edge": -ev / bet,
+        "variance": variance,
+        "std": variance ** 0.5,
+        "std_error": (variance / counts.sum()) ** 0.5,
+        "p_loss": float(p[net < 0].sum()),
+        "p_win": float(p[net > 0].sum()),
+        "p01_net": float(_percentile(net, cumulative, 0.01)),
+        "p50_net": float(_percentile(net, cumulative, 0.50)),
+        "p99_net": float(_percentile(net, cumulative, 0.99)),
+        "p999_net": float(_percentile(net, cumulative, 0.999)),
+        "max_payout": float(payouts[-1]),
+    }
+
+
+def summarize_event(gold: np.ndarray, rounds: int) -> Dict:
+    return {
+        "rounds_deep": rounds,
+        "games": int(gold.size),
+        "ev_gold": float(gold.mean()),
+        "variance": float(gold.var()),
+        "std": float(gold.std()),
+        "p_trapped": float((gold == 0).mean()),
+        "p50_gold": float(np.percentile(gold, 50)),
+        "p99_gold": float(np.percentile(gold, 99)),
+        "max_gold": float(gold.max()),
+    }
+
+
+def print_table(title: str, rows: List[Dict], columns: List[str]):
+    print(f"\n=== {title} ===")
+    print("  ".join(f"{c:>12}" for c in columns))
+    for row in rows:
+        cells = []
+        for c in columns:
+            value = row[c]
+            cells.append(f"{value:>12.4f}" if isinstance(value, float) else f"{value:>12}")
+        print("  ".join(cells))
+
+
+# ------------------ CLI ------------------
+
+BET_COLUMNS = ["bet", "ev", "rtp", "house_edge", "std", "p_loss", "p01_net", "p99_net", "p999_net", "max_payout"]
+EVENT_COLUMNS = ["rounds_deep", "ev_gold", "std", "p_trapped", "p50_gold", "p99_gold", "max_gold"]
+
+
+def run(args) -> Dict:
+    rng = np.random.default_rng(args.seed)
+    report = {"rounds": args.rounds, "seed": args.seed, "games": {}}
+
+    samplers = {
+        "wheel": lambda: {"": sample_wheel(rng, args.rounds)},
+        "plinko": lambda: {"": sample_plinko(rng, args.rounds, args.plinko_rows)},
+        "coinflip": lambda: {"": sample_coinflip(rng, args.rounds)},
+        "blackjack": lambda: {
+            f"stand on {t}": sample_blackjack(rng, args.rounds, t) for t in args.bj_stand
+        },
+    }
+
+    for game in args.games:
+        started = time.perf_counter()
+        if game == "event":
+            rows = [summarize_event(sample_event(rng, args.rounds, k), k) for k in args.event_rounds]
+            report["games"][game] = rows
+            print_table(f"event ({time.perf_counter() - started:.2f}s)", rows, EVENT_COLUMNS)
+            continue
+
+        report["games"][game] = {}
+        for variant, multipliers in samplers[game]().items():
+            rows = [summarize(multipliers, bet) for bet in args.bets]
+            report["games"][game][variant or "default"] = rows
+            label = f"{game} {variant}".strip()
+            print_table(f"{label} ({time.perf_counter() - started:.2f}s)", rows, BET_COLUMNS)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", nargs="+", choices=GAMES, default=GAMES)
+    parser.add_argument("--rounds", type=int, default=1_000_000, help="rounds per game (default: 1,000,000)")
+    parser.add_argument("--bets", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--plinko-rows", type=int, default=PLINKO_ROWS)
+    parser.add_argument("--bj-stand", type=int, nargs="+", default=[17],
+                        help="player stands once the hand reaches this total")
+    parser.add_argument("--event-rounds", type=int, nargs="+", default=[1, 3, 5, 10],
+                        help="how many times the player goes deeper before taking the gold")
+    parser.add_argument("--json", metavar="PATH", help="also write the full report as JSON")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()